@@ -0,0 +1,238 @@
+"""
+回测热点路径基准测试
+
+完全离线运行，所有行情数据由 fixtures.py 确定性生成。结果保存为JSON，
+可用 --compare 与历史结果对比。
+
+用法:
+    python benchmarks/run_benchmarks.py                       # quick 配置
+    python benchmarks/run_benchmarks.py --profile full        # 1~100年数据, 最多5000只股票
+    python benchmarks/run_benchmarks.py -o new.json --compare old.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from src.investment_strategy import weekly_investment_dates, monthly_investment_dates, calculate_investment_shares
+from src.backtest import run_backtest, compare_with_lump_sum
+from src.rendering import render_backtest_charts
+from src.batch_runner import run_universe_backtest
+from src.trading_calendar import TradingCalendar
+from src.path_dependent import run_value_averaging
+from fixtures import date_range_for_years, synthetic_prices, synthetic_universe
+
+PROFILES = {
+    'quick': {
+        'years': [1, 10],
+        'universe_sizes': [1, 10],
+        'universe_years': 1,
+        'render_years': [1],
+        'repeat': 3,
+    },
+    'full': {
+        'years': [1, 10, 30, 100],
+        'universe_sizes': [1, 10, 100, 1000, 5000],
+        'universe_years': 10,
+        'render_years': [10, 30],
+        'repeat': 5,
+    },
+}
+
+SCHEDULES = {
+    'weekly': {'day_of_week': 0},
+    'monthly': {'day_of_month': 1},
+}
+
+SCHEDULE_GENERATORS = {
+    'weekly': weekly_investment_dates,
+    'monthly': monthly_investment_dates,
+}
+
+AMOUNT = 100.0
+
+def time_call(func: Callable, repeat: int) -> Dict:
+    """
+    重复调用函数并统计耗时
+
+    Args:
+        func: 无参数的待测函数
+        repeat: 重复次数
+
+    Returns:
+        耗时统计（秒）
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'repeat': repeat,
+    }
+
+def _environment() -> Dict:
+    """记录运行环境，便于对比不同机器或版本的结果"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+def run_suite(profile: str = 'quick', repeat: Optional[int] = None,
+              progress: Callable[[str], None] = print) -> Dict:
+    """
+    运行基准测试
+
+    Args:
+        profile: 配置名称 ('quick' 或 'full')
+        repeat: 覆盖配置中的重复次数
+        progress: 进度输出函数
+
+    Returns:
+        包含运行环境和各项耗时的结果字典
+    """
+    config = PROFILES[profile]
+    repeat = repeat or config['repeat']
+    results = []
+
+    def record(name: str, params: Dict, func: Callable, n: int = repeat):
+        progress(f"{name} {params}")
+        results.append({'name': name, 'params': params, 'seconds': time_call(func, n)})
+
+    for years in config['years']:
+        start_date, end_date = date_range_for_years(years)
+        stock_data = synthetic_prices(years)
+
+        for schedule, params in SCHEDULES.items():
+            generator = SCHEDULE_GENERATORS[schedule]
+            case = {'years': years, 'schedule': schedule, 'bars': len(stock_data)}
+
+            record('schedule_dates', case, lambda: generator(start_date, end_date, **params))
+
+            dates = generator(start_date, end_date, **params)
+            record('calculate_investment_shares', case,
+                   lambda: calculate_investment_shares(stock_data, dates, AMOUNT))
+            record('run_backtest', case,
+                   lambda: run_backtest(stock_data, AMOUNT, start_date, end_date, schedule, params))
+            record('run_backtest_lean', case,
+                   lambda: run_backtest(stock_data, AMOUNT, start_date, end_date, schedule, params, keep_records=False))
+            record('compare_with_lump_sum', case,
+                   lambda: compare_with_lump_sum(stock_data, AMOUNT, start_date, end_date, schedule, params))
+            # 路径依赖策略：1组参数与64组参数并行推进
+            for n_params in (1, 64):
+                record('value_averaging', dict(case, params=n_params),
+                       lambda: run_value_averaging(stock_data, AMOUNT, start_date, end_date, schedule, params,
+                                                   growth_rates=np.linspace(0, 0.1, n_params)))
+
+    # 多股票：逐个股票运行回测，衡量整体吞吐
+    years = config['universe_years']
+    start_date, end_date = date_range_for_years(years)
+    for n_symbols in config['universe_sizes']:
+        universe = synthetic_universe(n_symbols, years)
+        for schedule, params in SCHEDULES.items():
+            def run_universe():
+                for stock_data in universe.values():
+                    run_backtest(stock_data, AMOUNT, start_date, end_date, schedule, params)
+            # 大规模股票池单次耗时已足够稳定
+            n = repeat if n_symbols <= 100 else 1
+            record('universe_run_backtest',
+                   {'years': years, 'schedule': schedule, 'symbols': n_symbols}, run_universe, n)
+            def run_universe_calendar():
+                calendar = TradingCalendar(next(iter(universe.values())).index)
+                for stock_data in universe.values():
+                    run_backtest(stock_data, AMOUNT, start_date, end_date, schedule, params, calendar=calendar)
+            record('universe_run_backtest_calendar',
+                   {'years': years, 'schedule': schedule, 'symbols': n_symbols}, run_universe_calendar, n)
+            record('universe_batch_runner',
+                   {'years': years, 'schedule': schedule, 'symbols': n_symbols},
+                   lambda: run_universe_backtest(universe, AMOUNT, start_date, end_date, schedule, params), n)
+        del universe
+
+    # 图表渲染
+    with tempfile.TemporaryDirectory() as output_dir:
+        for years in config['render_years']:
+            start_date, end_date = date_range_for_years(years)
+            stock_data = synthetic_prices(years)
+            result = run_backtest(stock_data, AMOUNT, start_date, end_date, 'weekly', SCHEDULES['weekly'])
+            for fmt in ('png', 'json'):
+                record('render_backtest_charts', {'years': years, 'format': fmt, 'dpi': 100},
+                       lambda: render_backtest_charts(stock_data, result, 'SYN', output_dir=output_dir,
+                                                      dpi=100, fmt=fmt))
+
+    return {'profile': profile, 'environment': _environment(), 'results': results}
+
+def _case_key(entry: Dict) -> str:
+    params = ','.join(f"{k}={v}" for k, v in sorted(entry['params'].items()))
+    return f"{entry['name']}[{params}]"
+
+def compare_results(current: Dict, baseline: Dict) -> List[str]:
+    """
+    对比两次基准测试结果（按中位数耗时）
+
+    Args:
+        current: 本次结果
+        baseline: 历史结果
+
+    Returns:
+        可打印的对比行列表
+    """
+    baseline_cases = {_case_key(entry): entry for entry in baseline['results']}
+    lines = []
+    for entry in current['results']:
+        key = _case_key(entry)
+        if key not in baseline_cases:
+            continue
+        old = baseline_cases[key]['seconds']['median']
+        new = entry['seconds']['median']
+        ratio = new / old if old > 0 else float('inf')
+        lines.append(f"{key}: {old * 1000:.2f}ms -> {new * 1000:.2f}ms ({ratio:.2f}x)")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='回测热点路径基准测试')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick', help='基准测试配置')
+    parser.add_argument('--repeat', type=int, default=None, help='每项测试的重复次数')
+    parser.add_argument('-o', '--output', default='bench_results.json', help='结果JSON文件路径')
+    parser.add_argument('--compare', default=None, help='用于对比的历史结果JSON文件')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.profile, args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"基准测试结果已保存为 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for line in compare_results(report, baseline):
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,37 @@ __version__ = "1.0.0"
 __author__ = "Claude Code"
 
 from .main import StockDripBacktester
-from .data_fetcher import get_stock_data, get_multiple_stocks_data
+from .data_fetcher import get_stock_data, get_multiple_stocks_data, validate_stock_data, DataCache
 from .backtest import run_backtest, compare_with_lump_sum
 from .investment_strategy import weekly_investment_dates, calculate_investment_shares
-from .visualization import plot_investment_growth, plot_price_vs_investment
+from .visualization import plot_investment_growth, plot_price_vs_investment, downsample_lttb
+from .rendering import render_backtest_charts, render_charts_parallel
+from .trading_calendar import TradingCalendar
+from .benchmark import Benchmark
+from .results_store import ResultsStore
+from .streaming_stats import StreamingSummary
+from .sweep import run_parameter_sweep
+from .path_dependent import run_value_averaging
 
 __all__ = [
     'StockDripBacktester',
     'get_stock_data',
     'get_multiple_stocks_data',
+    'validate_stock_data',
+    'DataCache',
     'run_backtest',
     'compare_with_lump_sum',
     'weekly_investment_dates',
     'calculate_investment_shares',
     'plot_investment_growth',
-    'plot_price_vs_investment'
+    'plot_price_vs_investment',
+    'downsample_lttb',
+    'render_backtest_charts',
+    'render_charts_parallel',
+    'TradingCalendar',
+    'Benchmark',
+    'ResultsStore',
+    'StreamingSummary',
+    'run_parameter_sweep',
+    'run_value_averaging'
 ]
\ No newline at end of file
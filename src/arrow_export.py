@@ -0,0 +1,290 @@
+"""
+Arrow 导出模块
+
+把回测结果、逐笔定投记录和净值曲线转换为 Arrow 记录批（RecordBatch），写入 IPC 文件或流。
+DuckDB、Polars 和看板可以直接读取；IPC 文件通过内存映射打开，跨进程读取时既不复制也不重新解析。
+数值列直接引用 numpy 数组的内存，转换本身也不复制数据。
+
+需要安装 pyarrow（pip install pyarrow），只在调用本模块的函数时才导入。
+原有基于字典的结果（命令行和图形界面使用）保持不变，record_batch_to_results 可以转换回字典。
+"""
+from typing import Dict, Any, BinaryIO, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from results_store import flatten_result
+from backtest import equity_curve
+
+DEFAULT_BATCH_SIZE = 10000
+# 不含任何指标的结果行（出错或没有定投）只有这些列，不能代表之后批次的结构
+_ERROR_ONLY_COLUMNS = {'run_id', 'symbol', 'error'}
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError("导出 Arrow 格式需要安装 pyarrow: pip install pyarrow")
+    return pa
+
+def frame_to_record_batch(frame: pd.DataFrame, symbol: Optional[str] = None):
+    """
+    将DataFrame的各列转换为记录批
+
+    numpy 数值列和无时区的时间列不复制，直接引用原数组的内存；带时区的时间列保留时区。
+
+    Args:
+        frame: DataFrame（例如 investment_records 或 equity_curve 的返回值）
+        symbol: 提供时增加 symbol 列
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    pa = _require_pyarrow()
+    arrays, names = [], []
+    if symbol is not None:
+        arrays.append(pa.array([symbol] * len(frame), type=pa.string()))
+        names.append('symbol')
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            arrays.append(pa.array(values))
+        else:
+            arrays.append(pa.array(values.to_numpy()))
+        names.append(str(column))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+def records_to_record_batch(result: Dict, symbol: Optional[str] = None):
+    """
+    将回测结果中的逐笔定投记录转换为记录批
+
+    Args:
+        result: run_backtest 的结果（需包含 investment_records），或 compare_with_lump_sum 的结果
+        symbol: 股票代码
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    result = result.get('drip_result', result)
+    return frame_to_record_batch(result['investment_records'], symbol)
+
+def equity_curve_to_record_batch(stock_data: pd.DataFrame, result: Dict, symbol: Optional[str] = None,
+                                 end_date=None):
+    """
+    将逐日净值曲线转换为记录批
+
+    Args:
+        stock_data: 回测使用的股票数据
+        result: run_backtest 或 compare_with_lump_sum 的结果（需包含 investment_records）
+        symbol: 股票代码
+        end_date: 曲线结束日期
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    result = result.get('drip_result', result)
+    return frame_to_record_batch(equity_curve(stock_data, result, end_date), symbol)
+
+def _rows_to_record_batch(rows: List[Dict[str, Any]], schema=None):
+    pa = _require_pyarrow()
+    if schema is None:
+        names = ['run_id', 'symbol']
+        for row in rows:
+            names += [name for name in row if name not in names]
+        if 'error' not in names:
+            names.append('error')
+        columns = {name: [row.get(name) for row in rows] for name in names}
+        arrays = [pa.array(columns[name]) for name in names]
+        # 全为空的列无法推断类型，按数值列处理（错误信息列为字符串）
+        arrays = [array.cast(pa.string() if name in ('run_id', 'symbol', 'error') else pa.float64())
+                  if pa.types.is_null(array.type) else array for name, array in zip(names, arrays)]
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+    # 之后的批次沿用第一个批次的结构，缺少的列为空；IPC 文件写出后结构不能再改变，多出的列直接报错而不是丢弃
+    unknown = {name for row in rows for name in row} - set(schema.names)
+    if unknown:
+        raise ValueError(f"结果包含记录批结构中没有的列: {sorted(unknown)}")
+    arrays = [pa.array([row.get(field.name) for row in rows], type=field.type) for field in schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def results_to_record_batch(results: Union[Dict[str, Dict], Iterable[Tuple[str, Dict]]], run_id: Optional[str] = None):
+    """
+    将一组回测结果转换为记录批（每个结果一行，标量指标各占一列）
+
+    Args:
+        results: 股票代码到结果的字典，或 (股票代码, 结果) 元组的可迭代对象（如 iter_universe_backtest）
+        run_id: 运行批次ID
+
+    Returns:
+        pyarrow.RecordBatch；嵌套结果的列名形如 "drip_result.total_return"
+    """
+    items = results.items() if isinstance(results, dict) else results
+    rows = [dict(flatten_result(result), run_id=run_id, symbol=symbol) for symbol, result in items]
+    return _rows_to_record_batch(rows)
+
+def record_batch_to_results(batch) -> Dict[str, Dict]:
+    """
+    将结果记录批转换回股票代码到结果字典的映射（嵌套列恢复为嵌套字典，空值被省略）
+
+    Args:
+        batch: pyarrow.RecordBatch 或 pyarrow.Table
+
+    Returns:
+        股票代码到结果字典的映射
+    """
+    results = {}
+    for row in batch.to_pylist():
+        symbol = row.pop('symbol')
+        row.pop('run_id', None)
+        result: Dict[str, Any] = {}
+        for name, value in row.items():
+            if value is None:
+                continue
+            target = result
+            *parents, key = name.split('.')
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[key] = value
+        results[symbol] = result
+    return results
+
+def write_ipc_file(path: str, batches: Iterable) -> int:
+    """
+    将记录批写入 Arrow IPC 文件（所有批次的结构必须相同）
+
+    Args:
+        path: 文件路径（通常以 .arrow 结尾）
+        batches: 记录批的可迭代对象
+
+    Returns:
+        写入的行数
+    """
+    pa = _require_pyarrow()
+    return _write(lambda schema: pa.ipc.new_file(path, schema), batches)
+
+def write_ipc_stream(sink: Union[str, BinaryIO], batches: Iterable) -> int:
+    """
+    将记录批写入 Arrow IPC 流（可以是文件、管道或套接字）
+
+    Args:
+        sink: 文件路径或可写的二进制文件对象
+        batches: 记录批的可迭代对象
+
+    Returns:
+        写入的行数
+    """
+    pa = _require_pyarrow()
+    return _write(lambda schema: pa.ipc.new_stream(sink, schema), batches)
+
+def _write(open_writer, batches: Iterable) -> int:
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = open_writer(batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def read_ipc(source: Union[str, BinaryIO, bytes], memory_map: bool = True):
+    """
+    读取 Arrow IPC 文件或流
+
+    文件路径默认以内存映射方式打开：返回的表直接引用映射的页面，不复制也不解析。
+
+    Args:
+        source: IPC 文件路径、二进制文件对象或字节串
+        memory_map: 文件路径是否使用内存映射
+
+    Returns:
+        pyarrow.Table
+    """
+    pa = _require_pyarrow()
+    if isinstance(source, str):
+        source = pa.memory_map(source, 'r') if memory_map else pa.OSFile(source, 'rb')
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        source = pa.BufferReader(source)
+    try:
+        return pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        # 不是 IPC 文件格式时按流格式读取
+        source.seek(0)
+        return pa.ipc.open_stream(source).read_all()
+
+class ArrowResultsWriter:
+    """
+    把批量回测结果按批写入 Arrow IPC 文件或流
+
+    与 ResultsStore 有相同的 append / flush 接口，可以直接作为 run_universe_backtest 的 store 参数；
+    结束后必须 close（或使用 with 语句）才会写入文件尾。
+
+    文件的结构由第一个写出的批次决定：缓冲中只有出错或空结果时暂不写出，等到有带指标的结果再确定结构；
+    之后出现结构中没有的列时 flush 报错（ValueError），不会静默丢弃数据。
+    """
+
+    def __init__(self, sink: Union[str, BinaryIO], batch_size: int = DEFAULT_BATCH_SIZE, stream: bool = False):
+        """
+        Args:
+            sink: 文件路径或可写的二进制文件对象
+            batch_size: 每个记录批的行数
+            stream: 为True时写 IPC 流格式，否则写 IPC 文件格式（支持随机访问和内存映射）
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.stream = stream
+        self.rows = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._writer = None
+        self._schema = None
+
+    def append(self, run_id: str, symbol: str, result: Dict):
+        """
+        追加一个回测结果
+
+        Args:
+            run_id: 运行批次ID
+            symbol: 股票代码
+            result: 回测结果
+        """
+        self._pending.append(dict(flatten_result(result), run_id=run_id, symbol=symbol))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self, force: bool = False):
+        """
+        将缓冲的结果写为一个记录批
+
+        Args:
+            force: 为True时即使缓冲中只有出错或空结果也写出（close 时使用）
+        """
+        if not self._pending:
+            return
+        if self._writer is None and not force and \
+                all(set(row) <= _ERROR_ONLY_COLUMNS for row in self._pending):
+            return
+        batch = _rows_to_record_batch(self._pending, self._schema)
+        if self._writer is None:
+            pa = _require_pyarrow()
+            self._schema = batch.schema
+            opener = pa.ipc.new_stream if self.stream else pa.ipc.new_file
+            self._writer = opener(self.sink, self._schema)
+        self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+        self._pending.clear()
+
+    def close(self):
+        """写入剩余结果并结束文件"""
+        self.flush(force=True)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -3,40 +3,120 @@
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Union
 import warnings
 
-from investment_strategy import weekly_investment_dates, monthly_investment_dates, calculate_investment_shares
+from investment_strategy import generate_investment_dates, resolve_trading_positions, schedule_amounts
+import instrumentation
+from xirr import xirr_batch, schedule_cashflows
+from signals import signal_multipliers
 
 warnings.filterwarnings('ignore')
 
+def _align_tz(date, stock_data: pd.DataFrame) -> pd.Timestamp:
+    """
+    将日期转换到股票数据索引的时区，以便与带时区的索引比较
+    """
+    date = pd.Timestamp(date)
+    tz = getattr(stock_data.index, 'tz', None)
+    if tz is not None:
+        return date.tz_localize(tz) if date.tzinfo is None else date.tz_convert(tz)
+    return date.tz_localize(None) if date.tzinfo is not None else date
+
 def _get_price_on_or_near(date: pd.Timestamp, stock_data: pd.DataFrame) -> float:
     """
     获取给定日期或最接近的过去交易日的收盘价
     """
-    if date in stock_data.index:
-        return stock_data.loc[date, 'Close']
-    
-    # 如果当天不是交易日，则寻找最近的过去一个交易日
-    past_dates = stock_data[stock_data.index <= date]
-    if not past_dates.empty:
-        return stock_data.loc[past_dates.index[-1], 'Close']
+    # 找到给定日期当天或之前最近的交易日
+    position = stock_data.index.searchsorted(_align_tz(date, stock_data), side='right') - 1
+    if position >= 0:
+        return stock_data['Close'].iloc[position]
     
     # 如果没有过去的日期，则返回NaN
     return np.nan
 
-def run_backtest(stock_data: pd.DataFrame, amount: float, 
-                start_date: str, end_date: str, strategy: str = 'weekly', strategy_params: Dict[str, Any] = None) -> Dict:
+def _final_position(date, stock_data: pd.DataFrame) -> int:
+    """
+    获取给定日期或之前最近一个交易日的位置，没有时返回最后一个交易日（与最终股价的取值规则一致）
+    """
+    position = stock_data.index.searchsorted(_align_tz(date, stock_data), side='right') - 1
+    return position if position >= 0 else len(stock_data) - 1
+
+def total_return_factors(stock_data: pd.DataFrame, split_adjusted: bool = True) -> np.ndarray:
+    """
+    计算分红再投资（以及未按拆股调整的价格中的拆股）带来的累计持股倍数
+    
+    第 t 个交易日的倍数为 (1 + 每股分红_t / 收盘价_t)，价格未按拆股调整时再乘以拆股比例_t，
+    其累计乘积 F_t 表示开始前持有的1股在第 t 个交易日收盘后变为 F_t 股。
+    在第 p 个交易日收盘买入的股份到第 q 个交易日变为原来的 F_q / F_p 倍。
+    
+    Args:
+        stock_data: 股票数据（未按分红复权的价格，包含 Dividends / Stock Splits 列）
+        split_adjusted: 价格是否已按拆股调整。yfinance 的 history() 即使 auto_adjust=False
+            也返回按拆股调整的价格，此时 Stock Splits 列只是记录，再乘拆股比例会重复计算；
+            只有完全未调整的原始价格（拆股当天价格按比例下跳）才设为False
+        
+    Returns:
+        与 stock_data 等长的累计倍数数组
+    """
+    close = stock_data['Close'].to_numpy(dtype=float)
+    factors = np.ones(len(close))
+    
+    if 'Dividends' in stock_data.columns:
+        dividends = np.nan_to_num(stock_data['Dividends'].to_numpy(dtype=float))
+        factors += dividends / close
+    
+    if not split_adjusted and 'Stock Splits' in stock_data.columns:
+        splits = np.nan_to_num(stock_data['Stock Splits'].to_numpy(dtype=float))
+        # yfinance 用 0 表示当天没有拆股
+        factors *= np.where(splits > 0, splits, 1.0)
+    
+    return np.cumprod(factors)
+
+def _schedule_positions(stock_data: pd.DataFrame, strategy: str, start_date: str, end_date: str,
+                        strategy_params: Dict[str, Any] = None, calendar=None) -> np.ndarray:
+    """定投日对应的交易日位置（有共享日历时复用日历的缓存）"""
+    with instrumentation.span('share_calc', 'investment_strategy'):
+        if calendar is not None:
+            return calendar.positions_for(stock_data.index, strategy, start_date, end_date, strategy_params)
+        investment_dates = generate_investment_dates(strategy, start_date, end_date, strategy_params)
+        return resolve_trading_positions(stock_data.index, investment_dates)
+
+def _final_price(stock_data: pd.DataFrame, end_date) -> float:
+    """结束日期当天或之前的收盘价，没有时取最后一个收盘价"""
+    final_price = _get_price_on_or_near(pd.Timestamp(end_date), stock_data)
+    if pd.isna(final_price):
+        final_price = stock_data['Close'].iloc[-1] # Fallback
+    return final_price
+
+@instrumentation.traced('backtest', 'backtest')
+def run_backtest(stock_data: pd.DataFrame, amount: Union[float, np.ndarray], 
+                start_date: str, end_date: str, strategy: str = 'weekly', strategy_params: Dict[str, Any] = None,
+                reinvest_dividends: bool = False, calendar=None, keep_records: bool = True,
+                benchmark=None, signal: Union[str, Callable, None] = None,
+                signal_params: Dict[str, Any] = None) -> Dict:
     """
     运行定投回测
     
     Args:
         stock_data: 股票数据
-        amount: 每期定投金额
+        amount: 每期定投金额，或与定投日期对齐的金额数组（逐年递增、按通胀调整、额外追加等，
+            见 contribution_amounts）
         start_date: 开始日期
         end_date: 结束日期
         strategy: 定投策略 ('weekly' 或 'monthly')
         strategy_params: 策略参数 (例如 {'day_of_week': 0})
+        reinvest_dividends: 是否按 Dividends 列将分红再投资。
+            需使用未按分红复权的价格，例如 get_stock_data(..., auto_adjust=False)，
+            否则复权价格中已包含的分红会被重复计算；价格按拆股调整（yfinance 的默认行为），拆股不改变持仓市值
+        calendar: 共享的 TradingCalendar，多个股票回测时复用定投日到交易日的映射
+        keep_records: 是否构造逐笔定投记录 investment_records。参数扫描和批量任务只需要汇总指标时
+            设为False，直接由数组计算结果，省去构造DataFrame的开销
+        benchmark: Benchmark 基准；提供时把相同的现金流（实际定投日期和金额）投入基准进行比较，结果增加 benchmark_return、
+            benchmark_xirr、excess_return、excess_xirr、tracking_error 和 beta
+        signal: 信号策略名称（如 'below_ma'、'rsi_skip'、'drawdown_scale'）或策略函数，
+            按价格信号调整每次定投的金额，倍数为0的定投被跳过（见 signals 模块）
+        signal_params: 信号策略参数
         
     Returns:
         回测结果字典
@@ -44,73 +124,117 @@ def run_backtest(stock_data: pd.DataFrame, amount: float,
     if strategy_params is None:
         strategy_params = {}
 
-    # 生成定投日期
-    if strategy == 'monthly':
-        investment_dates = monthly_investment_dates(start_date, end_date, **strategy_params)
-    else:
-        investment_dates = weekly_investment_dates(start_date, end_date, **strategy_params)
+    # 定投日对应的交易日位置
+    positions = _schedule_positions(stock_data, strategy, start_date, end_date, strategy_params, calendar)
+    amounts = schedule_amounts(amount, len(positions))
+    if signal is not None and len(positions):
+        amounts = amounts * signal_multipliers(stock_data, positions, signal, signal_params)
+        bought = amounts > 0
+        positions, amounts = positions[bought], amounts[bought]
+    instrumentation.count('investments', len(positions))
     
-    # 计算每次定投的股份数量
-    investment_records = calculate_investment_shares(stock_data, investment_dates, amount)
-    
-    if investment_records.empty:
+    if len(positions) == 0:
         return {}
     
-    # 计算累计股份数和投资金额
-    investment_records['Cumulative_Shares'] = investment_records['Shares'].cumsum()
-    investment_records['Cumulative_Amount'] = investment_records['Amount'].cumsum()
-    
-    # 获取最终股价
-    final_date = pd.to_datetime(end_date)
-    final_price = _get_price_on_or_near(final_date, stock_data)
-    if pd.isna(final_price):
-        final_price = stock_data['Close'].iloc[-1] # Fallback
+    with instrumentation.span('aggregation', 'backtest'):
+        # 直接在数组上计算每次定投的股份数和累计股份数
+        prices = stock_data['Close'].to_numpy(dtype=float)[positions]
+        shares = amounts / prices
+        if reinvest_dividends:
+            # 每笔买入按之后的累计倍数增长：第 i 次定投时的持股为 F_i × Σ(股数_j / F_j)
+            growth = total_return_factors(stock_data)
+            record_growth = growth[positions]
+            normalized_shares = np.cumsum(shares / record_growth)
+            cumulative_shares = record_growth * normalized_shares
+            final_shares = growth[_final_position(end_date, stock_data)] * normalized_shares[-1]
+        else:
+            cumulative_shares = np.cumsum(shares)
+            final_shares = cumulative_shares[-1]
+        
+        # 获取最终股价
+        final_date = pd.Timestamp(end_date)
+        final_price = _final_price(stock_data, final_date)
 
-    # 计算最终价值
-    final_value = investment_records['Cumulative_Shares'].iloc[-1] * final_price
-    
-    # 计算总投入
-    total_investment = investment_records['Cumulative_Amount'].iloc[-1]
-    
-    # 计算收益率
-    total_return = (final_value - total_investment) / total_investment * 100
-    
-    # 计算年化收益率
-    years = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days / 365.25
-    if years > 0:
-        annual_return = (final_value / total_investment) ** (1/years) - 1
-        annual_return_percent = annual_return * 100
-    else:
-        annual_return_percent = 0
-
-    return {
+        # 计算最终价值
+        final_value = final_shares * final_price
+        
+        # 计算总投入
+        total_investment = amounts.sum()
+        
+        # 计算收益率
+        total_return = (final_value - total_investment) / total_investment * 100
+        
+        # 计算年化收益率
+        years = (final_date - pd.Timestamp(start_date)).days / 365.25
+        if years > 0:
+            annual_return = (final_value / total_investment) ** (1/years) - 1
+            annual_return_percent = annual_return * 100
+        else:
+            annual_return_percent = 0
+        
+        # 资金加权年化收益率：按每笔投入的实际日期计算
+        dates = stock_data.index[positions]
+        flows = schedule_cashflows(dates, amounts, final_value, end_date)
+        xirr_percent = float(xirr_batch(flows['cashflows'], flows['years'])[0]) * 100
+
+    result = {
         'total_investment': total_investment,
         'final_value': final_value,
         'total_return': total_return,
         'annual_return': annual_return_percent,
-        'investment_records': investment_records,
+        'xirr': xirr_percent,
         'final_price': final_price,
-        'investment_count': len(investment_records)
+        'investment_count': len(positions)
     }
+    if keep_records:
+        # 只有需要逐笔明细（绘图、导出）时才构造DataFrame
+        investment_records = pd.DataFrame({
+            'Date': dates,
+            'Price': prices,
+            'Amount': amounts,
+            'Shares': shares,
+            'Cumulative_Amount': np.cumsum(amounts),
+            'Cumulative_Shares': cumulative_shares,
+        })
+        result['investment_records'] = investment_records
+    if reinvest_dividends:
+        result['final_shares'] = final_shares
+        result['dividend_shares'] = final_shares - shares.sum()
+    if benchmark is not None:
+        with instrumentation.span('benchmark', 'backtest'):
+            result.update(benchmark.relative_metrics(stock_data, positions, amounts, result, end_date,
+                                                     reinvest_dividends))
+    return result
 
-def compare_with_lump_sum(stock_data: pd.DataFrame, amount: float,
-                         start_date: str, end_date: str, strategy: str = 'weekly', strategy_params: Dict[str, Any] = None) -> Dict:
+@instrumentation.traced('lump_sum', 'backtest')
+def compare_with_lump_sum(stock_data: pd.DataFrame, amount: Union[float, np.ndarray],
+                         start_date: str, end_date: str, strategy: str = 'weekly', strategy_params: Dict[str, Any] = None,
+                         reinvest_dividends: bool = False, calendar=None, keep_records: bool = True,
+                         benchmark=None, signal: Union[str, Callable, None] = None,
+                         signal_params: Dict[str, Any] = None) -> Dict:
     """
     与一次性投资进行比较
     
     Args:
         stock_data: 股票数据
-        amount: 每期定投金额
+        amount: 每期定投金额，或与定投日期对齐的金额数组
         start_date: 开始日期
         end_date: 结束日期
         strategy: 定投策略 ('weekly' 或 'monthly')
         strategy_params: 策略参数
+        reinvest_dividends: 是否将分红再投资（两种策略同时生效，需使用未复权价格）
+        calendar: 共享的 TradingCalendar
+        keep_records: 是否在定投结果中构造 investment_records
+        benchmark: Benchmark 基准；提供时定投结果包含相对基准的指标，并增加 lump_sum_excess_return
+        signal: 信号策略名称或策略函数（一次性投资投入与定投相同的总金额）
+        signal_params: 信号策略参数
         
     Returns:
         比较结果字典
     """
     # 定投结果
-    drip_result = run_backtest(stock_data, amount, start_date, end_date, strategy, strategy_params)
+    drip_result = run_backtest(stock_data, amount, start_date, end_date, strategy, strategy_params,
+                               reinvest_dividends, calendar, keep_records, benchmark, signal, signal_params)
     
     if not drip_result:
         return {}
@@ -122,18 +246,112 @@ def compare_with_lump_sum(stock_data: pd.DataFrame, amount: float,
     
     initial_price = start_prices['Close'].iloc[0]
     lump_sum_shares = drip_result['total_investment'] / initial_price
+    if reinvest_dividends:
+        growth = total_return_factors(stock_data)
+        start_position = len(stock_data) - len(start_prices)
+        lump_sum_shares *= growth[_final_position(end_date, stock_data)] / growth[start_position]
     
-    final_date = pd.to_datetime(end_date)
-    final_price = _get_price_on_or_near(final_date, stock_data)
-    if pd.isna(final_price):
-        final_price = stock_data['Close'].iloc[-1] # Fallback
+    final_price = _final_price(stock_data, end_date)
 
     lump_sum_value = lump_sum_shares * final_price
     lump_sum_return = (lump_sum_value - drip_result['total_investment']) / drip_result['total_investment'] * 100
     
-    return {
+    comparison = {
         'drip_result': drip_result,
         'lump_sum_value': lump_sum_value,
         'lump_sum_return': lump_sum_return,
         'difference': drip_result['total_return'] - lump_sum_return
-    }
\ No newline at end of file
+    }
+    if benchmark is not None:
+        # 基准与股票在同一天一次性买入
+        comparison['lump_sum_excess_return'] = lump_sum_return - benchmark.lump_sum_return(
+            start_prices.index[0], end_date, reinvest_dividends)
+    return comparison
+
+def equity_curve(stock_data: pd.DataFrame, result: Dict, end_date=None) -> pd.DataFrame:
+    """
+    计算定投组合的逐日净值曲线
+
+    Args:
+        stock_data: 回测使用的股票数据
+        result: run_backtest 的结果（需包含 investment_records）；分红再投资模式的结果
+            （包含 final_shares）会按累计持股倍数计入分红再投资
+        end_date: 曲线结束日期，默认为最后一个交易日
+
+    Returns:
+        从第一次定投到结束日期、每个交易日一行的DataFrame：
+        Date / Close / Cumulative_Amount / Cumulative_Shares / Value
+    """
+    records = result['investment_records']
+    index = stock_data.index
+    close = stock_data['Close'].to_numpy(dtype=float)
+    purchases = index.searchsorted(pd.DatetimeIndex(records['Date']), side='left')
+    last = _final_position(end_date, stock_data) if end_date is not None else len(index) - 1
+    bars = np.arange(purchases[0], last + 1)
+
+    # 每个交易日对应此前（含当天）最后一次定投
+    latest = np.searchsorted(purchases, bars, side='right') - 1
+    cumulative_amount = records['Cumulative_Amount'].to_numpy(dtype=float)[latest]
+    cumulative_shares = records['Cumulative_Shares'].to_numpy(dtype=float)[latest]
+    if 'final_shares' in result:
+        # 两次定投之间持股按分红再投资的累计倍数增长
+        growth = total_return_factors(stock_data)
+        cumulative_shares = cumulative_shares * growth[bars] / growth[purchases[latest]]
+
+    return pd.DataFrame({
+        'Date': index[bars],
+        'Close': close[bars],
+        'Cumulative_Amount': cumulative_amount,
+        'Cumulative_Shares': cumulative_shares,
+        'Value': cumulative_shares * close[bars],
+    })
+
+def run_contribution_sweep(stock_data: pd.DataFrame, amounts: np.ndarray, start_date: str, end_date: str,
+                           strategy: str = 'weekly', strategy_params: Dict[str, Any] = None,
+                           calendar=None) -> pd.DataFrame:
+    """
+    在同一定投计划下批量比较多组每期金额（例如不同的年递增比例）
+
+    所有方案共享交易日位置和买入价格，股数、终值和资金加权收益率对整个金额矩阵一次算出。
+
+    Args:
+        stock_data: 股票数据
+        amounts: 形状为 (方案数, 定投日期数) 的金额矩阵，例如 contribution_amounts(dates, 100, growth_rate=rates)
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        calendar: 共享的 TradingCalendar
+
+    Returns:
+        每个方案一行的DataFrame，包含 total_investment、final_value、total_return、annual_return、xirr
+    """
+    positions = _schedule_positions(stock_data, strategy, start_date, end_date, strategy_params, calendar)
+    amounts = schedule_amounts(np.atleast_2d(amounts), len(positions))
+    columns = ['total_investment', 'final_value', 'total_return', 'annual_return', 'xirr']
+    if len(positions) == 0:
+        return pd.DataFrame(columns=columns)
+
+    with instrumentation.span('aggregation', 'backtest'):
+        prices = stock_data['Close'].to_numpy(dtype=float)[positions]
+        final_price = _final_price(stock_data, end_date)
+
+        # 每个方案的终值 = 金额矩阵 × 每单位金额买到的股数
+        final_value = amounts @ (1 / prices) * final_price
+        total_investment = amounts.sum(axis=1)
+        total_return = (final_value - total_investment) / total_investment * 100
+        years = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days / 365.25
+        annual_return = ((final_value / total_investment) ** (1 / years) - 1) * 100 if years > 0 \
+            else np.zeros(len(amounts))
+
+        flows = schedule_cashflows(stock_data.index[positions], amounts[0], 0.0, end_date)
+        cashflows = np.concatenate([-amounts, final_value[:, None]], axis=1)
+        xirr_percent = xirr_batch(cashflows, flows['years']) * 100
+
+    return pd.DataFrame({
+        'total_investment': total_investment,
+        'final_value': final_value,
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'xirr': xirr_percent,
+    }, columns=columns)
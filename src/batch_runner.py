@@ -0,0 +1,545 @@
+"""
+批量回测模块
+
+将多个股票的价格数据放入共享内存，按股票分块分派给进程池。
+子进程直接映射共享内存中的数组，不需要序列化传输DataFrame；结果在完成时逐块流式返回。
+进程池在多次调用之间复用（参数扫描的每个参数组合不再重新启动子进程），
+每凑满一块就立即分派，加载后续股票的同时子进程已经在计算前面的块。
+开启埋点时子进程记录的阶段计时和内存统计随每块的结果返回，合并到主进程的报告中。
+基准数据在每次运行时放入共享内存一次，各块只传递基准的指纹和共享内存名称；子进程按指纹缓存
+基准对象，其定投结果和对齐缓存在同一子进程处理的所有块之间复用。
+"""
+import atexit
+import threading
+import pandas as pd
+import numpy as np
+from collections import deque
+from typing import Dict, Any, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from backtest import run_backtest, compare_with_lump_sum
+from trading_calendar import TradingCalendar
+from results_store import new_run_id
+from streaming_stats import StreamingSummary, DEFAULT_METRICS
+from data_fetcher import validate_stock_data
+from benchmark import Benchmark
+import instrumentation
+
+# 每个交易日在共享内存中占用的字节数（float64 收盘价 + int64 时间戳）
+BYTES_PER_BAR = 16
+# 分红再投资需要的列，存在时与收盘价一起放入共享内存
+EXTRA_COLUMNS = ('Dividends', 'Stock Splits')
+
+# 子进程中按指纹缓存的基准对象数
+WORKER_BENCHMARK_CACHE_SIZE = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers: Optional[int] = None
+_pool_lock = threading.Lock()
+# 子进程：基准指纹到基准对象
+_worker_benchmarks: Dict[str, Benchmark] = {}
+
+def process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    获取进程内共享的进程池（进程数变化或进程池损坏时重新创建）
+
+    Args:
+        max_workers: 最大进程数，默认为CPU核数
+
+    Returns:
+        ProcessPoolExecutor，在解释器退出时关闭
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and (_pool_workers != max_workers or getattr(_pool, '_broken', False)):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, initializer=instrumentation.init_worker,
+                                        initargs=(instrumentation.worker_config(),))
+            _pool_workers = max_workers
+        return _pool
+
+def shutdown_process_pool():
+    """关闭共享进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown_process_pool)
+
+class SharedUniverse:
+    """
+    共享内存中的一组股票数据
+
+    所有股票的收盘价和时间戳分别拼接为连续数组，layout 记录每个股票的切片位置和时区。
+    任一股票包含 Dividends / Stock Splits 列时这些列也放入共享内存（缺少该列的股票填0）。
+    """
+
+    def __init__(self, data_dict: Dict[str, pd.DataFrame]):
+        """
+        Args:
+            data_dict: 股票代码到股票数据的字典
+        """
+        self.layout: Dict[str, Tuple[int, int, Optional[str]]] = {}
+        total = sum(len(data) for data in data_dict.values())
+        columns = ['Close'] + [column for column in EXTRA_COLUMNS
+                               if any(column in data.columns for data in data_dict.values())]
+
+        # SharedMemory 不允许大小为0
+        self._shms = {name: shared_memory.SharedMemory(create=True, size=max(total, 1) * 8)
+                      for name in ['index'] + columns}
+        arrays = self._arrays(total)
+
+        offset = 0
+        for symbol, data in data_dict.items():
+            index = pd.DatetimeIndex(data.index)
+            tz = str(index.tz) if index.tz is not None else None
+            if tz is not None:
+                index = index.tz_convert('UTC').tz_localize(None)
+            stop = offset + len(data)
+            arrays['index'][offset:stop] = index.as_unit('ns').asi8
+            for column in columns:
+                arrays[column][offset:stop] = data[column].to_numpy(dtype=np.float64) \
+                    if column in data.columns else 0.0
+            self.layout[symbol] = (offset, stop, tz)
+            offset = stop
+
+        self.size = total
+
+    def _arrays(self, size: int) -> Dict[str, np.ndarray]:
+        return _map_arrays(self._shms, size)
+
+    @property
+    def names(self) -> Dict[str, str]:
+        """列名（时间戳为 'index'）到共享内存块名称的映射，子进程据此映射数据"""
+        return {column: shm.name for column, shm in self._shms.items()}
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """在当前进程中读取某个股票的数据副本（用于检查）"""
+        return _build_frame(self._arrays(self.size), self.layout[symbol]).copy()
+
+    def close(self):
+        """释放共享内存"""
+        for shm in self._shms.values():
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def _map_arrays(shms: Dict[str, shared_memory.SharedMemory], size: int) -> Dict[str, np.ndarray]:
+    """将共享内存块映射为数组（时间戳为 int64，其余列为 float64）"""
+    return {column: np.ndarray((size,), dtype=np.int64 if column == 'index' else np.float64, buffer=shm.buf)
+            for column, shm in shms.items()}
+
+def _build_frame(arrays: Dict[str, np.ndarray], layout: Tuple[int, int, Optional[str]]) -> pd.DataFrame:
+    """根据共享数组中的切片构造DataFrame（Close 列，以及共享内存中有的 Dividends / Stock Splits 列）"""
+    start, stop, tz = layout
+    index = pd.DatetimeIndex(arrays['index'][start:stop].view('M8[ns]'))
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return pd.DataFrame({column: values[start:stop] for column, values in arrays.items() if column != 'index'},
+                        index=index, copy=False)
+
+def strip_records(result: Dict) -> Dict:
+    """去掉结果中的 investment_records，只保留标量指标（跨进程传输更轻）"""
+    if not result:
+        return result
+    stripped = {key: value for key, value in result.items() if key != 'investment_records'}
+    if 'drip_result' in stripped:
+        stripped['drip_result'] = strip_records(stripped['drip_result'])
+    return stripped
+
+def _share_benchmark(params: Dict) -> Tuple[Optional[SharedUniverse], Dict]:
+    """把基准数据放入共享内存，返回 (共享内存, 用基准句柄替换基准对象后的参数)"""
+    benchmark = params.get('benchmark')
+    if not isinstance(benchmark, Benchmark):
+        return None, params
+    universe = SharedUniverse({benchmark.symbol: benchmark.data})
+    handle = {
+        'fingerprint': benchmark.fingerprint,
+        'symbol': benchmark.symbol,
+        'names': universe.names,
+        'size': universe.size,
+        'layout': universe.layout[benchmark.symbol],
+    }
+    return universe, dict(params, benchmark=handle)
+
+def _worker_benchmark(handle: Optional[Dict]) -> Optional[Benchmark]:
+    """子进程：按指纹取出缓存的基准对象，第一次使用时从共享内存复制数据构造"""
+    if handle is None:
+        return None
+    benchmark = _worker_benchmarks.get(handle['fingerprint'])
+    if benchmark is None:
+        shms = {column: shared_memory.SharedMemory(name=name) for column, name in handle['names'].items()}
+        try:
+            data = _build_frame(_map_arrays(shms, handle['size']), handle['layout']).copy()
+        finally:
+            for shm in shms.values():
+                shm.close()
+        benchmark = Benchmark(data, handle['symbol'])
+        if len(_worker_benchmarks) >= WORKER_BENCHMARK_CACHE_SIZE:
+            _worker_benchmarks.clear()
+        _worker_benchmarks[handle['fingerprint']] = benchmark
+    return benchmark
+
+def _run_chunk(names: Dict[str, str], size: int, layouts: List[Tuple[str, Tuple]], params: Dict) -> List[Tuple[str, Dict]]:
+    """子进程：映射共享内存并对一组股票运行回测"""
+    if isinstance(params.get('benchmark'), dict):
+        params = dict(params, benchmark=_worker_benchmark(params['benchmark']))
+    shms = {column: shared_memory.SharedMemory(name=name) for column, name in names.items()}
+    try:
+        arrays = _map_arrays(shms, size)
+        results = []
+        calendar = None
+        for symbol, layout in layouts:
+            stock_data = _build_frame(arrays, layout)
+            # 同一块中的股票通常共享交易日，以第一个股票的索引作为日历
+            if calendar is None:
+                calendar = TradingCalendar(stock_data.index)
+            results.append((symbol, _run_single(stock_data, params, calendar)))
+        return results
+    finally:
+        # 释放对共享内存的引用后才能关闭映射
+        arrays = stock_data = calendar = None
+        for shm in shms.values():
+            shm.close()
+
+def _traced_chunk(config: Optional[Dict], worker: Callable, *args) -> Tuple[Any, Dict]:
+    """子进程：按主进程的埋点设置运行一块任务，返回 (结果, 本块记录的埋点数据)"""
+    instrumentation.ensure_worker(config)
+    return worker(*args), instrumentation.drain()
+
+def _summarize_chunk(names: Dict[str, str], size: int, layouts: List[Tuple[str, Tuple]],
+                     params: Dict) -> List[StreamingSummary]:
+    """子进程：对一组股票运行回测，只返回这组结果的流式汇总"""
+    metrics, relative_accuracy = params['summary']
+    summary = StreamingSummary(metrics, relative_accuracy)
+    for _, result in _run_chunk(names, size, layouts, params):
+        summary.update(result)
+    return [summary]
+
+def _run_single(stock_data: pd.DataFrame, params: Dict, calendar: Optional[TradingCalendar] = None) -> Dict:
+    """对单个股票运行回测（在子进程或当前进程中）"""
+    func = compare_with_lump_sum if params['compare'] else run_backtest
+    try:
+        result = func(stock_data, params['amount'], params['start_date'], params['end_date'],
+                      params['strategy'], params['strategy_params'],
+                      reinvest_dividends=params.get('reinvest_dividends', False), calendar=calendar,
+                      keep_records=params['keep_records'], benchmark=params.get('benchmark'),
+                      signal=params.get('signal'), signal_params=params.get('signal_params'))
+    except Exception as e:
+        return {'error': str(e)}
+    return result
+
+def iter_universe_backtest(data: Union[Dict[str, pd.DataFrame], Callable[[str], Optional[pd.DataFrame]]],
+                           amount: float, start_date: str, end_date: str, strategy: str = 'weekly',
+                           strategy_params: Dict[str, Any] = None, compare: bool = False,
+                           symbols: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                           chunk_size: int = 32, memory_budget_mb: Optional[float] = None,
+                           keep_records: bool = False, validate: bool = False,
+                           health: Optional[Dict[str, Dict]] = None, benchmark=None,
+                           signal: Optional[str] = None, signal_params: Dict[str, Any] = None,
+                           reinvest_dividends: bool = False,
+                           executor: Optional[ProcessPoolExecutor] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    对一组股票批量运行回测，按完成顺序逐个返回结果
+
+    Args:
+        data: 股票代码到股票数据的字典，或按股票代码加载数据的函数（配合 symbols 使用，
+            只有当前批次的数据驻留内存）
+        amount: 每期定投金额
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        compare: 是否与一次性投资比较
+        symbols: 股票代码列表，data 为函数时必填
+        max_workers: 最大进程数，默认为CPU核数；为1时在当前进程中顺序执行
+        chunk_size: 每个任务包含的股票数
+        memory_budget_mb: 共享内存中同时驻留的数据上限（MB），None表示不限制；达到上限时等待已分派的块完成
+        keep_records: 是否在结果中保留 investment_records
+        validate: 是否在回测前校验并修复每个股票的数据（见 validate_stock_data）
+        health: 提供时写入每个股票的数据校验报告，可用 data_health_report 汇总
+        benchmark: Benchmark 基准；多进程时基准数据每次运行放入共享内存一次，子进程按指纹缓存基准对象，
+            在其处理的所有块之间复用基准结果和对齐缓存
+        signal: 信号策略名称（多进程时需为注册的名称）
+        signal_params: 信号策略参数
+        reinvest_dividends: 是否将分红再投资（Dividends 列随收盘价一起放入共享内存）
+        executor: 使用的进程池，默认为进程内共享的进程池（见 process_pool），多次调用之间复用
+
+    Yields:
+        (股票代码, 回测结果) 元组
+    """
+    params = {
+        'amount': amount,
+        'start_date': start_date,
+        'end_date': end_date,
+        'strategy': strategy,
+        'strategy_params': strategy_params or {},
+        'compare': compare,
+        'keep_records': keep_records,
+        'benchmark': benchmark,
+        'signal': signal,
+        'signal_params': signal_params,
+        'reinvest_dividends': reinvest_dividends,
+    }
+    loader, symbols = _resolve_loader(data, symbols)
+    if validate:
+        loader = _validating_loader(loader, health)
+
+    if max_workers == 1:
+        _prepare_benchmark(benchmark, amount, strategy, start_date, end_date, strategy_params, signal,
+                           reinvest_dividends)
+        calendar = None
+        for symbol in symbols:
+            stock_data = loader(symbol)
+            if stock_data is not None and not stock_data.empty:
+                instrumentation.record_resident(symbol, stock_data)
+                if calendar is None:
+                    calendar = TradingCalendar(stock_data.index)
+                yield symbol, _run_single(stock_data, params, calendar)
+        return
+
+    yield from _dispatch(loader, symbols, params, executor, max_workers, chunk_size, memory_budget_mb, _run_chunk)
+
+def _resolve_loader(data, symbols: Optional[List[str]]) -> Tuple[Callable[[str], Optional[pd.DataFrame]], List[str]]:
+    """将数据字典或加载函数统一为 (加载函数, 股票代码列表)"""
+    if callable(data):
+        if symbols is None:
+            raise ValueError("data 为加载函数时必须提供 symbols")
+        return data, symbols
+    return data.get, (list(data) if symbols is None else symbols)
+
+def _prepare_benchmark(benchmark, amount, strategy: str, start_date: str, end_date: str,
+                       strategy_params: Dict[str, Any] = None, signal=None, reinvest_dividends: bool = False):
+    """
+    在当前进程中顺序执行前，预先计算基准在自身交易日上按本次定投计划买入的结果；
+    交易日与基准相同的股票直接命中（金额数组和信号策略使每个股票的现金流不同，不预先计算）。
+    多进程时由子进程中缓存的基准对象在第一次遇到这组现金流时计算并复用
+    """
+    if benchmark is not None and signal is None and np.ndim(amount) == 0:
+        positions = benchmark.calendar.positions_for(benchmark.data.index, strategy, start_date, end_date,
+                                                     strategy_params or {})
+        if len(positions):
+            benchmark.schedule_result(benchmark.data.index[positions], amount, end_date, reinvest_dividends)
+    return benchmark
+
+def _validating_loader(loader: Callable[[str], Optional[pd.DataFrame]],
+                       health: Optional[Dict[str, Dict]]) -> Callable[[str], Optional[pd.DataFrame]]:
+    """包装加载函数：加载后校验并修复数据，把校验报告写入 health"""
+    def load(symbol: str) -> Optional[pd.DataFrame]:
+        stock_data = loader(symbol)
+        if stock_data is None or stock_data.empty:
+            return stock_data
+        stock_data, report = validate_stock_data(stock_data)
+        if health is not None:
+            health[symbol] = report
+        return stock_data
+    return load
+
+def _dispatch(loader: Callable[[str], Optional[pd.DataFrame]], symbols: List[str], params: Dict,
+              executor: Optional[ProcessPoolExecutor], max_workers: Optional[int], chunk_size: int,
+              memory_budget_mb: Optional[float], worker: Callable) -> Iterator:
+    """
+    逐个加载数据，每凑满一块（chunk_size 个股票，或达到内存预算）就放入共享内存分派给进程池
+
+    加载下一块的同时已分派的块在子进程中计算，完成的结果在两次加载之间及时返回；
+    分派新块前若共享内存中驻留的数据会超出预算，先等待较早的块完成并释放共享内存。
+    """
+    if executor is None:
+        executor = process_pool(max_workers)
+    benchmark_universe, params = _share_benchmark(params)
+    budget = None if memory_budget_mb is None else memory_budget_mb * 1024 * 1024
+    # (共享内存, future, 字节数)
+    in_flight: deque = deque()
+    resident = 0
+
+    def collect(block: bool) -> Iterator:
+        nonlocal resident
+        if block and in_flight:
+            wait([future for _, future, _ in in_flight], return_when=FIRST_COMPLETED)
+        for entry in [entry for entry in in_flight if entry[1].done()]:
+            in_flight.remove(entry)
+            universe, future, nbytes = entry
+            try:
+                items, telemetry = future.result()
+                instrumentation.merge(telemetry)
+                yield from items
+            finally:
+                universe.close()
+                resident -= nbytes
+
+    def submit(chunk: Dict[str, pd.DataFrame], nbytes: int):
+        nonlocal resident
+        with instrumentation.span('shared_memory', 'batch_runner', symbols=len(chunk)):
+            universe = SharedUniverse(chunk)
+        chunk.clear()
+        future = executor.submit(_traced_chunk, instrumentation.worker_config(), worker, universe.names,
+                                 universe.size, list(universe.layout.items()), params)
+        in_flight.append((universe, future, nbytes))
+        resident += nbytes
+
+    chunk: Dict[str, pd.DataFrame] = {}
+    chunk_bytes = 0
+    try:
+        for symbol in symbols:
+            stock_data = loader(symbol)
+            if stock_data is None or stock_data.empty:
+                continue
+            nbytes = len(stock_data) * BYTES_PER_BAR
+            if chunk and (len(chunk) >= chunk_size or (budget is not None and chunk_bytes + nbytes > budget)):
+                while budget is not None and in_flight and resident + chunk_bytes > budget:
+                    yield from collect(block=True)
+                submit(chunk, chunk_bytes)
+                chunk, chunk_bytes = {}, 0
+            chunk[symbol] = stock_data
+            chunk_bytes += nbytes
+            instrumentation.record_resident(symbol, stock_data)
+            yield from collect(block=False)
+        if chunk:
+            while budget is not None and in_flight and resident + chunk_bytes > budget:
+                yield from collect(block=True)
+            submit(chunk, chunk_bytes)
+        while in_flight:
+            yield from collect(block=True)
+    except BrokenProcessPool:
+        # 子进程异常退出后进程池不可再用，下次调用时重新创建
+        shutdown_process_pool()
+        raise
+    finally:
+        # 消费者提前结束或出错时释放仍在计算的块
+        for universe, future, _ in in_flight:
+            future.cancel()
+            try:
+                future.result()
+            except BaseException:
+                pass
+            universe.close()
+        if benchmark_universe is not None:
+            benchmark_universe.close()
+
+def run_universe_backtest(data: Union[Dict[str, pd.DataFrame], Callable[[str], Optional[pd.DataFrame]]],
+                          amount: float, start_date: str, end_date: str, strategy: str = 'weekly',
+                          strategy_params: Dict[str, Any] = None, compare: bool = False,
+                          on_result: Optional[Callable[[str, Dict], None]] = None, store=None,
+                          run_id: Optional[str] = None, summary: Optional[StreamingSummary] = None,
+                          **kwargs) -> Dict[str, Dict]:
+    """
+    对一组股票批量运行回测并合并结果
+
+    提供 store 时结果按完成顺序直接写入结果存储，不在内存中累积（返回空字典）。
+
+    Args:
+        data: 股票代码到股票数据的字典，或按股票代码加载数据的函数
+        amount: 每期定投金额
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        compare: 是否与一次性投资比较
+        on_result: 每收到一个结果时调用的回调 (symbol, result)
+        store: ResultsStore 结果存储
+        run_id: 写入结果存储时使用的运行批次ID，默认自动生成
+        summary: StreamingSummary 流式汇总，每收到一个结果时更新
+        **kwargs: 传给 iter_universe_backtest 的其他参数
+
+    Returns:
+        股票代码到回测结果的字典
+    """
+    if store is not None and run_id is None:
+        run_id = new_run_id()
+    results = {}
+    for symbol, result in iter_universe_backtest(data, amount, start_date, end_date, strategy,
+                                                 strategy_params, compare, **kwargs):
+        if summary is not None:
+            summary.update(result)
+        if store is not None:
+            store.append(run_id, symbol, result)
+        else:
+            results[symbol] = result
+        if on_result is not None:
+            on_result(symbol, result)
+    if store is not None:
+        store.flush()
+    return results
+
+def summarize_universe_backtest(data: Union[Dict[str, pd.DataFrame], Callable[[str], Optional[pd.DataFrame]]],
+                                amount: float, start_date: str, end_date: str, strategy: str = 'weekly',
+                                strategy_params: Dict[str, Any] = None, compare: bool = False,
+                                metrics: Sequence[str] = DEFAULT_METRICS, relative_accuracy: float = 0.01,
+                                symbols: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                                chunk_size: int = 32, memory_budget_mb: Optional[float] = None,
+                                validate: bool = False, health: Optional[Dict[str, Dict]] = None,
+                                benchmark=None, signal: Optional[str] = None,
+                                signal_params: Dict[str, Any] = None, reinvest_dividends: bool = False,
+                                executor: Optional[ProcessPoolExecutor] = None) -> StreamingSummary:
+    """
+    对一组股票批量运行回测，只保留流式汇总（内存占用与股票数量无关）
+
+    每个子进程汇总自己那一块股票的结果，主进程只合并汇总对象。
+
+    Args:
+        data: 股票代码到股票数据的字典，或按股票代码加载数据的函数
+        amount: 每期定投金额
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        compare: 是否与一次性投资比较（指标名使用 'drip_result.total_return'、'difference' 等）
+        metrics: 需要汇总的指标
+        relative_accuracy: 分位数估计的相对误差
+        symbols: 股票代码列表，data 为函数时必填
+        max_workers: 最大进程数；为1时在当前进程中顺序执行
+        chunk_size: 每个任务包含的股票数
+        memory_budget_mb: 共享内存中同时驻留的数据上限（MB）
+        validate: 是否在回测前校验并修复每个股票的数据
+        health: 提供时写入每个股票的数据校验报告
+        benchmark: Benchmark 基准（指标可使用 'excess_return'、'tracking_error'、'beta' 等）
+        signal: 信号策略名称
+        signal_params: 信号策略参数
+        reinvest_dividends: 是否将分红再投资
+        executor: 使用的进程池，默认为进程内共享的进程池
+
+    Returns:
+        合并后的 StreamingSummary
+    """
+    summary = StreamingSummary(metrics, relative_accuracy)
+    if max_workers == 1:
+        for _, result in iter_universe_backtest(data, amount, start_date, end_date, strategy, strategy_params,
+                                                compare, symbols, max_workers=1, validate=validate,
+                                                health=health, benchmark=benchmark, signal=signal,
+                                                signal_params=signal_params, reinvest_dividends=reinvest_dividends):
+            summary.update(result)
+        return summary
+
+    params = {
+        'amount': amount,
+        'start_date': start_date,
+        'end_date': end_date,
+        'strategy': strategy,
+        'strategy_params': strategy_params or {},
+        'compare': compare,
+        'keep_records': False,
+        'benchmark': benchmark,
+        'signal': signal,
+        'signal_params': signal_params,
+        'reinvest_dividends': reinvest_dividends,
+        'summary': (tuple(metrics), relative_accuracy),
+    }
+    loader, symbols = _resolve_loader(data, symbols)
+    if validate:
+        loader = _validating_loader(loader, health)
+    for part in _dispatch(loader, symbols, params, executor, max_workers, chunk_size, memory_budget_mb,
+                          _summarize_chunk):
+        summary.merge(part)
+    return summary
@@ -0,0 +1,240 @@
+"""
+基准比较模块
+
+把同一组现金流（股票实际的定投日期和金额，包括信号策略过滤和逐期金额数组之后的结果）同时投入基准
+（例如 SPY），报告相对基准的超额收益、跟踪误差和贝塔。基准在每组现金流下的结果按 (定投日期, 金额)
+的指纹缓存，价格序列与股票交易日的对齐结果也会缓存，批量回测时交易日相同的股票共享同一条缓存。
+"""
+import hashlib
+from typing import Dict, Optional
+
+import pandas as pd
+import numpy as np
+
+from backtest import total_return_factors, _final_position
+from trading_calendar import TradingCalendar
+from xirr import xirr_batch, schedule_cashflows
+import instrumentation
+
+# 对齐结果缓存的最大条目数（只有交易日不是基准日历中连续一段的股票才需要缓存）
+ALIGNMENT_CACHE_SIZE = 256
+# 基准定投结果缓存的最大条目数
+SCHEDULE_CACHE_SIZE = 1024
+
+class Benchmark:
+    """
+    基准数据及其缓存
+
+    缓存键为 (定投日期和金额的指纹, 结束日期, 是否分红再投资)，值为基准在这组现金流下的结果；
+    定投日期相同、金额相同（或都是同一个常数）的股票共享同一条缓存。
+    """
+
+    def __init__(self, data: pd.DataFrame, symbol: str = 'SPY'):
+        """
+        Args:
+            data: 基准的价格数据（需包含 Close 列；分红再投资模式需未按分红复权的价格及 Dividends 列）
+            symbol: 基准代码，仅用于显示
+        """
+        self.symbol = symbol
+        self.data = data
+        self.calendar = TradingCalendar(data.index)
+        self._close = data['Close'].to_numpy(dtype=float)
+        self._total_return_close = None
+        self._results: Dict[tuple, Dict[str, float]] = {}
+        self._alignments: Dict[tuple, np.ndarray] = {}
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self) -> str:
+        """基准代码和价格数据的指纹，用于识别同一基准（子进程缓存、检查点配置）"""
+        if self._fingerprint is None:
+            index = pd.DatetimeIndex(self.data.index)
+            digest = hashlib.sha1(f"{self.symbol}|{index.tz}".encode())
+            digest.update(np.ascontiguousarray(index.as_unit('ns').asi8))
+            for column in ('Close', 'Dividends', 'Stock Splits'):
+                if column in self.data.columns:
+                    digest.update(column.encode())
+                    digest.update(np.ascontiguousarray(self.data[column].to_numpy(dtype=float)))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def _to_calendar_tz(self, dates: pd.DatetimeIndex) -> pd.DatetimeIndex:
+        """将日期转换为基准日历的时区，便于 searchsorted"""
+        if self.calendar.index.tz is not None:
+            return dates.tz_localize(self.calendar.index.tz) if dates.tz is None \
+                else dates.tz_convert(self.calendar.index.tz)
+        return dates.tz_localize(None) if dates.tz is not None else dates
+
+    def schedule_result(self, dates: pd.DatetimeIndex, amounts: np.ndarray, end_date: str,
+                        reinvest_dividends: bool = False) -> Dict[str, float]:
+        """
+        获取基准在给定现金流下的结果（有缓存）：在每个定投日（当天或之前最近的基准交易日收盘）
+        按相同金额买入基准，持有到结束日期
+
+        Args:
+            dates: 定投日期（股票的交易日）
+            amounts: 每次定投的金额
+            end_date: 结束日期
+            reinvest_dividends: 是否将分红再投资
+
+        Returns:
+            包含 total_return、xirr 的字典（百分比）；基准在第一次定投前没有数据时为NaN
+        """
+        index = pd.DatetimeIndex(dates)
+        amounts = np.ascontiguousarray(np.broadcast_to(np.asarray(amounts, dtype=float), (len(index),)))
+        digest = hashlib.sha1(np.ascontiguousarray(index.asi8))
+        digest.update(amounts)
+        key = (str(index.tz), index.unit, digest.hexdigest(), end_date, reinvest_dividends)
+        result = self._results.get(key)
+        if result is not None:
+            instrumentation.count('benchmark.hit')
+            return result
+
+        instrumentation.count('benchmark.miss')
+        series = self._series(reinvest_dividends)
+        positions = self.calendar.index.searchsorted(self._to_calendar_tz(index), side='right') - 1
+        result = {'total_return': np.nan, 'xirr': np.nan}
+        if len(positions) and positions.min() >= 0:
+            final_value = float((amounts / series[positions]).sum()
+                                * series[_final_position(end_date, self.data)])
+            total_investment = amounts.sum()
+            flows = schedule_cashflows(index, amounts, final_value, end_date)
+            result = {
+                'total_return': (final_value - total_investment) / total_investment * 100,
+                'xirr': float(xirr_batch(flows['cashflows'], flows['years'])[0]) * 100,
+            }
+        if len(self._results) >= SCHEDULE_CACHE_SIZE:
+            self._results.clear()
+        self._results[key] = result
+        return result
+
+    def _series(self, reinvest_dividends: bool) -> np.ndarray:
+        """基准的价格序列；分红再投资时为含分红再投资的全收益序列"""
+        if not reinvest_dividends:
+            return self._close
+        if self._total_return_close is None:
+            self._total_return_close = self._close * total_return_factors(self.data)
+        return self._total_return_close
+
+    def aligned_positions(self, trading_index: pd.DatetimeIndex) -> Optional[np.ndarray]:
+        """
+        获取股票每个交易日对应的基准交易日位置（当天或之前最近的基准交易日）
+
+        Args:
+            trading_index: 股票数据的交易日索引
+
+        Returns:
+            位置数组（-1 表示基准在该日之前没有数据）；索引是基准日历中连续的一段时返回None，
+            此时直接按偏移切片即可
+        """
+        if self.calendar.offset_of(trading_index) is not None:
+            return None
+
+        index = pd.DatetimeIndex(trading_index)
+        digest = hashlib.sha1(np.ascontiguousarray(index.asi8)).hexdigest()
+        key = (str(index.tz), index.unit, len(index), digest)
+        positions = self._alignments.get(key)
+        if positions is None:
+            instrumentation.count('benchmark.align')
+            positions = self.calendar.index.searchsorted(self._to_calendar_tz(index), side='right') - 1
+            positions.flags.writeable = False
+            if len(self._alignments) >= ALIGNMENT_CACHE_SIZE:
+                self._alignments.clear()
+            self._alignments[key] = positions
+        return positions
+
+    def aligned_close(self, trading_index: pd.DatetimeIndex, reinvest_dividends: bool = False) -> np.ndarray:
+        """
+        获取与股票交易日对齐的基准价格
+
+        Args:
+            trading_index: 股票数据的交易日索引
+            reinvest_dividends: 是否使用全收益序列
+
+        Returns:
+            与 trading_index 等长的价格数组，基准没有数据的日期为NaN
+        """
+        series = self._series(reinvest_dividends)
+        positions = self.aligned_positions(trading_index)
+        if positions is None:
+            offset = self.calendar.offset_of(trading_index)
+            return series[offset:offset + len(trading_index)]
+        return np.where(positions >= 0, series[np.maximum(positions, 0)], np.nan)
+
+    def relative_metrics(self, stock_data: pd.DataFrame, positions: np.ndarray, amounts: np.ndarray,
+                         result: Dict, end_date: str, reinvest_dividends: bool = False) -> Dict[str, float]:
+        """
+        计算定投结果相对基准的指标
+
+        基准按股票实际的定投日期和金额（信号策略过滤、逐期金额数组之后）买入，两边的现金流完全相同。
+        跟踪误差和贝塔按持仓期间（第一次定投到结束日期）股票与基准的逐期收益率计算；
+        单一股票的定投组合在持仓后的逐期收益率就是股票本身的收益率，与追加投入无关。
+
+        Args:
+            stock_data: 股票数据
+            positions: 定投交易日位置
+            amounts: 每次定投的金额
+            result: run_backtest 的结果
+            end_date: 结束日期
+            reinvest_dividends: 是否将分红再投资
+
+        Returns:
+            benchmark_return、benchmark_xirr、excess_return、excess_xirr（百分点）、
+            tracking_error（年化，百分比）和 beta
+        """
+        benchmark = self.schedule_result(stock_data.index[positions], amounts, end_date, reinvest_dividends)
+        benchmark_return = benchmark.get('total_return', np.nan)
+        benchmark_xirr = benchmark.get('xirr', np.nan)
+
+        first = int(positions[0])
+        last = _final_position(end_date, stock_data)
+        tracking_error = beta = np.nan
+        if last > first:
+            close = stock_data['Close'].to_numpy(dtype=float)
+            if reinvest_dividends:
+                close = close * total_return_factors(stock_data)
+            stock_prices = close[first:last + 1]
+            benchmark_prices = self.aligned_close(stock_data.index, reinvest_dividends)[first:last + 1]
+            stock_returns = stock_prices[1:] / stock_prices[:-1] - 1
+            benchmark_returns = benchmark_prices[1:] / benchmark_prices[:-1] - 1
+            valid = np.isfinite(stock_returns) & np.isfinite(benchmark_returns)
+            stock_returns, benchmark_returns = stock_returns[valid], benchmark_returns[valid]
+            if len(stock_returns) > 1:
+                # 按实际数据频率年化（日线约252期/年，分钟线相应更多）
+                span = stock_data.index[last] - stock_data.index[first]
+                years = span / pd.Timedelta(days=365.25)
+                periods_per_year = len(stock_returns) / years if years > 0 else np.nan
+                tracking_error = float(np.std(stock_returns - benchmark_returns, ddof=1)
+                                       * np.sqrt(periods_per_year) * 100)
+                variance = np.var(benchmark_returns, ddof=1)
+                if variance > 0:
+                    covariance = np.cov(stock_returns, benchmark_returns, ddof=1)[0, 1]
+                    beta = float(covariance / variance)
+
+        return {
+            'benchmark_return': benchmark_return,
+            'benchmark_xirr': benchmark_xirr,
+            'excess_return': result['total_return'] - benchmark_return,
+            'excess_xirr': result['xirr'] - benchmark_xirr,
+            'tracking_error': tracking_error,
+            'beta': beta,
+        }
+
+    def lump_sum_return(self, start_date: str, end_date: str, reinvest_dividends: bool = False) -> float:
+        """
+        基准一次性投资的收益率（百分比）：开始日期当天或之后第一个基准交易日买入，持有到结束日期
+
+        Args:
+            start_date: 开始日期（与股票一次性投资的买入日相同）
+            end_date: 结束日期
+            reinvest_dividends: 是否将分红再投资
+
+        Returns:
+            收益率，基准在该区间内没有数据时为NaN
+        """
+        start = self.calendar.index.searchsorted(self._to_calendar_tz(pd.DatetimeIndex([start_date])))[0]
+        final = _final_position(end_date, self.data)
+        if start >= len(self.data) or final < start:
+            return np.nan
+        series = self._series(reinvest_dividends)
+        return float((series[final] / series[start] - 1) * 100)
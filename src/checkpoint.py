@@ -0,0 +1,137 @@
+"""
+断点续跑模块
+
+长时间运行的批量回测把每个已完成的工作单元及其结果追加写入 JSON Lines 检查点文件。
+写入先在内存中缓冲，按时间间隔或条数批量落盘，不拖慢回测本身；进程被杀死时最多丢失
+最后一个间隔内的结果。重启时读取检查点，跳过已完成的工作单元。
+出错的工作单元（结果为 {'error': ...}）不写入检查点，重启后会重新计算。
+"""
+import os
+import json
+import time
+from typing import Dict, Any, Optional
+
+import pandas as pd
+
+CHECKPOINT_VERSION = 1
+
+def _json_default(value):
+    # numpy 标量
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"无法写入检查点的类型: {type(value).__name__}")
+
+def _strip_frames(result):
+    # keep_records=True 时结果中带有 investment_records 等 DataFrame，检查点只保留标量指标
+    if isinstance(result, dict):
+        return {key: _strip_frames(value) for key, value in result.items()
+                if not isinstance(value, (pd.DataFrame, pd.Series))}
+    return result
+
+class Checkpoint:
+    """
+    追加写入的检查点文件
+
+    第一行为文件头（版本和运行配置），之后每行是一个已完成的工作单元：
+    {"unit": 工作单元键, "result": 结果}。崩溃时可能残留的不完整末行在加载时被忽略。
+    """
+
+    def __init__(self, path: str, config: Optional[Dict[str, Any]] = None,
+                 flush_interval: float = 5.0, flush_every: int = 1000):
+        """
+        Args:
+            path: 检查点文件路径，已存在时加载其中已完成的工作单元
+            config: 运行配置（需可JSON序列化）；与已有检查点的配置不一致时报错，防止混用不同的运行
+            flush_interval: 最长落盘间隔（秒），0表示每个单元都立即落盘
+            flush_every: 缓冲达到该条数时落盘
+        """
+        self.path = path
+        self.config = config or {}
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.results: Dict[str, Any] = {}
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._load()
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'version': CHECKPOINT_VERSION, 'config': self.config},
+                                        default=_json_default) + '\n')
+            self._sync()
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        lines = data.split(b'\n')
+        header = json.loads(lines[0])
+        if header.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"不支持的检查点版本: {header.get('version')}")
+        # 经过 JSON 往返后再比较，避免元组/列表等表示差异
+        expected = json.loads(json.dumps(self.config, default=_json_default))
+        if header.get('config') != expected:
+            raise ValueError("检查点的运行配置与当前运行不一致，请使用新的检查点文件")
+
+        valid_bytes = len(lines[0]) + 1
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 进程被杀死时写了一半的行：截掉它，后续从这里继续追加
+                break
+            self.results[entry['unit']] = entry['result']
+            valid_bytes += len(line) + 1
+        if valid_bytes < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def __contains__(self, unit: str) -> bool:
+        return unit in self.results
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def record(self, unit: str, result: Any):
+        """
+        记录一个已完成的工作单元
+
+        出错的结果不会被记录，以便重启后重试；结果中的 DataFrame / Series 字段会被丢弃。
+
+        Args:
+            unit: 工作单元键
+            result: 结果（需可JSON序列化，numpy 标量会被自动转换）
+        """
+        if isinstance(result, dict) and 'error' in result:
+            return
+        result = _strip_frames(result)
+        self.results[unit] = result
+        self._buffer.append(json.dumps({'unit': unit, 'result': result}, default=_json_default))
+        if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """将缓冲写入检查点文件"""
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+            self._sync()
+        self._last_flush = time.monotonic()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """落盘并关闭文件"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,173 @@
+"""
+分块回测模块
+
+分钟级等超长K线序列无法一次性放入一个DataFrame。这里从本地文件（CSV / Parquet）分块读取，
+逐块把定投日映射到K线位置，跨块只保留少量状态（下一个待执行的定投日、累计股数、
+一次性投资的买入价、截至结束日期的最新价格），峰值内存只取决于块大小而与历史长度无关。
+计算规则与 run_backtest / compare_with_lump_sum 一致。
+"""
+import os
+from typing import Dict, Any, Iterable, Iterator, Optional, Union
+
+import pandas as pd
+import numpy as np
+
+from investment_strategy import generate_investment_dates, schedule_amounts
+from xirr import xirr_batch, contribution_cashflows
+import instrumentation
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+def iter_bar_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, date_column: str = 'Date',
+                    tz: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    分块读取本地K线文件
+
+    支持 .csv 和 .parquet（需要安装 pyarrow）。文件需按时间升序排列，包含时间列和 Close 列。
+
+    Args:
+        path: 文件路径
+        chunk_size: 每块行数
+        date_column: 时间列名
+        tz: 时区；提供时按UTC解析时间后转换到该时区（适合带时区偏移的时间戳）
+
+    Yields:
+        以时间为索引、包含 Close 列的DataFrame块
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("读取 Parquet 文件需要安装 pyarrow: pip install pyarrow")
+        parquet_file = pq.ParquetFile(path)
+        chunks = (batch.to_pandas() for batch in
+                  parquet_file.iter_batches(batch_size=chunk_size, columns=[date_column, 'Close']))
+    elif extension == '.csv':
+        chunks = pd.read_csv(path, usecols=[date_column, 'Close'], chunksize=chunk_size)
+    else:
+        raise ValueError(f"不支持的文件格式: {extension}")
+
+    for chunk in chunks:
+        index = pd.to_datetime(chunk[date_column], utc=tz is not None)
+        if tz is not None:
+            index = index.dt.tz_convert(tz)
+        yield pd.DataFrame({'Close': chunk['Close'].to_numpy(dtype=float)}, index=pd.DatetimeIndex(index))
+
+def _localize(timestamps: pd.DatetimeIndex, tz) -> pd.DatetimeIndex:
+    if tz is None:
+        return timestamps.tz_localize(None) if timestamps.tz is not None else timestamps
+    return timestamps.tz_localize(tz) if timestamps.tz is None else timestamps.tz_convert(tz)
+
+@instrumentation.traced('chunked_backtest', 'chunked_backtest')
+def run_backtest_chunked(chunks: Iterable[pd.DataFrame], amount: Union[float, np.ndarray], start_date: str, end_date: str,
+                         strategy: str = 'weekly', strategy_params: Dict[str, Any] = None,
+                         compare: bool = False) -> Dict:
+    """
+    对分块读取的K线运行定投回测（可同时与一次性投资比较）
+
+    每个定投日在其后的第一根K线（含当天零点）以收盘价买入；最终价格取结束日期（零点）
+    当时或之前的最后一根K线，与 run_backtest 的规则一致。
+
+    Args:
+        chunks: 按时间升序排列的DataFrame块（例如 iter_bar_chunks 的返回值）
+        amount: 每期定投金额，或与定投日期对齐的金额数组
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        compare: 是否与一次性投资比较
+
+    Returns:
+        与 run_backtest（compare=True 时与 compare_with_lump_sum）相同结构的结果字典，
+        另有 bar_count 表示处理的K线数
+    """
+    dates = pd.DatetimeIndex(generate_investment_dates(strategy, start_date, end_date, strategy_params))
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+
+    # 跨块保留的状态
+    next_date = 0
+    record_dates, record_prices = [], []
+    initial_price = None
+    final_price = None
+    last_price = None
+    last_timestamp = None
+    bar_count = 0
+    localized = None
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        index = pd.DatetimeIndex(chunk.index)
+        close = chunk['Close'].to_numpy(dtype=float)
+        if last_timestamp is not None and index[0] <= last_timestamp:
+            raise ValueError("K线块必须按时间升序排列且互不重叠")
+        if localized is None:
+            localized = (_localize(dates, index.tz), _localize(pd.DatetimeIndex([start, end]), index.tz))
+        schedule, (start_ts, end_ts) = localized
+
+        # 只解析还没执行的定投日；落在本块之后的留给下一块
+        positions = index.searchsorted(schedule[next_date:], side='left')
+        positions = positions[positions < len(index)]
+        if len(positions):
+            record_dates.append(index[positions])
+            record_prices.append(close[positions])
+            next_date += len(positions)
+
+        if initial_price is None and index[-1] >= start_ts:
+            initial_price = close[index.searchsorted(start_ts, side='left')]
+        before_end = index.searchsorted(end_ts, side='right')
+        if before_end > 0:
+            final_price = close[before_end - 1]
+
+        last_price = close[-1]
+        last_timestamp = index[-1]
+        bar_count += len(index)
+        instrumentation.count('chunked.bars', len(index))
+
+    if next_date == 0:
+        return {}
+    if final_price is None:
+        final_price = last_price # Fallback
+
+    prices = np.concatenate(record_prices)
+    amounts = schedule_amounts(amount, len(prices))
+    investment_records = pd.DataFrame({
+        'Date': record_dates[0].append(record_dates[1:]),
+        'Price': prices,
+        'Amount': amounts,
+        'Shares': amounts / prices,
+    })
+    investment_records['Cumulative_Amount'] = investment_records['Amount'].cumsum()
+    investment_records['Cumulative_Shares'] = investment_records['Shares'].cumsum()
+
+    total_investment = investment_records['Cumulative_Amount'].iloc[-1]
+    final_value = investment_records['Cumulative_Shares'].iloc[-1] * final_price
+    total_return = (final_value - total_investment) / total_investment * 100
+    years = (end - start).days / 365.25
+    annual_return_percent = ((final_value / total_investment) ** (1 / years) - 1) * 100 if years > 0 else 0
+    flows = contribution_cashflows(investment_records, final_value, end_date)
+
+    result = {
+        'total_investment': total_investment,
+        'final_value': final_value,
+        'total_return': total_return,
+        'annual_return': annual_return_percent,
+        'xirr': float(xirr_batch(flows['cashflows'], flows['years'])[0]) * 100,
+        'investment_records': investment_records,
+        'final_price': final_price,
+        'investment_count': len(investment_records),
+        'bar_count': bar_count,
+    }
+    if not compare or initial_price is None:
+        return result
+
+    lump_sum_value = total_investment / initial_price * final_price
+    lump_sum_return = (lump_sum_value - total_investment) / total_investment * 100
+    return {
+        'drip_result': result,
+        'lump_sum_value': lump_sum_value,
+        'lump_sum_return': lump_sum_return,
+        'difference': total_return - lump_sum_return
+    }
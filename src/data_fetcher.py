@@ -1,13 +1,197 @@
 """
 数据获取模块
+
+设置 STOCK_BACKTEST_CACHE=目录（或向 get_stock_data 传入 DataCache）后，下载的数据缓存在磁盘上，
+多个批量回测进程或命令行同时获取同一股票时只有一个进程下载，其余进程等待后直接读取。
 """
 import yfinance as yf
 import pandas as pd
-from typing import Optional, List, Dict
+import numpy as np
+import os
+import re
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, List, Dict, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
-def get_stock_data(symbol: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+import instrumentation
+
+# 常见的拆股/合股比例：未复权的拆股表现为收盘价在一天内变为原来的 1/k 或 k 倍
+SPLIT_RATIOS = (2, 3, 4, 5, 8, 10, 15, 20, 25, 30, 40, 50, 100, 1.5, 2.5)
+# 日涨跌幅小于该倍数时不视为拆股跳变
+MIN_SPLIT_JUMP = 1.4
+# 确认拆股时比较跳变前后成交量中位数所用的K线数
+SPLIT_VOLUME_WINDOW = 5
+# 校验结论缓存的最大条目数
+VALIDATION_CACHE_SIZE = 1024
+
+# 磁盘缓存目录的环境变量
+CACHE_ENV_VAR = 'STOCK_BACKTEST_CACHE'
+# 等待其他进程下载时检查文件锁的间隔（秒）
+LOCK_POLL_INTERVAL = 0.05
+
+# 数据指纹到 (校验报告, 修复方案)
+_validation_cache: "OrderedDict[Tuple, Tuple[Dict, Optional[Dict]]]" = OrderedDict()
+_validation_lock = threading.Lock()
+
+class _FileLock:
+    """
+    基于文件的进程间互斥锁（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking）
+
+    持有锁的进程退出（包括被杀死）时操作系统自动释放锁，不会留下死锁。
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = timeout
+        self.waited = False
+        self._file = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+b')
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock():
+            self.waited = True
+            if deadline is not None and time.monotonic() > deadline:
+                self._file.close()
+                raise TimeoutError(f"等待缓存锁超时: {self.path}")
+            time.sleep(LOCK_POLL_INTERVAL)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+        return False
+
+class DataCache:
+    """
+    进程安全的磁盘数据缓存
+
+    每个 (股票代码, 开始日期, 结束日期, 是否复权) 对应一个 pickle 文件和一个锁文件。
+    缓存未命中时进程先取得该条目的文件锁再下载，同时请求同一条目的其他进程等待锁释放后直接读取文件；
+    写入先写到同目录的临时文件再原子地重命名，读取方永远不会看到写了一半的文件。
+    缓存文件用 pickle 保存，只应读取本机自己写入的缓存目录。
+    """
+
+    def __init__(self, directory: str, max_age: Optional[float] = None, lock_timeout: Optional[float] = None):
+        """
+        Args:
+            directory: 缓存目录，不存在时自动创建
+            max_age: 缓存有效期（秒），None 表示永不过期；结束日期在未来的数据可用它定期刷新
+            lock_timeout: 等待其他进程下载的最长时间（秒），None 表示一直等待
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.lock_timeout = lock_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol: str, start_date: str, end_date: str, auto_adjust: bool = True) -> str:
+        """缓存条目的文件路径（文件名以股票代码开头，便于查看）"""
+        digest = hashlib.sha1(f"{symbol}|{start_date}|{end_date}|{auto_adjust}".encode()).hexdigest()[:16]
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+        return os.path.join(self.directory, f"{name}_{digest}.pkl")
+
+    def _read(self, path: str) -> Optional[pd.DataFrame]:
+        try:
+            if self.max_age is not None and time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            return pd.read_pickle(path)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, data: pd.DataFrame):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                data.to_pickle(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get_or_fetch(self, symbol: str, start_date: str, end_date: str,
+                     fetch: Callable[[], Optional[pd.DataFrame]], auto_adjust: bool = True) -> Optional[pd.DataFrame]:
+        """
+        读取缓存，未命中时下载并写入缓存
+
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            fetch: 下载函数，返回None或空DataFrame时不写入缓存
+            auto_adjust: 是否为复权价格
+
+        Returns:
+            股票数据，下载失败时为 fetch 的返回值
+        """
+        path = self.path(symbol, start_date, end_date, auto_adjust)
+        data = self._read(path)
+        if data is not None:
+            instrumentation.count('disk_cache.hit')
+            return data
+
+        lock = _FileLock(path + '.lock', self.lock_timeout)
+        with lock:
+            # 等待期间其他进程可能已经写好了缓存
+            data = self._read(path)
+            if data is not None:
+                instrumentation.count('disk_cache.wait' if lock.waited else 'disk_cache.hit')
+                return data
+            instrumentation.count('disk_cache.miss')
+            data = fetch()
+            if data is not None and not data.empty:
+                self._write(path, data)
+        return data
+
+    def clear(self):
+        """删除所有缓存文件"""
+        for name in os.listdir(self.directory):
+            if name.endswith(('.pkl', '.tmp', '.lock')):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+def default_cache() -> Optional[DataCache]:
+    """
+    环境变量 STOCK_BACKTEST_CACHE 指定的磁盘缓存
+
+    Returns:
+        DataCache，未设置环境变量时返回None
+    """
+    directory = os.environ.get(CACHE_ENV_VAR)
+    return DataCache(directory) if directory else None
+
+def get_stock_data(symbol: str, start_date: str, end_date: str, auto_adjust: bool = True,
+                   validate: bool = True, cache: Optional[DataCache] = None) -> Optional[pd.DataFrame]:
     """
     获取股票数据
     
@@ -15,21 +199,259 @@ def get_stock_data(symbol: str, start_date: str, end_date: str) -> Optional[pd.D
         symbol: 股票代码 (如 'AAPL')
         start_date: 开始日期 (YYYY-MM-DD)
         end_date: 结束日期 (YYYY-MM-DD)
+        auto_adjust: 是否返回复权价格。分红再投资模式需要未复权价格（False）
+        validate: 是否校验数据（见 validate_stock_data）；只报告问题，不修改数据
+        cache: 磁盘缓存，默认使用 default_cache()；缓存保存下载的原始数据，校验在读取后进行
         
     Returns:
         包含股票数据的DataFrame
     """
+    def download() -> pd.DataFrame:
+        with instrumentation.span('fetch', 'data_fetcher', symbol=symbol):
+            stock = yf.Ticker(symbol)
+            return stock.history(start=start_date, end=end_date, auto_adjust=auto_adjust)
+
     try:
-        stock = yf.Ticker(symbol)
-        data = stock.history(start=start_date, end=end_date)
+        cache = cache if cache is not None else default_cache()
+        if cache is not None:
+            data = cache.get_or_fetch(symbol, start_date, end_date, download, auto_adjust)
+        else:
+            data = download()
+        instrumentation.count('fetch.rows', len(data))
         if data.empty:
             print(f"未能获取 {symbol} 在 {start_date} 到 {end_date} 之间的数据")
             return None
+        if validate:
+            data, report = validate_stock_data(data, repair=False)
+            if not report['ok']:
+                print(f"{symbol} 数据存在问题: {describe_issues(report)}")
+        instrumentation.record_resident(symbol, data)
         return data
     except Exception as e:
         print(f"获取 {symbol} 数据时出错: {e}")
         return None
 
+def _data_hash(data: pd.DataFrame, split_tolerance: float) -> Tuple:
+    """根据时间戳、收盘价和拆股列计算数据指纹，作为校验结论的缓存键"""
+    digest = hashlib.sha1()
+    index = pd.DatetimeIndex(data.index)
+    digest.update(f"{index.tz}|{index.unit}".encode())
+    digest.update(np.ascontiguousarray(index.asi8))
+    digest.update(np.ascontiguousarray(data['Close'].to_numpy(dtype=np.float64)))
+    if 'Stock Splits' in data.columns:
+        digest.update(np.ascontiguousarray(data['Stock Splits'].to_numpy(dtype=np.float64)))
+    return digest.hexdigest(), len(data), split_tolerance
+
+def _detect_split_jumps(close: np.ndarray, splits: Optional[np.ndarray],
+                        split_tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    检测未复权的拆股跳变
+
+    Returns:
+        (跳变位置数组, 对应的价格比例数组)，位置 i 表示第 i 根K线相对前一根发生跳变
+    """
+    if len(close) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    log_ratio = np.log(close[1:] / close[:-1])
+    candidates = np.flatnonzero(np.abs(log_ratio) >= np.log(MIN_SPLIT_JUMP))
+    if len(candidates) == 0:
+        return candidates, np.empty(0)
+    # 与每个拆股（价格变为 1/k）和合股（价格变为 k 倍）比例的对数距离
+    ratios = np.log(np.asarray(SPLIT_RATIOS, dtype=float))
+    ratios = np.concatenate([-ratios, ratios])
+    distance = np.abs(log_ratio[candidates, None] - ratios[None, :])
+    nearest = distance.argmin(axis=1)
+    matched = distance[np.arange(len(candidates)), nearest] <= split_tolerance
+    positions = candidates[matched] + 1
+    factors = np.exp(ratios[nearest[matched]])
+    if splits is not None:
+        # 数据中记录了拆股的日期是预期的跳变（未复权数据），不算问题
+        explained = splits[positions] > 0
+        positions, factors = positions[~explained], factors[~explained]
+    return positions, factors
+
+def _volume_confirms_split(volume: Optional[np.ndarray], positions: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """
+    用成交量确认拆股跳变：拆股后成交量应按价格比例的倒数放大（合股则缩小）
+
+    比较跳变前后各 SPLIT_VOLUME_WINDOW 根K线成交量的中位数，变化的对数比例更接近拆股比例而不是1时确认。
+    真实的暴跌（暴涨）不会让成交量稳定地按比例变化；没有成交量数据时一律不确认。
+
+    Returns:
+        与 positions 等长的布尔数组
+    """
+    confirmed = np.zeros(len(positions), dtype=bool)
+    if volume is None:
+        return confirmed
+    for i, (position, factor) in enumerate(zip(positions, factors)):
+        before = volume[max(position - SPLIT_VOLUME_WINDOW, 0):position]
+        after = volume[position:position + SPLIT_VOLUME_WINDOW]
+        before, after = before[before > 0], after[after > 0]
+        if len(before) and len(after):
+            shift = np.log(np.median(after) / np.median(before))
+            expected = -np.log(factor)
+            confirmed[i] = abs(shift - expected) < abs(expected) / 2
+    return confirmed
+
+def validate_stock_data(data: pd.DataFrame, repair: bool = True,
+                        split_tolerance: float = 0.05) -> Tuple[pd.DataFrame, Dict]:
+    """
+    校验股票数据质量（可选修复）
+
+    检查时间戳乱序、重复时间戳、缺失（NaN）和非正的收盘价，以及疑似未复权的拆股跳变
+    （收盘价一天内变为常见拆股比例的倍数，且数据中没有对应的拆股记录）。整个序列只需
+    几次数组运算；结论和修复方案按数据指纹缓存，同一份数据再次校验时直接返回缓存的结论，
+    需要修复时按缓存的方案直接修复，不再重新排序和检测。
+
+    修复方式：按时间排序，重复时间戳保留最后一条，删除缺失或非正的收盘价。
+    价格跳变本身可能是真实的暴涨暴跌，只有成交量同时按拆股比例的倒数变化（confirmed_splits）时
+    才将跳变之前的价格（及成交量、分红）按拆股比例复权，其余跳变只报告不修改。
+
+    Args:
+        data: 股票数据，需包含 Close 列
+        repair: 是否返回修复后的数据；为False时原样返回数据，只给出报告
+        split_tolerance: 识别拆股跳变时允许的对数价格比例误差
+
+    Returns:
+        (数据, 报告) 元组。报告包含 rows、unsorted、duplicate_timestamps、missing_close、
+        nonpositive_close、split_jumps（疑似拆股的跳变日期列表）、confirmed_splits（其中有成交量佐证的日期）、
+        ok（是否没有问题）和 repaired（是否修改了数据）
+    """
+    key = _data_hash(data, split_tolerance)
+    with _validation_lock:
+        cached = _validation_cache.get(key)
+        if cached is not None:
+            _validation_cache.move_to_end(key)
+    if cached is not None:
+        instrumentation.count('validation.hit')
+        report, plan = cached
+    else:
+        instrumentation.count('validation.miss')
+        with instrumentation.span('validate', 'data_fetcher', rows=len(data)):
+            report, plan = _inspect_stock_data(data, split_tolerance)
+        with _validation_lock:
+            _validation_cache[key] = (report, plan)
+            while len(_validation_cache) > VALIDATION_CACHE_SIZE:
+                _validation_cache.popitem(last=False)
+
+    # 干净的数据无需再做任何处理；缓存命中时直接按缓存的修复方案修复，不再重新检测
+    if plan is None or not repair:
+        return data, dict(report, repaired=False)
+    with instrumentation.span('repair', 'data_fetcher', rows=len(data)):
+        return _apply_repair(data, plan), dict(report, repaired=True)
+
+def _inspect_stock_data(data: pd.DataFrame, split_tolerance: float) -> Tuple[Dict, Optional[Dict]]:
+    """
+    检测数据问题，返回 (报告, 修复方案)
+
+    修复方案为 {'order': 排序位置（已有序时为None）, 'keep': 排序后保留的行（全部保留时为None）,
+    'jumps': 成交量确认的拆股跳变位置, 'factors': 对应的拆股比例}，没有可修复的问题时为None
+    """
+    index = pd.DatetimeIndex(data.index)
+    unsorted = not index.is_monotonic_increasing
+    order = np.argsort(index.asi8, kind='stable') if unsorted else None
+    sorted_index = index[order] if unsorted else index
+    duplicated = sorted_index.duplicated(keep='last')
+
+    def column(name: str) -> Optional[np.ndarray]:
+        if name not in data.columns:
+            return None
+        values = data[name].to_numpy(dtype=np.float64)
+        return values[order] if unsorted else values
+
+    close = column('Close')
+    missing = np.isnan(close)
+    nonpositive = close <= 0
+    keep = ~(duplicated | missing | nonpositive)
+    kept_index = sorted_index[keep]
+    close = close[keep]
+    splits = column('Stock Splits')
+    jumps, factors = _detect_split_jumps(close, None if splits is None else splits[keep], split_tolerance)
+    volume = column('Volume')
+    confirmed = _volume_confirms_split(None if volume is None else volume[keep], jumps, factors)
+
+    report = {
+        'rows': len(data),
+        'unsorted': unsorted,
+        'duplicate_timestamps': int(duplicated.sum()),
+        'missing_close': int(missing.sum()),
+        'nonpositive_close': int(nonpositive.sum()),
+        'split_jumps': [str(date.date()) for date in kept_index[jumps]],
+        'confirmed_splits': [str(date.date()) for date in kept_index[jumps[confirmed]]],
+    }
+    report['ok'] = not (unsorted or report['duplicate_timestamps'] or report['missing_close']
+                        or report['nonpositive_close'] or report['split_jumps'])
+
+    if not (unsorted or not keep.all() or confirmed.any()):
+        return report, None
+    plan = {
+        'order': order,
+        'keep': None if keep.all() else keep,
+        'jumps': jumps[confirmed],
+        'factors': factors[confirmed],
+    }
+    return report, plan
+
+def _apply_repair(data: pd.DataFrame, plan: Dict) -> pd.DataFrame:
+    """按修复方案排序、删除问题行，并将成交量确认的拆股跳变之前的价格复权"""
+    cleaned = data.iloc[plan['order']] if plan['order'] is not None else data
+    if plan['keep'] is not None:
+        cleaned = cleaned[plan['keep']]
+    cleaned = cleaned.copy()
+    jumps, factors = plan['jumps'], plan['factors']
+    if len(jumps):
+        # 跳变位置 i 之前的所有价格乘以该次跳变的比例，多次跳变的比例连乘
+        adjustment = np.ones(len(cleaned))
+        adjustment[jumps - 1] = factors
+        adjustment = np.cumprod(adjustment[::-1])[::-1]
+        for column in ('Open', 'High', 'Low', 'Close', 'Dividends'):
+            if column in cleaned.columns:
+                cleaned[column] = cleaned[column].to_numpy(dtype=np.float64) * adjustment
+        if 'Volume' in cleaned.columns:
+            cleaned['Volume'] = cleaned['Volume'].to_numpy(dtype=np.float64) / adjustment
+    return cleaned
+
+def describe_issues(report: Dict) -> str:
+    """将校验报告中的问题整理为一行文字"""
+    issues = []
+    if report['unsorted']:
+        issues.append("时间戳乱序")
+    if report['duplicate_timestamps']:
+        issues.append(f"重复时间戳 {report['duplicate_timestamps']} 条")
+    if report['missing_close']:
+        issues.append(f"缺失收盘价 {report['missing_close']} 条")
+    if report['nonpositive_close']:
+        issues.append(f"非正收盘价 {report['nonpositive_close']} 条")
+    if report['split_jumps']:
+        issues.append(f"疑似未复权拆股 {', '.join(report['split_jumps'])}")
+    if report['confirmed_splits']:
+        issues.append(f"成交量确认的拆股 {', '.join(report['confirmed_splits'])}")
+    return '；'.join(issues) if issues else "无"
+
+def data_health_report(reports: Dict[str, Dict]) -> pd.DataFrame:
+    """
+    汇总多个股票的校验报告
+
+    Args:
+        reports: 股票代码到 validate_stock_data 报告的字典
+
+    Returns:
+        每个股票一行的DataFrame，split_jumps 和 confirmed_splits 为跳变次数，issues 为问题描述
+    """
+    rows = []
+    for symbol, report in reports.items():
+        row = dict(report, symbol=symbol, split_jumps=len(report['split_jumps']),
+                   confirmed_splits=len(report['confirmed_splits']), issues=describe_issues(report))
+        rows.append(row)
+    columns = ['symbol', 'rows', 'ok', 'repaired', 'unsorted', 'duplicate_timestamps', 'missing_close',
+               'nonpositive_close', 'split_jumps', 'confirmed_splits', 'issues']
+    return pd.DataFrame(rows, columns=columns).set_index('symbol')
+
+def clear_validation_cache():
+    """清空校验结论缓存"""
+    with _validation_lock:
+        _validation_cache.clear()
+
 def get_stock_info(symbol: str) -> Dict:
     """
     获取股票基本信息
@@ -41,8 +463,9 @@ def get_stock_info(symbol: str) -> Dict:
         包含股票信息的字典
     """
     try:
-        stock = yf.Ticker(symbol)
-        info = stock.info
+        with instrumentation.span('stock_info', 'data_fetcher', symbol=symbol):
+            stock = yf.Ticker(symbol)
+            info = stock.info
         return info
     except Exception as e:
         print(f"获取 {symbol} 信息时出错: {e}")
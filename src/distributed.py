@@ -0,0 +1,397 @@
+"""
+多机分布式回测模块
+
+协调者把 (参数组合, 股票) 工作单元放入队列，工作进程（可以在不同的主机上）通过 TCP 连接
+（multiprocessing.connection，带 authkey 认证）向协调者领取工作单元并回传结果，不需要额外的消息中间件。
+工作进程在计算期间定期发送心跳；连接断开或心跳超时的工作单元会被重新分派给其他工作进程。
+
+启动工作进程（数据加载函数以 "模块:函数" 的形式指定，需在工作进程所在主机上可导入）:
+    STOCK_BACKTEST_AUTHKEY=随机长密钥 python src/distributed.py --host 10.0.0.1 --port 6000 --loader my_data:load
+
+安全提示：multiprocessing.connection 会反序列化（unpickle）收到的消息，知道密钥的一方可以在协调者和
+工作进程上执行任意代码。没有内置的默认密钥：只监听本机地址时可以省略密钥（自动生成随机密钥），
+监听其他地址（如 0.0.0.0）时必须提供足够长的随机密钥，并且只在可信网络中使用。
+"""
+import os
+import time
+import socket
+import ipaddress
+import argparse
+import importlib
+import threading
+from collections import deque
+from multiprocessing import Process
+from multiprocessing.connection import Listener, Client
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from batch_runner import _run_single
+from sweep import unit_key
+from trading_calendar import TradingCalendar
+import instrumentation
+
+# 工作进程命令行未指定 --authkey 时读取的环境变量（避免密钥出现在进程列表中）
+AUTHKEY_ENV_VAR = 'STOCK_BACKTEST_AUTHKEY'
+DEFAULT_HEARTBEAT_INTERVAL = 1.0
+DEFAULT_HEARTBEAT_TIMEOUT = 30.0
+# 工作进程缓存的交易日历数
+WORKER_CALENDAR_CACHE_SIZE = 8
+
+def _is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def make_units(symbols: List[str], param_grid: List[Dict[str, Any]], start_date: str, end_date: str,
+               keep_records: bool = False) -> Dict[str, Dict]:
+    """
+    生成工作单元
+
+    Args:
+        symbols: 股票代码列表
+        param_grid: 参数组合列表，每项可包含 amount / strategy / strategy_params / compare /
+            signal / signal_params
+        start_date: 开始日期
+        end_date: 结束日期
+        keep_records: 结果中是否保留 investment_records
+
+    Returns:
+        工作单元键（与 sweep.unit_key 相同，可与检查点共用）到工作单元的字典
+    """
+    units = {}
+    for params in param_grid:
+        run_params = {
+            'amount': params.get('amount', 100.0),
+            'start_date': start_date,
+            'end_date': end_date,
+            'strategy': params.get('strategy', 'weekly'),
+            'strategy_params': params.get('strategy_params') or {},
+            'compare': params.get('compare', False),
+            'keep_records': keep_records,
+            'signal': params.get('signal'),
+            'signal_params': params.get('signal_params'),
+        }
+        for symbol in symbols:
+            units[unit_key(params, symbol)] = {'symbol': symbol, 'params': run_params}
+    return units
+
+class Coordinator:
+    """
+    分布式回测协调者
+
+    消息协议（元组）：
+        工作进程 -> 协调者: ('request', worker_id) / ('heartbeat', worker_id, unit_id) /
+                            ('result', worker_id, unit_id, result)
+        协调者 -> 工作进程: ('task', unit_id, unit) / ('wait', 秒数) / ('stop',)
+    """
+
+    def __init__(self, units: Dict[str, Dict], address: Tuple[str, int] = ('127.0.0.1', 0),
+                 authkey: Optional[bytes] = None, heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT,
+                 checkpoint=None, on_result: Optional[Callable[[str, Dict], None]] = None):
+        """
+        Args:
+            units: 工作单元字典（见 make_units）
+            address: 监听地址，端口为0时自动分配
+            authkey: 连接认证密钥，工作进程必须使用相同的密钥；只监听本机地址时可以为None（自动生成随机密钥，
+                见 self.authkey），监听其他地址时必须提供
+            heartbeat_timeout: 超过该时间（秒）没有心跳的工作单元被重新分派
+            checkpoint: 检查点；其中已完成的工作单元不再分派，新结果写入检查点
+            on_result: 每收到一个结果时调用的回调 (unit_id, result)
+        """
+        self.units = units
+        self.heartbeat_timeout = heartbeat_timeout
+        self.checkpoint = checkpoint
+        self.on_result = on_result
+        self.results: Dict[str, Dict] = {}
+        self.redispatched = 0
+
+        self._pending = deque(unit_id for unit_id in units if checkpoint is None or unit_id not in checkpoint)
+        # unit_id -> [worker_id, 最近一次心跳时间]
+        self._in_flight: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        # 检查点和回调不是线程安全的，多个连接线程依次写入
+        self._output_lock = threading.Lock()
+        self._done = threading.Event()
+        if authkey is None:
+            if not _is_loopback(address[0]):
+                raise ValueError(f"监听非本机地址 {address[0]} 时必须提供 authkey（收到的消息会被反序列化）")
+            authkey = os.urandom(32)
+        self.authkey = authkey
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        if not self._pending:
+            self._done.set()
+
+    def _next_message(self, worker_id: str) -> tuple:
+        with self._lock:
+            while self._pending:
+                unit_id = self._pending.popleft()
+                # 被重新分派的工作单元可能已经收到了迟到的结果
+                if unit_id in self.results:
+                    continue
+                self._in_flight[unit_id] = [worker_id, time.monotonic()]
+                return ('task', unit_id, self.units[unit_id])
+            if self._in_flight:
+                return ('wait', min(1.0, self.heartbeat_timeout / 4))
+        self._done.set()
+        return ('stop',)
+
+    def _heartbeat(self, worker_id: str, unit_id: str):
+        with self._lock:
+            entry = self._in_flight.get(unit_id)
+            if entry is not None and entry[0] == worker_id:
+                entry[1] = time.monotonic()
+
+    def _complete(self, unit_id: str, result: Dict):
+        with self._lock:
+            self._in_flight.pop(unit_id, None)
+            if unit_id in self.results:
+                return
+            self.results[unit_id] = result
+            # 心跳超时后重新排队的工作单元可能在再次分派前就收到了迟到的结果
+            try:
+                self._pending.remove(unit_id)
+            except ValueError:
+                pass
+            finished = not self._pending and not self._in_flight
+        instrumentation.count('distributed.results')
+        with self._output_lock:
+            if self.checkpoint is not None:
+                self.checkpoint.record(unit_id, result)
+            if self.on_result is not None:
+                self.on_result(unit_id, result)
+        if finished:
+            self._done.set()
+
+    def _requeue(self, unit_ids: List[str]):
+        # 调用方持有锁
+        for unit_id in unit_ids:
+            del self._in_flight[unit_id]
+            self._pending.appendleft(unit_id)
+            self.redispatched += 1
+            instrumentation.count('distributed.redispatched')
+
+    def _worker_lost(self, worker_id: Optional[str]):
+        with self._lock:
+            self._requeue([unit_id for unit_id, (owner, _) in self._in_flight.items() if owner == worker_id])
+
+    def _handle(self, conn):
+        worker_id = None
+        try:
+            while True:
+                message = conn.recv()
+                kind = message[0]
+                if kind == 'request':
+                    worker_id = message[1]
+                    conn.send(self._next_message(worker_id))
+                elif kind == 'heartbeat':
+                    self._heartbeat(message[1], message[2])
+                elif kind == 'result':
+                    self._complete(message[2], message[3])
+        except (EOFError, OSError):
+            # 工作进程退出或连接断开：立即重新分派它手上的工作单元
+            self._worker_lost(worker_id)
+        finally:
+            conn.close()
+
+    def _accept_loop(self):
+        while not self._done.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                # 监听器已关闭
+                return
+            except Exception:
+                # 认证失败等单个连接的错误不影响其他工作进程
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _check_heartbeats(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [unit_id for unit_id, (_, seen) in self._in_flight.items()
+                       if now - seen > self.heartbeat_timeout]
+            self._requeue(expired)
+
+    def serve(self, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        分派工作单元直到全部完成
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            工作单元键到结果的字典（不含检查点中已有的结果）
+        """
+        accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        accept_thread.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not self._done.wait(min(1.0, self.heartbeat_timeout / 4)):
+                self._check_heartbeats()
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"分布式回测未在 {timeout} 秒内完成，剩余 "
+                                       f"{len(self._pending) + len(self._in_flight)} 个工作单元")
+        finally:
+            self._listener.close()
+        return self.results
+
+def run_worker(address: Tuple[str, int], loader: Callable[[str], Optional[pd.DataFrame]],
+               authkey: bytes, worker_id: Optional[str] = None,
+               heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL) -> int:
+    """
+    工作进程：循环领取工作单元、加载数据、运行回测并回传结果，直到协调者通知停止
+
+    Args:
+        address: 协调者地址
+        loader: 按股票代码加载数据的函数
+        authkey: 连接认证密钥
+        worker_id: 工作进程标识，默认为 "主机名:进程号"
+        heartbeat_interval: 心跳间隔（秒），应明显小于协调者的 heartbeat_timeout
+
+    Returns:
+        完成的工作单元数
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    conn = Client(address, authkey=authkey)
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def beat(unit_id: str, stop: threading.Event):
+        while not stop.wait(heartbeat_interval):
+            send(('heartbeat', worker_id, unit_id))
+
+    completed = 0
+    # 不同股票的交易日和日期范围可能不同，日历按交易日索引分别缓存
+    calendars: deque = deque()
+    try:
+        while True:
+            send(('request', worker_id))
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+            if message[0] == 'wait':
+                time.sleep(message[1])
+                continue
+
+            _, unit_id, unit = message
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=beat, args=(unit_id, stop), daemon=True)
+            heartbeat.start()
+            try:
+                stock_data = loader(unit['symbol'])
+                if stock_data is None or stock_data.empty:
+                    result = {'error': f"未能加载 {unit['symbol']} 的数据"}
+                else:
+                    result = _run_single(stock_data, unit['params'], _calendar_for(calendars, stock_data.index))
+            except Exception as e:
+                result = {'error': str(e)}
+            finally:
+                stop.set()
+                heartbeat.join()
+            send(('result', worker_id, unit_id, result))
+            completed += 1
+    except EOFError:
+        # 协调者已经结束
+        pass
+    finally:
+        conn.close()
+    return completed
+
+def _calendar_for(calendars: deque, trading_index: pd.DatetimeIndex) -> TradingCalendar:
+    """
+    工作进程：取出覆盖该交易日索引（为其中连续的一段）的日历，没有时以该索引新建并缓存
+
+    Args:
+        calendars: 已缓存的日历（最近使用的在末尾）
+        trading_index: 股票数据的交易日索引
+
+    Returns:
+        TradingCalendar
+    """
+    for calendar in calendars:
+        if calendar.offset_of(trading_index) is not None:
+            calendars.remove(calendar)
+            calendars.append(calendar)
+            return calendar
+    calendar = TradingCalendar(trading_index)
+    if len(calendars) >= WORKER_CALENDAR_CACHE_SIZE:
+        calendars.popleft()
+    calendars.append(calendar)
+    return calendar
+
+def resolve_loader(spec: str) -> Callable[[str], Optional[pd.DataFrame]]:
+    """将 "模块:函数" 形式的字符串解析为数据加载函数"""
+    module_name, _, func_name = spec.partition(':')
+    if not func_name:
+        raise ValueError(f"加载函数应为 '模块:函数' 的形式: {spec}")
+    return getattr(importlib.import_module(module_name), func_name)
+
+def _worker_entry(address, loader_spec, authkey, heartbeat_interval):
+    run_worker(address, resolve_loader(loader_spec), authkey, heartbeat_interval=heartbeat_interval)
+
+def run_distributed(units: Dict[str, Dict], loader_spec: Optional[str] = None, local_workers: int = 0,
+                    address: Tuple[str, int] = ('127.0.0.1', 0), authkey: Optional[bytes] = None,
+                    heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT, checkpoint=None,
+                    timeout: Optional[float] = None,
+                    on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """
+    启动协调者（可同时在本机启动若干工作进程）并等待所有工作单元完成
+
+    其他主机上的工作进程用相同的地址和密钥运行 `python src/distributed.py ...` 即可加入。
+
+    Args:
+        units: 工作单元字典（见 make_units）
+        loader_spec: 本机工作进程使用的数据加载函数 "模块:函数"
+        local_workers: 本机启动的工作进程数
+        address: 监听地址；需要其他主机连接时使用 ('0.0.0.0', 端口)
+        authkey: 连接认证密钥；监听非本机地址时必须提供，只在本机运行时可省略
+        heartbeat_timeout: 心跳超时（秒）
+        checkpoint: 检查点
+        timeout: 最长等待时间（秒）
+        on_result: 每收到一个结果时调用的回调
+
+    Returns:
+        工作单元键到结果的字典
+    """
+    coordinator = Coordinator(units, address, authkey, heartbeat_timeout, checkpoint, on_result)
+    connect_host = '127.0.0.1' if coordinator.address[0] in ('0.0.0.0', '') else coordinator.address[0]
+    workers = [Process(target=_worker_entry, daemon=True,
+                       args=((connect_host, coordinator.address[1]), loader_spec, coordinator.authkey,
+                             min(DEFAULT_HEARTBEAT_INTERVAL, heartbeat_timeout / 4)))
+               for _ in range(local_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        return coordinator.serve(timeout)
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='分布式回测工作进程')
+    parser.add_argument('--host', default='127.0.0.1', help='协调者地址')
+    parser.add_argument('--port', type=int, required=True, help='协调者端口')
+    parser.add_argument('--authkey', default=os.environ.get(AUTHKEY_ENV_VAR),
+                        help=f'连接认证密钥（默认读取环境变量 {AUTHKEY_ENV_VAR}）')
+    parser.add_argument('--loader', required=True, help="数据加载函数，形式为 '模块:函数'")
+    parser.add_argument('--heartbeat', type=float, default=DEFAULT_HEARTBEAT_INTERVAL, help='心跳间隔（秒）')
+    args = parser.parse_args(argv)
+    if not args.authkey:
+        parser.error(f"必须通过 --authkey 或环境变量 {AUTHKEY_ENV_VAR} 提供与协调者相同的密钥")
+
+    completed = run_worker((args.host, args.port), resolve_loader(args.loader), args.authkey.encode(),
+                           heartbeat_interval=args.heartbeat)
+    print(f"工作进程结束，共完成 {completed} 个工作单元")
+
+if __name__ == "__main__":
+    main()
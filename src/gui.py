@@ -14,27 +14,184 @@ from PyQt6.QtWidgets import (
     QTabWidget, QFileDialog, QMessageBox, QDateEdit, 
     QGroupBox, QFormLayout
 )
-from PyQt6.QtCore import QDate, Qt
+from PyQt6.QtCore import QDate, Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QIcon
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import pandas as pd
 import numpy as np
+import queue
+import threading
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from main import StockDripBacktester
+from live_charts import LiveChart
+from simulation import make_mock_stock_data
+import instrumentation
+
+class BacktestCancelled(Exception):
+    """回测任务被用户取消"""
+
+class BacktestWorker(QThread):
+    """
+    后台回测线程
+    
+    在独立线程中依次执行排队的回测任务（数据获取和回测计算），
+    通过信号向主线程报告进度和结果。图表绘制仍在主线程完成。
+    网络请求本身无法中断，取消时会在当前步骤结束后丢弃结果。
+    """
+    
+    progress = pyqtSignal(str)              # 状态信息
+    result_ready = pyqtSignal(object)       # 单个任务的结果字典
+    job_failed = pyqtSignal(str, str)       # 股票代码, 错误信息
+    job_cancelled = pyqtSignal(str)         # 股票代码
+    queue_empty = pyqtSignal()              # 队列中的任务全部处理完毕
+    
+    def __init__(self, data_provider=None, info_provider=None, parent=None):
+        super().__init__(parent)
+        self.data_provider = data_provider
+        self.info_provider = info_provider
+        self._jobs = queue.Queue()
+        # 每批任务在入队时绑定同一个取消令牌，cancel() 只会触发已入队任务的令牌
+        self._cancel_token = threading.Event()
+        self._current_token = None
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+    
+    def enqueue(self, jobs):
+        """
+        添加回测任务
+        
+        Args:
+            jobs: 任务字典列表，包含 symbol、start_date、end_date、amount、compare、strategy
+        """
+        with self._pending_lock:
+            self._pending += len(jobs)
+            token = self._cancel_token
+        for job in jobs:
+            self._jobs.put((job, token))
+    
+    def pending_count(self) -> int:
+        """尚未完成的任务数（包括正在执行的任务）"""
+        with self._pending_lock:
+            return self._pending
+    
+    def cancel(self):
+        """取消当前任务并清空等待队列"""
+        with self._pending_lock:
+            # 令牌随任务一起出队，即使任务刚被取出尚未开始执行，取消也不会丢失
+            self._cancel_token.set()
+            self._cancel_token = threading.Event()
+        while True:
+            try:
+                item = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # 保留停止信号
+                self._jobs.put(None)
+                break
+            self._job_done()
+            self.job_cancelled.emit(item[0]['symbol'])
+    
+    def stop(self):
+        """停止线程"""
+        self.cancel()
+        self._jobs.put(None)
+    
+    def _job_done(self):
+        with self._pending_lock:
+            self._pending -= 1
+            drained = self._pending == 0
+        if drained:
+            self.queue_empty.emit()
+    
+    def _check_cancelled(self):
+        token = self._current_token
+        if token is not None and token.is_set():
+            raise BacktestCancelled()
+    
+    def run(self):
+        """线程主循环：阻塞等待任务，直到收到停止信号"""
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            job, self._current_token = item
+            try:
+                self._check_cancelled()
+                self.result_ready.emit(self.run_job(job))
+            except BacktestCancelled:
+                self.job_cancelled.emit(job['symbol'])
+            except Exception as e:
+                self.job_failed.emit(job['symbol'], str(e))
+            finally:
+                self._current_token = None
+                self._job_done()
+    
+    def run_job(self, job):
+        """
+        执行单个回测任务
+        
+        Args:
+            job: 任务字典
+            
+        Returns:
+            包含回测结果和所用数据的字典
+        """
+        symbol = job['symbol']
+        backtester = StockDripBacktester(self.data_provider, self.info_provider)
+        
+        self.progress.emit(f'正在加载 {symbol} 数据...')
+        mock = False
+        loaded = backtester.load_data(symbol, job['start_date'], job['end_date'])
+        self._check_cancelled()
+        if not loaded:
+            self.progress.emit(f'无法加载 {symbol} 的数据，将使用模拟数据进行测试')
+            backtester.stock_data = make_mock_stock_data(job['start_date'], job['end_date'])
+            backtester.symbol = symbol
+            mock = True
+        
+        self.progress.emit(f'正在运行 {symbol} 回测...')
+        result = backtester.run_backtest(
+            amount=job['amount'],
+            start_date=job['start_date'],
+            end_date=job['end_date'],
+            compare=job['compare'],
+            strategy=job['strategy']
+        )
+        self._check_cancelled()
+        
+        return {
+            'job': job,
+            'symbol': symbol,
+            'stock_data': backtester.stock_data,
+            'result': result,
+            'mock': mock
+        }
 
 class StockBacktestGUI(QMainWindow):
     """股票定投回测GUI界面"""
     
-    def __init__(self):
+    def __init__(self, data_provider=None, info_provider=None):
         super().__init__()
-        self.backtester = StockDripBacktester()
+        self.backtester = StockDripBacktester(data_provider, info_provider)
+        self.result_texts = []
+        self.worker_busy = False
         self.init_ui()
         
+        # 创建后台回测线程
+        self.worker = BacktestWorker(data_provider, info_provider, self)
+        self.worker.progress.connect(self.statusBar().showMessage)
+        self.worker.result_ready.connect(self.on_result_ready)
+        self.worker.job_failed.connect(self.on_job_failed)
+        self.worker.job_cancelled.connect(self.on_job_cancelled)
+        self.worker.queue_empty.connect(self.on_queue_empty)
+        self.worker.start()
+        
     def init_ui(self):
         """初始化用户界面"""
         self.setWindowTitle('美股股票定投回测器')
@@ -135,6 +292,12 @@ class StockBacktestGUI(QMainWindow):
         self.run_button.setStyleSheet("QPushButton { background-color: #4CAF50; color: white; font-weight: bold; padding: 10px; }")
         control_layout.addWidget(self.run_button)
         
+        # 取消按钮
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.cancel_backtest)
+        self.cancel_button.setEnabled(False)
+        control_layout.addWidget(self.cancel_button)
+        
         # 重置按钮
         self.reset_button = QPushButton("重置")
         self.reset_button.clicked.connect(self.reset_inputs)
@@ -172,6 +335,7 @@ class StockBacktestGUI(QMainWindow):
         growth_layout = QVBoxLayout()
         self.growth_figure = Figure(figsize=(10, 6))
         self.growth_canvas = FigureCanvas(self.growth_figure)
+        self.growth_chart = LiveChart(self.growth_figure, '金额 ($)')
         growth_layout.addWidget(self.growth_canvas)
         self.growth_chart_widget.setLayout(growth_layout)
         self.chart_tabs.addTab(self.growth_chart_widget, "投资增长图")
@@ -181,6 +345,7 @@ class StockBacktestGUI(QMainWindow):
         price_layout = QVBoxLayout()
         self.price_figure = Figure(figsize=(10, 6))
         self.price_canvas = FigureCanvas(self.price_figure)
+        self.price_chart = LiveChart(self.price_figure, '股价 ($)')
         price_layout.addWidget(self.price_canvas)
         self.price_chart_widget.setLayout(price_layout)
         self.chart_tabs.addTab(self.price_chart_widget, "价格与投资点对比图")
@@ -192,11 +357,12 @@ class StockBacktestGUI(QMainWindow):
         parent_layout.addWidget(self.tab_widget)
         
     def run_backtest(self):
-        """运行回测"""
+        """将回测任务加入后台队列（多个股票代码用逗号分隔）"""
         try:
             # 获取输入参数
-            symbol = self.symbol_input.text().strip().upper()
-            if not symbol:
+            symbol_text = self.symbol_input.text().strip().upper()
+            symbols = [s.strip() for s in symbol_text.split(',') if s.strip()]
+            if not symbols:
                 QMessageBox.warning(self, "输入错误", "请输入股票代码")
                 return
                 
@@ -223,78 +389,85 @@ class StockBacktestGUI(QMainWindow):
             # 获取比较选项
             compare = self.compare_checkbox.isChecked()
             
-            # 更新状态栏
-            self.statusBar().showMessage(f'正在加载 {symbol} 数据...')
-            self.run_button.setEnabled(False)
-            QApplication.processEvents()
-            
-            # 加载数据
-            if not self.backtester.load_data(symbol, start_date, end_date):
-                QMessageBox.warning(self, "数据加载失败", f"无法加载 {symbol} 的数据，将使用模拟数据进行测试")
-                # 创建模拟数据
-                self.create_mock_data(symbol, start_date, end_date)
+            # 空闲时开始新的一批结果，运行中则追加到队列
+            if not self.worker_busy:
+                self.result_texts = []
+            self.worker_busy = True
             
-            # 运行回测
-            self.statusBar().showMessage('正在运行回测...')
-            QApplication.processEvents()
+            self.worker.enqueue([{
+                'symbol': symbol,
+                'start_date': start_date,
+                'end_date': end_date,
+                'amount': amount,
+                'compare': compare,
+                'strategy': strategy
+            } for symbol in symbols])
             
-            backtest_result = self.backtester.run_backtest(
-                amount=amount,
-                start_date=start_date,
-                end_date=end_date,
-                compare=compare,
-                strategy=strategy
-            )
-            
-            if backtest_result:
-                # 显示结果
-                self.display_results(backtest_result, compare, strategy)
-                self.export_button.setEnabled(True)
-                self.statusBar().showMessage('回测完成')
-            else:
-                QMessageBox.warning(self, "回测失败", "回测过程出现错误")
-                self.statusBar().showMessage('回测失败')
+            self.cancel_button.setEnabled(True)
+            self.statusBar().showMessage(f'已加入队列: {", ".join(symbols)} (待处理 {self.worker.pending_count()} 个)')
                 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"运行回测时发生错误: {str(e)}")
             self.statusBar().showMessage('回测出错')
-        finally:
-            self.run_button.setEnabled(True)
+    
+    def cancel_backtest(self):
+        """取消正在运行和排队的回测任务"""
+        self.worker.cancel()
+        self.statusBar().showMessage('正在取消...')
+    
+    def on_result_ready(self, payload):
+        """后台任务完成后在主线程中显示结果"""
+        job = payload['job']
+        result = payload['result']
+        
+        self.backtester.symbol = payload['symbol']
+        self.backtester.stock_data = payload['stock_data']
+        
+        if result:
+            self.display_results(result, job['compare'], job['strategy'], mock=payload['mock'])
+            self.export_button.setEnabled(True)
+            self.statusBar().showMessage(f'{payload["symbol"]} 回测完成')
+        else:
+            self.statusBar().showMessage(f'{payload["symbol"]} 回测失败')
+    
+    def on_job_failed(self, symbol, message):
+        """后台任务出错"""
+        self.result_texts.append(f"{symbol} 回测出错: {message}")
+        self.text_results.setPlainText("\n\n".join(self.result_texts))
+        self.statusBar().showMessage(f'{symbol} 回测出错')
+    
+    def on_job_cancelled(self, symbol):
+        """后台任务被取消"""
+        self.statusBar().showMessage(f'已取消 {symbol} 的回测')
+    
+    def on_queue_empty(self):
+        """所有排队任务处理完毕"""
+        # 信号是异步投递的，期间可能已有新任务入队
+        if self.worker.pending_count() == 0:
+            self.worker_busy = False
+            self.cancel_button.setEnabled(False)
+    
+    def closeEvent(self, event):
+        """关闭窗口时停止后台线程"""
+        self.worker.stop()
+        self.worker.wait()
+        super().closeEvent(event)
             
     def create_mock_data(self, symbol, start_date, end_date):
         """创建模拟数据"""
-        # 生成模拟股票数据
-        dates = pd.date_range(start=start_date, end=end_date, freq='D')
-        # 移除周末
-        dates = dates[dates.weekday < 5]
-        
-        # 生成模拟股价数据（从150开始，随机波动）
-        prices = [150.0]
-        for i in range(1, len(dates)):
-            change = np.random.normal(0, 0.02)  # 日收益率均值为0，标准差为2%
-            new_price = prices[-1] * (1 + change)
-            prices.append(max(new_price, 0.01))  # 确保价格为正
-        
-        # 创建DataFrame
-        self.backtester.stock_data = pd.DataFrame({
-            'Open': prices,
-            'High': [p * (1 + abs(np.random.normal(0, 0.01))) for p in prices],
-            'Low': [p * (1 - abs(np.random.normal(0, 0.01))) for p in prices],
-            'Close': prices,
-            'Volume': [np.random.randint(1000000, 10000000) for _ in range(len(dates))]
-        }, index=dates)
+        self.backtester.stock_data = make_mock_stock_data(start_date, end_date)
         self.backtester.symbol = symbol
         
-    def display_results(self, result, compare, strategy):
+    def display_results(self, result, compare, strategy, mock=False):
         """显示回测结果"""
         # 显示文本结果
-        self.display_text_results(result, compare, strategy)
+        self.display_text_results(result, compare, strategy, mock)
         
         # 显示图表结果
         self.display_chart_results(result)
         
-    def display_text_results(self, result, compare, strategy):
-        """显示文本结果"""
+    def display_text_results(self, result, compare, strategy, mock=False):
+        """显示文本结果（队列中多个股票的结果依次追加）"""
         if not result:
             self.text_results.setPlainText("回测结果为空")
             return
@@ -307,6 +480,8 @@ class StockBacktestGUI(QMainWindow):
         output.append("=" * 50)
         output.append(f"股票代码: {self.backtester.symbol}")
         output.append(f"数据范围: {self.backtester.stock_data.index[0].date()} 到 {self.backtester.stock_data.index[-1].date()}")
+        if mock:
+            output.append("注意: 无法获取真实数据，以下为模拟数据的回测结果")
         output.append("=" * 50)
         
         if compare and 'drip_result' in result:
@@ -320,6 +495,7 @@ class StockBacktestGUI(QMainWindow):
             output.append(f"最终股价: ${drip_result['final_price']:.2f}")
             output.append(f"总收益率: {drip_result['total_return']:.2f}%")
             output.append(f"年化收益率: {drip_result['annual_return']:.2f}%")
+            output.append(f"资金加权年化收益率 (XIRR): {drip_result['xirr']:.2f}%")
             
             output.append(f"\n=== 一次性投资比较 ===")
             output.append(f"一次性投资价值: ${result['lump_sum_value']:.2f}")
@@ -340,59 +516,51 @@ class StockBacktestGUI(QMainWindow):
             output.append(f"最终股价: ${result['final_price']:.2f}")
             output.append(f"总收益率: {result['total_return']:.2f}%")
             output.append(f"年化收益率: {result['annual_return']:.2f}%")
+            output.append(f"资金加权年化收益率 (XIRR): {result['xirr']:.2f}%")
             
-        self.text_results.setPlainText("\n".join(output))
+        self.result_texts.append("\n".join(output))
+        self.text_results.setPlainText("\n\n".join(self.result_texts))
         
     def display_chart_results(self, result):
-        """显示图表结果"""
+        """显示图表结果（复用已有的artist，只更新数据）"""
         if not result:
             return
-            
-        # 清除之前的图表
-        self.growth_figure.clear()
-        self.price_figure.clear()
         
-        # 绘制投资增长图
+        # 获取结果数据
+        if 'drip_result' in result:
+            drip_result = result['drip_result']
+        else:
+            drip_result = result
+        
+        # 更新投资增长图
         try:
-            # 获取结果数据
-            if 'drip_result' in result:
-                drip_result = result['drip_result']
-            else:
-                drip_result = result
-                
-            # 使用可视化模块中的函数绘制图表
-            from visualization import plot_investment_growth, plot_price_vs_investment
-            
-            # 绘制投资增长图
-            ax1 = self.growth_figure.add_subplot(111)
-            plot_investment_growth(drip_result, self.backtester.symbol, ax1)
-            self.growth_canvas.draw()
-                
+            records = drip_result['investment_records']
+            self.growth_chart.show_message(None)
+            self.growth_chart.set_line('累计投资金额', records['Date'], records['Cumulative_Amount'],
+                                       color='blue', linewidth=2)
+            self.growth_chart.set_line('投资价值', records['Date'],
+                                       records['Cumulative_Shares'] * records['Price'],
+                                       color='green', linewidth=2)
         except Exception as e:
             # 如果图表绘制失败，显示错误信息
-            ax1 = self.growth_figure.add_subplot(111)
-            ax1.text(0.5, 0.5, f'图表绘制错误: {str(e)}', ha='center', va='center', 
-                    transform=ax1.transAxes, fontsize=12, color='red')
-            self.growth_canvas.draw()
+            self.growth_chart.clear()
+            self.growth_chart.show_message(f'图表绘制错误: {str(e)}')
+        self.growth_chart.refresh()
         
-        # 绘制价格与投资点对比图
+        # 更新价格与投资点对比图
         try:
-            if 'drip_result' in result:
-                drip_result = result['drip_result']
-            else:
-                drip_result = result
-                
-            # 使用可视化模块中的函数绘制图表
-            ax2 = self.price_figure.add_subplot(111)
-            plot_price_vs_investment(self.backtester.stock_data, drip_result, self.backtester.symbol, ax2)
-            self.price_canvas.draw()
-                
+            stock_data = self.backtester.stock_data
+            records = drip_result['investment_records']
+            self.price_chart.show_message(None)
+            self.price_chart.set_line('股价', stock_data.index, stock_data['Close'],
+                                      color='blue', linewidth=1)
+            self.price_chart.set_points('定投点', records['Date'], records['Price'],
+                                        color='red', s=50, zorder=5)
         except Exception as e:
             # 如果图表绘制失败，显示错误信息
-            ax2 = self.price_figure.add_subplot(111)
-            ax2.text(0.5, 0.5, f'图表绘制错误: {str(e)}', ha='center', va='center', 
-                    transform=ax2.transAxes, fontsize=12, color='red')
-            self.price_canvas.draw()
+            self.price_chart.clear()
+            self.price_chart.show_message(f'图表绘制错误: {str(e)}')
+        self.price_chart.refresh()
         
     def reset_inputs(self):
         """重置输入"""
@@ -403,13 +571,14 @@ class StockBacktestGUI(QMainWindow):
         self.amount_input.setText("100.0")
         self.compare_checkbox.setChecked(True)
         self.text_results.clear()
+        self.result_texts = []
         self.export_button.setEnabled(False)
         
         # 清除图表
-        self.growth_figure.clear()
-        self.price_figure.clear()
-        self.growth_canvas.draw()
-        self.price_canvas.draw()
+        self.growth_chart.clear()
+        self.price_chart.clear()
+        self.growth_chart.refresh()
+        self.price_chart.refresh()
         
         self.statusBar().showMessage('已重置')
         
@@ -435,6 +604,7 @@ class StockBacktestGUI(QMainWindow):
 
 def main():
     """主函数"""
+    instrumentation.configure_from_env()
     try:
         app = QApplication(sys.argv)
         gui = StockBacktestGUI()
@@ -0,0 +1,444 @@
+"""
+性能埋点模块
+
+在回测流水线的各个阶段（数据获取、日期生成、股份计算、汇总、绘图等）记录计时区间和计数器。
+默认关闭，关闭时每个埋点只有一次布尔判断的开销；开启后可导出为结构化JSON或
+Chrome Trace格式（可在 chrome://tracing 或 Perfetto 中打开）。
+
+用法:
+    import instrumentation
+    instrumentation.enable()
+    ...  # 运行回测
+    instrumentation.export_chrome_trace('trace.json')
+
+也可以通过环境变量 STOCK_BACKTEST_TRACE=trace.json 在命令行/GUI入口开启。
+
+内存分析模式（enable(memory=True) 或 STOCK_BACKTEST_MEMORY=memory.json）使用 tracemalloc 记录每个阶段的
+峰值分配和阶段结束后仍保留的分配，并记录每个股票驻留内存的数据大小，用 memory_report 导出。
+tracemalloc 会明显拖慢运行，只在分析内存时开启；嵌套阶段的峰值按调用栈正确归属，但只适用于单线程流水线。
+
+批量回测的子进程通过 init_worker / ensure_worker 按主进程的设置开启埋点，每个任务结束时用 drain 取出
+子进程记录的计时区间和计数器随结果返回，主进程用 merge 合并，因此报告中包含在子进程中运行的阶段。
+"""
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+TRACE_ENV_VAR = 'STOCK_BACKTEST_TRACE'
+MEMORY_ENV_VAR = 'STOCK_BACKTEST_MEMORY'
+
+_lock = threading.Lock()
+_enabled = False
+_memory = False
+_started_tracemalloc = False
+_events: List[Dict] = []
+_counters: Dict[str, float] = {}
+_resident: Dict[str, int] = {}
+# 正在进行的阶段的 [开始时的分配量, 目前观察到的峰值]
+_memory_stack: List[List[int]] = []
+_origin_ns = time.perf_counter_ns()
+# 子进程的 (进程号, 埋点设置)，用于判断 fork 继承来的状态是否需要重新初始化
+_worker_state = None
+
+class _NullSpan:
+    """关闭埋点时使用的空上下文管理器"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def _memory_enter():
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        # 重置峰值前把外层阶段目前的峰值保存下来
+        if _memory_stack:
+            _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+        _memory_stack.append([current, current])
+    tracemalloc.reset_peak()
+
+def _memory_exit() -> Dict[str, int]:
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        if not _memory_stack:
+            return {}
+        start, seen = _memory_stack.pop()
+        peak = max(peak, seen)
+        if _memory_stack:
+            _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+    return {'memory_peak_bytes': peak - start, 'memory_retained_bytes': current - start}
+
+class _Span:
+    """记录一个计时区间"""
+
+    __slots__ = ('name', 'cat', 'args', 'start_ns', 'memory')
+
+    def __init__(self, name: str, cat: str, args: Dict):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start_ns = 0
+        self.memory = False
+
+    def __enter__(self):
+        self.memory = _memory and tracemalloc.is_tracing()
+        if self.memory:
+            _memory_enter()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        if self.memory:
+            self.args = dict(self.args, **_memory_exit())
+        event = {
+            'name': self.name,
+            'cat': self.cat,
+            'start_us': (self.start_ns - _origin_ns) / 1000,
+            'duration_us': (end_ns - self.start_ns) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        if self.args:
+            event['args'] = self.args
+        if exc_type is not None:
+            event.setdefault('args', {})['error'] = exc_type.__name__
+        with _lock:
+            _events.append(event)
+        return False
+
+def enable(memory: bool = False):
+    """
+    开启埋点
+
+    Args:
+        memory: 是否同时开启内存分析（启动 tracemalloc，记录每个阶段的峰值和保留分配）
+    """
+    global _enabled, _memory, _started_tracemalloc
+    _enabled = True
+    if memory:
+        _memory = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+
+def disable():
+    """关闭埋点（已记录的数据保留），并停止由 enable 启动的 tracemalloc"""
+    global _enabled, _memory, _started_tracemalloc
+    _enabled = False
+    _memory = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    with _lock:
+        _memory_stack.clear()
+
+def is_enabled() -> bool:
+    """埋点是否开启"""
+    return _enabled
+
+def memory_enabled() -> bool:
+    """内存分析是否开启"""
+    return _enabled and _memory
+
+def reset():
+    """清空已记录的计时区间、计数器和驻留内存记录"""
+    with _lock:
+        _events.clear()
+        _counters.clear()
+        _resident.clear()
+
+def span(name: str, cat: str = 'backtest', **args):
+    """
+    创建计时区间上下文管理器
+
+    Args:
+        name: 阶段名称
+        cat: 分类（通常为模块名）
+        **args: 附加在事件上的参数（如股票代码）
+
+    Returns:
+        上下文管理器；埋点关闭时返回共享的空对象
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+def count(name: str, value: float = 1):
+    """
+    累加计数器
+
+    Args:
+        name: 计数器名称
+        value: 增量
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def resident_size(value: Any) -> int:
+    """
+    估算对象占用的内存（DataFrame 按列计算，包含索引和字符串内容）
+
+    Args:
+        value: DataFrame、Series、numpy 数组或其他对象
+
+    Returns:
+        字节数
+    """
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    import sys
+    return sys.getsizeof(value)
+
+def record_resident(key: str, value: Any):
+    """
+    记录某个股票（或缓存条目）驻留内存的数据大小，仅在内存分析开启时生效
+
+    Args:
+        key: 股票代码或缓存名称
+        value: 驻留的数据（如股票的DataFrame）
+    """
+    if not (_enabled and _memory):
+        return
+    size = resident_size(value)
+    with _lock:
+        _resident[key] = size
+
+def worker_config() -> Optional[Dict]:
+    """
+    子进程应使用的埋点设置
+
+    Returns:
+        埋点关闭时为None，否则为 {'memory': 是否开启内存分析}
+    """
+    if not _enabled:
+        return None
+    return {'memory': _memory}
+
+def init_worker(config: Optional[Dict]):
+    """
+    在子进程中按主进程的设置开启或关闭埋点（可作为进程池的 initializer）
+
+    fork 出的子进程继承了主进程已记录的数据，这里先清空，避免合并时重复
+
+    Args:
+        config: worker_config 的返回值
+    """
+    global _worker_state
+    reset()
+    with _lock:
+        _memory_stack.clear()
+    if config is None:
+        disable()
+    else:
+        enable(memory=config['memory'])
+    _worker_state = (os.getpid(), config)
+
+def ensure_worker(config: Optional[Dict]):
+    """
+    子进程执行任务前调用：进程池创建后主进程的埋点设置发生变化时重新初始化
+
+    Args:
+        config: worker_config 的返回值
+    """
+    if _worker_state != (os.getpid(), config):
+        init_worker(config)
+
+def drain() -> Dict:
+    """
+    取出并清空子进程记录的计时区间和计数器
+
+    Returns:
+        {'spans', 'counters', 'origin_ns'}，埋点关闭时为空字典
+    """
+    if not _enabled:
+        return {}
+    with _lock:
+        telemetry = {'spans': list(_events), 'counters': dict(_counters), 'origin_ns': _origin_ns}
+        _events.clear()
+        _counters.clear()
+    return telemetry
+
+def merge(telemetry: Dict):
+    """
+    合并子进程 drain 返回的计时区间和计数器
+
+    Args:
+        telemetry: drain 的返回值
+    """
+    if not telemetry:
+        return
+    # 各进程的时间起点不同（spawn 启动时模块重新导入），换算到本进程的时间轴
+    shift_us = (telemetry['origin_ns'] - _origin_ns) / 1000
+    spans = [dict(event, start_us=event['start_us'] + shift_us) for event in telemetry['spans']]
+    with _lock:
+        _events.extend(spans)
+        for name, value in telemetry['counters'].items():
+            _counters[name] = _counters.get(name, 0) + value
+
+def traced(name: str, cat: str = 'backtest'):
+    """
+    为函数添加计时区间的装饰器
+
+    Args:
+        name: 阶段名称
+        cat: 分类（通常为模块名）
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def summary() -> Dict:
+    """
+    按阶段汇总计时结果
+
+    Returns:
+        阶段名称到 {count, total_ms, mean_ms, max_ms} 的字典
+    """
+    with _lock:
+        events = list(_events)
+    stages = {}
+    for event in events:
+        stage = stages.setdefault(event['name'], {'cat': event['cat'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        duration_ms = event['duration_us'] / 1000
+        stage['count'] += 1
+        stage['total_ms'] += duration_ms
+        stage['max_ms'] = max(stage['max_ms'], duration_ms)
+    for stage in stages.values():
+        stage['mean_ms'] = stage['total_ms'] / stage['count']
+    return stages
+
+def memory_report(path: Optional[str] = None) -> Dict:
+    """
+    按阶段汇总内存分析结果
+
+    Args:
+        path: 可选的输出文件路径（JSON）
+
+    Returns:
+        {'stages': 阶段名称到 {count, peak_bytes（单次最大峰值）, mean_peak_bytes, retained_bytes（累计保留）}，
+         'symbols': 股票代码到驻留字节数, 'total_resident_bytes': 驻留总量,
+         'traced': tracemalloc 当前和峰值分配（未开启时为空）}
+    """
+    with _lock:
+        events = [event for event in _events if 'memory_peak_bytes' in event.get('args', {})]
+        resident = dict(_resident)
+    stages = {}
+    for event in events:
+        args = event['args']
+        stage = stages.setdefault(event['name'], {'cat': event['cat'], 'count': 0, 'peak_bytes': 0,
+                                                  'total_peak_bytes': 0, 'retained_bytes': 0})
+        stage['count'] += 1
+        stage['peak_bytes'] = max(stage['peak_bytes'], args['memory_peak_bytes'])
+        stage['total_peak_bytes'] += args['memory_peak_bytes']
+        stage['retained_bytes'] += args['memory_retained_bytes']
+    for stage in stages.values():
+        stage['mean_peak_bytes'] = stage.pop('total_peak_bytes') / stage['count']
+
+    traced_memory = {}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        traced_memory = {'current_bytes': current, 'peak_bytes': peak}
+    report = {
+        'stages': stages,
+        'symbols': resident,
+        'total_resident_bytes': sum(resident.values()),
+        'traced': traced_memory,
+    }
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+def export_json(path: Optional[str] = None) -> Dict:
+    """
+    导出结构化JSON报告
+
+    Args:
+        path: 可选的输出文件路径
+
+    Returns:
+        包含 spans、counters 和 summary 的字典（开启内存分析时另有 memory）
+    """
+    with _lock:
+        report = {'spans': list(_events), 'counters': dict(_counters)}
+    report['summary'] = summary()
+    if _memory or _resident:
+        report['memory'] = memory_report()
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+def export_chrome_trace(path: Optional[str] = None) -> Dict:
+    """
+    导出Chrome Trace Event格式
+
+    Args:
+        path: 可选的输出文件路径
+
+    Returns:
+        Trace Event字典
+    """
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+    trace_events = [{
+        'name': event['name'],
+        'cat': event['cat'],
+        'ph': 'X',
+        'ts': event['start_us'],
+        'dur': event['duration_us'],
+        'pid': event['pid'],
+        'tid': event['tid'],
+        'args': event.get('args', {}),
+    } for event in events]
+    end_us = (time.perf_counter_ns() - _origin_ns) / 1000
+    for name, value in counters.items():
+        trace_events.append({'name': name, 'ph': 'C', 'ts': end_us, 'pid': os.getpid(), 'args': {name: value}})
+
+    trace = {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False)
+    return trace
+
+def configure_from_env():
+    """
+    根据环境变量开启埋点，并在进程退出时写出Chrome Trace文件（STOCK_BACKTEST_TRACE）
+    和内存分析报告（STOCK_BACKTEST_MEMORY）
+
+    Returns:
+        Chrome Trace 输出文件路径，未设置该环境变量时返回None
+    """
+    path = os.environ.get(TRACE_ENV_VAR)
+    memory_path = os.environ.get(MEMORY_ENV_VAR)
+    if memory_path:
+        enable(memory=True)
+        atexit.register(memory_report, memory_path)
+    if not path:
+        return None
+    enable()
+    atexit.register(export_chrome_trace, path)
+    return path
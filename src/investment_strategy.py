@@ -2,10 +2,13 @@
 定投策略模块
 """
 import pandas as pd
-from typing import Dict, List
+import numpy as np
+from typing import Dict, List, Optional, Union
 from datetime import datetime, timedelta
-import pytz
 
+import instrumentation
+
+@instrumentation.traced('schedule', 'investment_strategy')
 def weekly_investment_dates(start_date: str, end_date: str, day_of_week: int = 0) -> List[datetime]:
     """
     生成每周定投日期列表
@@ -36,6 +39,7 @@ def weekly_investment_dates(start_date: str, end_date: str, day_of_week: int = 0
     
     return dates
 
+@instrumentation.traced('schedule', 'investment_strategy')
 def monthly_investment_dates(start_date: str, end_date: str, day_of_month: int = 1) -> List[datetime]:
     """
     生成每月定投日期列表
@@ -81,72 +85,159 @@ def monthly_investment_dates(start_date: str, end_date: str, day_of_month: int =
             
     return dates
 
-def calculate_investment_shares(stock_data: pd.DataFrame, investment_dates: List[datetime], 
-                               weekly_amount: float) -> pd.DataFrame:
+def resolve_trading_positions(trading_index: pd.DatetimeIndex, investment_dates: List[datetime]) -> np.ndarray:
     """
-    计算每次定投的股份数量
+    将定投日期映射为交易日的位置
+    
+    与 calculate_investment_shares 的规则一致：非交易日顺延到下一个交易日，
+    晚于最后一个交易日的定投日期被丢弃。
     
     Args:
-        stock_data: 股票数据
+        trading_index: 已排序的交易日索引
         investment_dates: 定投日期列表
-        weekly_amount: 每周定投金额
         
     Returns:
-        包含定投记录的DataFrame
+        交易日位置数组
     """
-    investment_records = []
+    dates = pd.DatetimeIndex(investment_dates)
+    if trading_index.tz is not None:
+        if dates.tz is None:
+            dates = dates.tz_localize(trading_index.tz)
+        else:
+            dates = dates.tz_convert(trading_index.tz)
+    positions = trading_index.searchsorted(dates, side='left')
+    return positions[positions < len(trading_index)]
+
+def generate_investment_dates(strategy: str, start_date: str, end_date: str,
+                              strategy_params: Dict = None) -> List[datetime]:
+    """
+    按策略生成定投日期列表
     
-    # 获取股票数据的时区信息
-    if hasattr(stock_data.index, 'tz') and stock_data.index.tz is not None:
-        stock_tz = stock_data.index.tz
-    else:
-        stock_tz = None
+    Args:
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy_params: 策略参数 (例如 {'day_of_week': 0})
+        
+    Returns:
+        定投日期列表
+    """
+    if strategy_params is None:
+        strategy_params = {}
+    if strategy == 'monthly':
+        return monthly_investment_dates(start_date, end_date, **strategy_params)
+    return weekly_investment_dates(start_date, end_date, **strategy_params)
+
+def schedule_amounts(amount: Union[float, np.ndarray], count: int) -> np.ndarray:
+    """
+    将每期定投金额整理为与定投计划对齐的数组
+
+    Args:
+        amount: 每期定投金额（标量），或与定投日期对齐的金额数组（最后一维对应定投日期，
+            例如 contribution_amounts 的返回值）；定投日期晚于最后一个交易日被丢弃时多余的金额一并丢弃
+        count: 实际执行的定投次数
+
+    Returns:
+        最后一维长度为 count 的金额数组
+    """
+    if np.ndim(amount) == 0:
+        return np.full(count, float(amount))
+    amounts = np.asarray(amount, dtype=float)
+    if amounts.shape[-1] < count:
+        raise ValueError(f"定投金额数组长度 {amounts.shape[-1]} 少于定投次数 {count}")
+    return amounts[..., :count]
+
+def contribution_amounts(investment_dates: List[datetime], amount: float,
+                         growth_rate: Union[float, np.ndarray] = 0.0, index: Optional[pd.Series] = None,
+                         top_ups: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    生成与定投日期对齐的每期金额
+
+    三种调整可以组合，全部是数组运算：
+    - 逐年递增：第 k 个定投周年之后的金额为 amount × (1 + growth_rate)^k
+    - 按指数调整：金额乘以定投日的指数水平与第一次定投时的比值（例如按CPI抵消通胀）
+    - 额外追加：在指定日期当天或之后的第一次定投中追加一笔金额
+
+    Args:
+        investment_dates: 定投日期列表（generate_investment_dates 的返回值）
+        amount: 基础每期金额
+        growth_rate: 每年递增比例；传入数组时返回每个递增比例一行的二维数组，用于批量扫描
+        index: 以日期为索引的指数水平（如CPI），取定投日当天或之前最近的值
+        top_ups: 追加日期到追加金额的字典
+
+    Returns:
+        金额数组，形状为 (定投次数,)；growth_rate 为数组时为 (len(growth_rate), 定投次数)
+    """
+    dates = pd.DatetimeIndex(investment_dates)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    if len(dates) == 0:
+        return np.empty(np.shape(growth_rate) + (0,))
+
+    # 距第一次定投的完整年数（按日历周年计算）
+    year, month, day = dates.year.to_numpy(), dates.month.to_numpy(), dates.day.to_numpy()
+    months = (year - year[0]) * 12 + (month - month[0]) - (day < day[0])
+    years = (months // 12).astype(float)
+    growth = np.power.outer(1 + np.asarray(growth_rate, dtype=float), years)
+    amounts = amount * growth
+
+    if index is not None:
+        levels_index = pd.DatetimeIndex(index.index)
+        if levels_index.tz is not None:
+            levels_index = levels_index.tz_localize(None)
+        levels = index.to_numpy(dtype=float)
+        found = levels_index.searchsorted(dates, side='right') - 1
+        if found[0] < 0:
+            raise ValueError("指数数据必须覆盖第一次定投的日期")
+        amounts = amounts * (levels[found] / levels[found[0]])
+
+    if top_ups:
+        extra = np.zeros(len(dates))
+        targets = dates.searchsorted(pd.DatetimeIndex(list(top_ups)), side='left')
+        values = np.asarray(list(top_ups.values()), dtype=float)
+        inside = targets < len(dates)
+        np.add.at(extra, targets[inside], values[inside])
+        amounts = amounts + extra
+    return amounts
+
+def build_investment_records(stock_data: pd.DataFrame, positions: np.ndarray,
+                             amount: Union[float, np.ndarray]) -> pd.DataFrame:
+    """
+    根据交易日位置生成定投记录
     
-    for date in investment_dates:
-        # 如果股票数据有时区信息，将日期转换为相同时区
-        if stock_tz is not None:
-            if date.tzinfo is None:
-                # 如果日期没有时区信息，使用股票数据的时区
-                date = stock_tz.localize(date)
-            else:
-                # 如果日期有时区信息，转换为股票数据的时区
-                date = date.astimezone(stock_tz)
+    Args:
+        stock_data: 股票数据
+        positions: 每次定投对应的交易日位置
+        amount: 每期定投金额，或与定投日期对齐的金额数组
         
-        # 找到最接近的交易日
-        if date in stock_data.index:
-            price = stock_data.loc[date, 'Close']
-        else:
-            # 如果当天不是交易日，找到下一个交易日
-            try:
-                future_dates = stock_data[stock_data.index >= date]
-                if future_dates.empty:
-                    continue
-                next_trading_day = future_dates.index[0]
-                price = stock_data.loc[next_trading_day, 'Close']
-                date = next_trading_day
-            except Exception:
-                # 如果比较失败，尝试使用iloc方法找到最近的日期
-                try:
-                    # 找到最接近的索引位置
-                    date_index = stock_data.index.get_indexer([date], method='bfill')[0]
-                    if date_index == -1:
-                        # 如果没有找到后续日期，使用前向填充
-                        date_index = stock_data.index.get_indexer([date], method='ffill')[0]
-                    if date_index != -1:
-                        next_trading_day = stock_data.index[date_index]
-                        price = stock_data.loc[next_trading_day, 'Close']
-                        date = next_trading_day
-                    else:
-                        continue
-                except Exception:
-                    continue
-            
-        shares = weekly_amount / price
-        investment_records.append({
-            'Date': date,
-            'Price': price,
-            'Amount': weekly_amount,
-            'Shares': shares
-        })
+    Returns:
+        包含 Date / Price / Amount / Shares 列的定投记录
+    """
+    prices = stock_data['Close'].to_numpy()[positions]
+    amounts = schedule_amounts(amount, len(positions))
+    return pd.DataFrame({
+        'Date': stock_data.index[positions],
+        'Price': prices,
+        'Amount': amounts,
+        'Shares': amounts / prices,
+    })
+
+@instrumentation.traced('share_calc', 'investment_strategy')
+def calculate_investment_shares(stock_data: pd.DataFrame, investment_dates: List[datetime], 
+                               weekly_amount: Union[float, np.ndarray]) -> pd.DataFrame:
+    """
+    计算每次定投的股份数量
+    
+    非交易日的定投顺延到下一个交易日，晚于最后一个交易日的定投被丢弃。
     
-    return pd.DataFrame(investment_records)
\ No newline at end of file
+    Args:
+        stock_data: 股票数据
+        investment_dates: 定投日期列表
+        weekly_amount: 每周定投金额，或与 investment_dates 对齐的金额数组（见 contribution_amounts）
+        
+    Returns:
+        包含定投记录的DataFrame
+    """
+    positions = resolve_trading_positions(stock_data.index, investment_dates)
+    instrumentation.count('investments', len(positions))
+    return build_investment_records(stock_data, positions, weekly_amount)
@@ -0,0 +1,188 @@
+"""
+交互式图表模块
+
+为GUI提供持久化artist的图表：重新回测时只更新数据数组而不重建axes，
+缩放/平移时按可见区域的像素宽度重新降采样，十字光标等覆盖层使用blitting绘制。
+"""
+import pandas as pd
+import numpy as np
+import matplotlib.dates as mdates
+from typing import Dict, Optional
+
+from visualization import downsample_minmax, _chinese_font
+
+def dates_to_num(dates) -> np.ndarray:
+    """将日期序列转换为matplotlib的日期数值（带时区的日期保留当地时间）"""
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return mdates.date2num(index.values)
+
+class LiveChart:
+    """持久化artist的时间序列图表"""
+
+    # 每个像素列保留最高点和最低点
+    POINTS_PER_PIXEL = 2
+    MIN_POINTS = 100
+
+    def __init__(self, figure, ylabel: str, xlabel: str = '日期'):
+        """
+        Args:
+            figure: matplotlib Figure对象（已绑定canvas）
+            ylabel: 纵轴标签
+            xlabel: 横轴标签
+        """
+        self.figure = figure
+        self.ax = figure.add_subplot(111)
+        self.lines: Dict[str, object] = {}
+        self.points: Dict[str, object] = {}
+        self._full_data: Dict[str, tuple] = {}
+        self._background = None
+
+        chinese_font = _chinese_font()
+        self.ax.set_xlabel(xlabel, fontproperties=chinese_font)
+        self.ax.set_ylabel(ylabel, color='blue', fontproperties=chinese_font)
+        self.ax.tick_params(axis='y', labelcolor='blue')
+        self.ax.xaxis_date()
+        locator = mdates.AutoDateLocator()
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.ax.grid(True, alpha=0.3)
+
+        # 覆盖层：十字光标和数值提示，animated=True 使其不参与常规重绘
+        self.cursor_line = self.ax.axvline(np.nan, color='gray', linewidth=0.8, animated=True)
+        self.cursor_text = self.ax.text(0.01, 0.98, '', transform=self.ax.transAxes, va='top',
+                                        fontproperties=chinese_font, animated=True)
+        self.message_text = self.ax.text(0.5, 0.5, '', transform=self.ax.transAxes, ha='center',
+                                         va='center', fontsize=12, color='red', visible=False,
+                                         fontproperties=chinese_font)
+
+        self.ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        canvas = self.figure.canvas
+        canvas.mpl_connect('draw_event', self._on_draw)
+        canvas.mpl_connect('motion_notify_event', self._on_mouse_move)
+
+    def set_line(self, name: str, dates, values, **style):
+        """
+        设置折线数据，已存在的折线只更新数据数组
+
+        Args:
+            name: 折线名称（同时作为图例标签）
+            dates: 日期序列
+            values: 数值序列
+            **style: 首次创建折线时使用的样式参数
+        """
+        x = dates_to_num(dates)
+        y = np.asarray(values, dtype=float)
+        self._full_data[name] = (x, y)
+        if name not in self.lines:
+            self.lines[name], = self.ax.plot([], [], label=name, **style)
+            self._update_legend()
+        self._resample_line(name, x[0] if len(x) else None, x[-1] if len(x) else None)
+
+    def set_points(self, name: str, dates, values, **style):
+        """
+        设置散点数据，已存在的散点只更新坐标
+
+        Args:
+            name: 散点名称（同时作为图例标签）
+            dates: 日期序列
+            values: 数值序列
+            **style: 首次创建散点时使用的样式参数
+        """
+        offsets = np.column_stack([dates_to_num(dates), np.asarray(values, dtype=float)])
+        if name not in self.points:
+            self.points[name] = self.ax.scatter(offsets[:, 0], offsets[:, 1], label=name, **style)
+            self._update_legend()
+        else:
+            self.points[name].set_offsets(offsets)
+
+    def show_message(self, message: Optional[str]):
+        """在图表中央显示（或隐藏）提示信息"""
+        self.message_text.set_text(message or '')
+        self.message_text.set_visible(bool(message))
+
+    def clear(self):
+        """清空所有数据但保留artist"""
+        for name, line in self.lines.items():
+            line.set_data([], [])
+            self._full_data[name] = (np.empty(0), np.empty(0))
+        for scatter in self.points.values():
+            scatter.set_offsets(np.empty((0, 2)))
+        self.show_message(None)
+
+    def refresh(self):
+        """根据当前数据重新计算坐标范围并请求重绘（放弃用户之前的缩放和平移）"""
+        # 缩放或平移会关闭自动缩放，新数据需要重新开启才能按完整范围显示
+        self.ax.set_autoscale_on(True)
+        toolbar = getattr(self.figure.canvas, 'toolbar', None)
+        if toolbar is not None:
+            # 清空导航历史，"主页"按钮回到新数据的完整范围
+            toolbar.update()
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.figure.canvas.draw_idle()
+
+    def _update_legend(self):
+        legend = self.ax.legend(loc='upper left')
+        for text in legend.get_texts():
+            text.set_fontproperties(_chinese_font())
+
+    def _target_points(self) -> int:
+        width = self.ax.get_window_extent().width
+        return max(int(width * self.POINTS_PER_PIXEL), self.MIN_POINTS)
+
+    def _resample_line(self, name: str, x0, x1):
+        """将折线在 [x0, x1] 可见范围内的数据降采样到像素宽度"""
+        x, y = self._full_data[name]
+        if x0 is None or len(x) == 0:
+            self.lines[name].set_data([], [])
+            return
+        # 多保留可见范围两侧各一个点，避免平移时边缘断线
+        start = max(np.searchsorted(x, x0, side='left') - 1, 0)
+        end = min(np.searchsorted(x, x1, side='right') + 1, len(x))
+        x_visible, y_visible = x[start:end], y[start:end]
+        indices = downsample_minmax(y_visible, self._target_points())
+        self.lines[name].set_data(x_visible[indices], y_visible[indices])
+
+    def _on_xlim_changed(self, ax):
+        """缩放或平移后按新的可见范围重新降采样"""
+        x0, x1 = ax.get_xlim()
+        for name in self.lines:
+            self._resample_line(name, x0, x1)
+
+    def _on_draw(self, event):
+        """完整重绘后缓存背景，供覆盖层blitting使用"""
+        canvas = self.figure.canvas
+        if getattr(canvas, 'supports_blit', False):
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
+
+    def _on_mouse_move(self, event):
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        self.update_cursor(event.xdata)
+
+    def update_cursor(self, xdata: float):
+        """
+        移动十字光标并显示各折线在该日期的数值
+
+        Args:
+            xdata: matplotlib日期数值
+        """
+        self.cursor_line.set_xdata([xdata, xdata])
+        parts = [mdates.num2date(xdata).strftime('%Y-%m-%d')]
+        for name, (x, y) in self._full_data.items():
+            if len(x) == 0:
+                continue
+            i = min(np.searchsorted(x, xdata), len(x) - 1)
+            parts.append(f'{name}: {y[i]:.2f}')
+        self.cursor_text.set_text('  '.join(parts))
+
+        canvas = self.figure.canvas
+        if self._background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        self.ax.draw_artist(self.cursor_line)
+        self.ax.draw_artist(self.cursor_text)
+        canvas.blit(self.ax.bbox)
@@ -2,7 +2,7 @@
 主程序模块
 """
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable
 import warnings
 import sys
 import os
@@ -13,16 +13,30 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from data_fetcher import get_stock_data, get_stock_info
 from backtest import run_backtest, compare_with_lump_sum
-from visualization import plot_investment_growth, plot_price_vs_investment
+from rendering import render_backtest_charts, DEFAULT_MAX_POINTS
+from simulation import make_mock_stock_data
+import instrumentation
 
 class StockDripBacktester:
     """美股股票定投回测器"""
     
-    def __init__(self):
+    def __init__(self, data_provider: Optional[Callable[[str, str, str], Optional[pd.DataFrame]]] = None,
+                 info_provider: Optional[Callable[[str], Dict]] = None):
+        """
+        Args:
+            data_provider: 可选的行情数据获取函数 (symbol, start_date, end_date) -> DataFrame，
+                默认为 get_stock_data；加载未复权价格时以关键字参数 auto_adjust=False 调用
+            info_provider: 可选的股票信息获取函数 (symbol) -> dict，默认为 get_stock_info
+        """
         self.stock_data = None
         self.symbol = ""
+        # 已加载的数据是否为按分红复权的价格（分红再投资模式不能使用）
+        self.dividend_adjusted = False
+        self.data_provider = data_provider or get_stock_data
+        self.info_provider = info_provider or get_stock_info
         
-    def load_data(self, symbol: str, start_date: str, end_date: str) -> bool:
+    @instrumentation.traced('load_data', 'main')
+    def load_data(self, symbol: str, start_date: str, end_date: str, auto_adjust: bool = True) -> bool:
         """
         加载股票数据
         
@@ -30,19 +44,22 @@ class StockDripBacktester:
             symbol: 股票代码
             start_date: 开始日期
             end_date: 结束日期
+            auto_adjust: 是否加载复权价格。分红再投资需要未复权价格（False），
+                否则复权价格中已包含的分红会被重复计算
             
         Returns:
             是否成功加载数据
         """
         self.symbol = symbol
-        self.stock_data = get_stock_data(symbol, start_date, end_date)
+        self.dividend_adjusted = auto_adjust
+        self.stock_data = self._fetch(symbol, start_date, end_date, auto_adjust)
         
         if self.stock_data is None or self.stock_data.empty:
             print(f"未能加载 {symbol} 的数据")
             return False
             
         # 检查是否有可用的股票信息来获取成立日期
-        stock_info = get_stock_info(symbol)
+        stock_info = self.info_provider(symbol)
         actual_start_date = start_date
         
         # 尝试获取基金的成立日期
@@ -72,7 +89,7 @@ class StockDripBacktester:
         # 如果调整了开始日期，重新获取数据
         if actual_start_date != start_date:
             print(f"重新加载 {symbol} 从 {actual_start_date} 到 {end_date} 的数据...")
-            self.stock_data = get_stock_data(symbol, actual_start_date, end_date)
+            self.stock_data = self._fetch(symbol, actual_start_date, end_date, auto_adjust)
             if self.stock_data is None or self.stock_data.empty:
                 print(f"重新加载 {symbol} 数据失败")
                 return False
@@ -81,8 +98,15 @@ class StockDripBacktester:
         print(f"数据范围: {self.stock_data.index[0].date()} 到 {self.stock_data.index[-1].date()}")
         return True
     
+    def _fetch(self, symbol: str, start_date: str, end_date: str, auto_adjust: bool) -> Optional[pd.DataFrame]:
+        if auto_adjust:
+            return self.data_provider(symbol, start_date, end_date)
+        return self.data_provider(symbol, start_date, end_date, auto_adjust=False)
+    
+    @instrumentation.traced('run_backtest', 'main')
     def run_backtest(self, amount: float, start_date: str, end_date: str, 
-                    compare: bool = False, strategy: str = 'weekly', strategy_params: Optional[Dict] = None) -> Optional[Dict]:
+                    compare: bool = False, strategy: str = 'weekly', strategy_params: Optional[Dict] = None,
+                    reinvest_dividends: bool = False) -> Optional[Dict]:
         """
         运行定投回测
         
@@ -93,6 +117,7 @@ class StockDripBacktester:
             compare: 是否与一次性投资比较
             strategy: 定投策略 ('weekly' 或 'monthly')
             strategy_params: 策略参数 (例如 {'day_of_week': 0})
+            reinvest_dividends: 是否将分红再投资（需用 load_data(..., auto_adjust=False) 加载未复权价格）
 
         Returns:
             回测结果
@@ -100,15 +125,20 @@ class StockDripBacktester:
         if self.stock_data is None:
             print("请先加载股票数据")
             return None
+        if reinvest_dividends and self.dividend_adjusted:
+            print("分红再投资需要未复权价格，请使用 load_data(..., auto_adjust=False) 重新加载数据")
+            return None
             
         # 使用实际数据的起始日期作为回测开始日期
         actual_start_date = self.stock_data.index[0].strftime('%Y-%m-%d')
         print(f"使用实际数据起始日期 {actual_start_date} 进行回测")
         
         if compare:
-            result = compare_with_lump_sum(self.stock_data, amount, actual_start_date, end_date, strategy, strategy_params)
+            result = compare_with_lump_sum(self.stock_data, amount, actual_start_date, end_date, strategy, strategy_params,
+                                           reinvest_dividends)
         else:
-            result = run_backtest(self.stock_data, amount, actual_start_date, end_date, strategy, strategy_params)
+            result = run_backtest(self.stock_data, amount, actual_start_date, end_date, strategy, strategy_params,
+                                  reinvest_dividends)
             
         return result
     
@@ -139,6 +169,7 @@ class StockDripBacktester:
             print(f"最终股价: ${drip_result['final_price']:.2f}")
             print(f"总收益率: {drip_result['total_return']:.2f}%")
             print(f"年化收益率: {drip_result['annual_return']:.2f}%")
+            print(f"资金加权年化收益率 (XIRR): {drip_result['xirr']:.2f}%")
             
             print(f"\n=== 一次性投资比较 ===")
             print(f"一次性投资价值: ${result['lump_sum_value']:.2f}")
@@ -159,13 +190,20 @@ class StockDripBacktester:
             print(f"最终股价: ${result['final_price']:.2f}")
             print(f"总收益率: {result['total_return']:.2f}%")
             print(f"年化收益率: {result['annual_return']:.2f}%")
+            print(f"资金加权年化收益率 (XIRR): {result['xirr']:.2f}%")
     
-    def plot_results(self, result: Dict):
+    @instrumentation.traced('plot_results', 'main')
+    def plot_results(self, result: Dict, output_dir: str = '.', dpi: int = 300, fmt: str = 'png',
+                     max_points: Optional[int] = DEFAULT_MAX_POINTS):
         """
         绘制回测结果图表
         
         Args:
             result: 回测结果
+            output_dir: 图表输出目录
+            dpi: 图片分辨率
+            fmt: 输出格式 ('png', 'svg' 或 'json')
+            max_points: 每条序列的最大绘制点数，超过时降采样
         """
         if not result:
             print("回测结果为空，无法绘图")
@@ -189,26 +227,25 @@ class StockDripBacktester:
         plt.rcParams['mathtext.it'] = 'WenQuanYi Zen Hei:italic'
         plt.rcParams['mathtext.cal'] = 'WenQuanYi Zen Hei'
         
+        if 'investment_records' not in result:
+            print("回测结果中没有定投记录，无法绘图")
+            return
+        
         try:
-            # 绘制定投增长图
-            fig1 = plot_investment_growth(result, self.symbol)
-            if fig1:
-                fig1.savefig(f'{self.symbol}_investment_growth.png', dpi=300, bbox_inches='tight')
-                print(f"定投增长图已保存为 {self.symbol}_investment_growth.png")
-                plt.close(fig1)
-            
-            # 绘制股价与定投点对比图
-            if 'investment_records' in result:
-                fig2 = plot_price_vs_investment(self.stock_data, result, self.symbol)
-                if fig2:
-                    fig2.savefig(f'{self.symbol}_price_investment.png', dpi=300, bbox_inches='tight')
-                    print(f"股价与定投点对比图已保存为 {self.symbol}_price_investment.png")
-                    plt.close(fig2)
+            paths = render_backtest_charts(self.stock_data, result, self.symbol,
+                                           output_dir=output_dir, dpi=dpi, fmt=fmt, max_points=max_points)
+            for path in paths:
+                print(f"图表已保存为 {path}")
         except Exception as e:
             print(f"绘图时出错: {e}")
 
 def main():
     """主函数 - 支持用户输入股票代码、时间范围和定投策略"""
+    # 设置了 STOCK_BACKTEST_TRACE 环境变量时记录各阶段耗时
+    trace_path = instrumentation.configure_from_env()
+    if trace_path:
+        print(f"已开启性能埋点，退出时将写入 {trace_path}")
+    
     # 创建回测器实例
     backtester = StockDripBacktester()
     
@@ -289,31 +326,8 @@ def main():
         backtester.plot_results(backtest_result['drip_result'] if 'drip_result' in backtest_result else backtest_result)
     else:
         print("无法获取真实股票数据，使用模拟数据进行测试...")
-        # 创建模拟数据进行测试
-        import numpy as np
-        from datetime import datetime, timedelta
-        import pandas as pd
-        
-        # 生成模拟股票数据
-        dates = pd.date_range(start=start_date, end=end_date, freq='D')
-        # 移除周末
-        dates = dates[dates.weekday < 5]
-        
-        # 生成模拟股价数据（从150开始，随机波动）
-        prices = [150.0]
-        for i in range(1, len(dates)):
-            change = np.random.normal(0, 0.02)  # 日收益率均值为0，标准差为2%
-            new_price = prices[-1] * (1 + change)
-            prices.append(max(new_price, 0.01))  # 确保价格为正
-        
-        # 创建DataFrame
-        backtester.stock_data = pd.DataFrame({
-            'Open': prices,
-            'High': [p * (1 + abs(np.random.normal(0, 0.01))) for p in prices],
-            'Low': [p * (1 - abs(np.random.normal(0, 0.01))) for p in prices],
-            'Close': prices,
-            'Volume': [np.random.randint(1000000, 10000000) for _ in range(len(dates))]
-        }, index=dates)
+        # 创建模拟数据进行测试（从150开始，日收益率标准差为2%）
+        backtester.stock_data = make_mock_stock_data(start_date, end_date)
         backtester.symbol = symbol
         
         print("成功创建模拟数据")
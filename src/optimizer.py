@@ -0,0 +1,194 @@
+"""
+滚动前推（walk-forward）参数优化模块
+
+在滚动的样本内窗口上挑选定投计划（策略和投资日），再在紧随其后的样本外窗口上评分，
+避免在整段历史上挑出"最优"参数造成的过拟合。
+
+样本内挑选使用逐次减半（successive halving）：样本内窗口被切成若干段，所有候选先只在最近一段上
+评估，保留得分最高的 1/eta 进入下一轮，并在更多的段上评估，直到只剩一个候选或用完所有段。
+差的候选在很便宜的评估之后就被淘汰，已经算过的段的得分在下一轮直接复用。
+"""
+import math
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import pandas as pd
+import numpy as np
+
+from backtest import run_backtest
+from trading_calendar import TradingCalendar
+from sweep import params_key
+import instrumentation
+
+def schedule_candidates(strategies: Tuple[str, ...] = ('weekly', 'monthly'),
+                        days_of_week: Tuple[int, ...] = (0, 1, 2, 3, 4),
+                        days_of_month: Tuple[int, ...] = tuple(range(1, 29))) -> List[Dict[str, Any]]:
+    """
+    生成候选定投计划
+
+    Args:
+        strategies: 参与比较的策略
+        days_of_week: 按周定投的候选投资日（0=周一）
+        days_of_month: 按月定投的候选投资日
+
+    Returns:
+        候选列表，每项为 {'strategy': ..., 'strategy_params': {...}}
+    """
+    candidates = []
+    if 'weekly' in strategies:
+        candidates += [{'strategy': 'weekly', 'strategy_params': {'day_of_week': day}} for day in days_of_week]
+    if 'monthly' in strategies:
+        candidates += [{'strategy': 'monthly', 'strategy_params': {'day_of_month': day}} for day in days_of_month]
+    return candidates
+
+def walk_forward_windows(start_date: str, end_date: str, train_years: int = 3, test_years: int = 1,
+                         step_years: Optional[int] = None) -> List[Tuple[str, str, str, str]]:
+    """
+    生成滚动前推窗口
+
+    Args:
+        start_date: 开始日期
+        end_date: 结束日期
+        train_years: 样本内窗口年数
+        test_years: 样本外窗口年数
+        step_years: 每次前推的年数，默认等于 test_years
+
+    Returns:
+        (样本内开始, 样本内结束, 样本外开始, 样本外结束) 日期字符串元组的列表
+    """
+    step = pd.DateOffset(years=step_years or test_years)
+    end = pd.Timestamp(end_date)
+    windows = []
+    train_start = pd.Timestamp(start_date)
+    while True:
+        test_start = train_start + pd.DateOffset(years=train_years)
+        test_end = test_start + pd.DateOffset(years=test_years) - pd.Timedelta(days=1)
+        if test_end > end:
+            break
+        windows.append(tuple(date.strftime('%Y-%m-%d') for date in
+                             (train_start, test_start - pd.Timedelta(days=1), test_start, test_end)))
+        train_start += step
+    return windows
+
+def successive_halving(n_candidates: int, evaluate: Callable[[int, int], float], n_segments: int,
+                       eta: int = 3, min_segments: int = 1) -> Dict[str, Any]:
+    """
+    逐次减半挑选得分最高的候选
+
+    第 k 轮在最近的 min_segments × eta^k 段上评估存活的候选（得分为各段得分的平均值），
+    保留前 1/eta；只剩一个候选或已经用完所有段时结束。
+
+    Args:
+        n_candidates: 候选个数
+        evaluate: 评估函数 (候选序号, 段序号) -> 得分，段序号越大越接近现在；NaN视为最差
+        n_segments: 段数
+        eta: 每轮的淘汰比例
+        min_segments: 第一轮评估的段数
+
+    Returns:
+        {'best': 最优候选序号, 'score': 其得分, 'evaluations': 评估次数, 'rungs': 每轮存活的候选数}
+    """
+    scores: Dict[Tuple[int, int], float] = {}
+    survivors = list(range(n_candidates))
+    budget = min(max(min_segments, 1), n_segments)
+    rungs = []
+    while True:
+        segments = range(n_segments - budget, n_segments)
+        means = []
+        for candidate in survivors:
+            for segment in segments:
+                if (candidate, segment) not in scores:
+                    scores[(candidate, segment)] = evaluate(candidate, segment)
+            values = np.array([scores[(candidate, segment)] for segment in segments], dtype=float)
+            means.append(values.mean() if np.all(np.isfinite(values)) else -np.inf)
+        rungs.append(len(survivors))
+        order = np.argsort(-np.asarray(means), kind='stable')
+        if len(survivors) == 1 or budget == n_segments:
+            best = order[0]
+            return {'best': survivors[best], 'score': float(means[best]), 'evaluations': len(scores),
+                    'rungs': rungs}
+        keep = max(1, math.ceil(len(survivors) / eta))
+        survivors = [survivors[i] for i in order[:keep]]
+        budget = min(budget * eta, n_segments)
+
+@instrumentation.traced('walk_forward', 'optimizer')
+def walk_forward_optimize(stock_data: pd.DataFrame, amount: float, start_date: str, end_date: str,
+                          candidates: Optional[List[Dict[str, Any]]] = None, train_years: int = 3,
+                          test_years: int = 1, step_years: Optional[int] = None, metric: str = 'xirr',
+                          segments_per_year: int = 2, eta: int = 3, min_segments: int = 1) -> Dict:
+    """
+    滚动前推优化定投计划
+
+    每个窗口在样本内用逐次减半挑选 metric 最高的候选，再用样本外窗口的 metric 给这次挑选评分。
+
+    Args:
+        stock_data: 股票数据
+        amount: 每期定投金额
+        start_date: 开始日期
+        end_date: 结束日期
+        candidates: 候选定投计划（{'strategy', 'strategy_params'} 字典的列表），默认为 schedule_candidates()
+        train_years: 样本内窗口年数
+        test_years: 样本外窗口年数
+        step_years: 每次前推的年数
+        metric: 评分指标（run_backtest 结果中的键，越大越好）
+        segments_per_year: 样本内窗口每年切成的段数
+        eta: 逐次减半每轮的淘汰比例
+        min_segments: 第一轮评估的段数
+
+    Returns:
+        结果字典：folds（每个窗口一行的DataFrame，包含所选候选、样本内和样本外得分）、
+        out_of_sample（样本外得分均值）、selections（各候选被选中的次数）、
+        evaluations（实际回测次数）和 grid_evaluations（全网格需要的回测次数）
+    """
+    if candidates is None:
+        candidates = schedule_candidates()
+    if not candidates:
+        raise ValueError("候选定投计划不能为空")
+    calendar = TradingCalendar(stock_data.index)
+    n_segments = max(1, int(train_years * segments_per_year))
+
+    def score(candidate: Dict[str, Any], start: pd.Timestamp, end: pd.Timestamp) -> float:
+        result = run_backtest(stock_data, amount, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                              candidate['strategy'], candidate.get('strategy_params'), calendar=calendar,
+                              keep_records=False)
+        return result.get(metric, np.nan) if result else np.nan
+
+    rows = []
+    evaluations = 0
+    for train_start, train_end, test_start, test_end in walk_forward_windows(start_date, end_date, train_years,
+                                                                           test_years, step_years):
+        # 样本内窗口等分为 n_segments 段
+        bounds = pd.date_range(train_start, pd.Timestamp(train_end) + pd.Timedelta(days=1),
+                               periods=n_segments + 1).normalize()
+
+        def evaluate(candidate: int, segment: int) -> float:
+            return score(candidates[candidate], bounds[segment], bounds[segment + 1] - pd.Timedelta(days=1))
+
+        with instrumentation.span('halving', 'optimizer', train_start=train_start):
+            selection = successive_halving(len(candidates), evaluate, n_segments, eta, min_segments)
+        best = candidates[selection['best']]
+        evaluations += selection['evaluations'] + 1
+        rows.append({
+            'train_start': train_start,
+            'train_end': train_end,
+            'test_start': test_start,
+            'test_end': test_end,
+            'strategy': best['strategy'],
+            'strategy_params': best.get('strategy_params') or {},
+            'in_sample': selection['score'],
+            'out_of_sample': score(best, pd.Timestamp(test_start), pd.Timestamp(test_end)),
+            'evaluations': selection['evaluations'] + 1,
+        })
+
+    folds = pd.DataFrame(rows, columns=['train_start', 'train_end', 'test_start', 'test_end', 'strategy',
+                                        'strategy_params', 'in_sample', 'out_of_sample', 'evaluations'])
+    selections: Dict[str, int] = {}
+    for row in rows:
+        key = params_key({'strategy': row['strategy'], 'strategy_params': row['strategy_params']})
+        selections[key] = selections.get(key, 0) + 1
+    return {
+        'folds': folds,
+        'out_of_sample': float(folds['out_of_sample'].mean()) if rows else np.nan,
+        'selections': selections,
+        'evaluations': evaluations,
+        'grid_evaluations': len(rows) * (len(candidates) * n_segments + 1),
+    }
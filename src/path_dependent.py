@@ -0,0 +1,173 @@
+"""
+路径依赖策略模块
+
+价值平均（value averaging）和目标余额策略每期的投入取决于当时持仓的市值，无法用定投的累计求和表达。
+这里用一个紧凑的数组状态机只在定投日上循环（而不是每根K线），每一步同时推进多组参数
+（每组参数一行），一次遍历价格数组即可比较几十上百种参数组合。
+"""
+from typing import Dict, Any, List, Tuple, Union
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+
+from backtest import _schedule_positions, _final_price
+from investment_strategy import generate_investment_dates, schedule_amounts
+from xirr import xirr_batch, schedule_cashflows
+import instrumentation
+
+def value_averaging_targets(investment_dates: List[datetime], amount: float,
+                            growth_rate: Union[float, np.ndarray] = 0.0) -> np.ndarray:
+    """
+    生成价值平均策略的目标市值
+
+    第 i 次定投后持仓的目标市值为 amount × (i + 1) × (1 + growth_rate)^t，
+    t 为距第一次定投的年数：市值按期稳定增长，涨多了少投（或卖出），跌多了多投。
+
+    Args:
+        investment_dates: 定投日期列表（generate_investment_dates 的返回值）
+        amount: 每期目标市值增量
+        growth_rate: 目标市值的年增长率；传入数组时每个增长率一行
+
+    Returns:
+        形状为 (增长率个数, 定投次数) 的目标市值矩阵
+    """
+    dates = pd.DatetimeIndex(investment_dates)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    steps = np.arange(1, len(dates) + 1, dtype=float)
+    years = np.asarray((dates - dates[0]) / pd.Timedelta(days=365.25), dtype=float) if len(dates) else steps
+    growth = np.power.outer(1 + np.atleast_1d(np.asarray(growth_rate, dtype=float)), years)
+    return amount * steps * growth
+
+def simulate_target_path(prices: np.ndarray, targets: np.ndarray, min_contribution=0.0,
+                         max_contribution=np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按目标市值逐期投入的状态机
+
+    每个定投日把持仓市值补到（或减到）目标市值：投入 = clip(目标 - 当前市值, 下限, 上限)，
+    卖出不超过当前持仓。状态只有每组参数的持股数，每一步是对所有参数组的一次数组运算。
+
+    Args:
+        prices: 每次定投的买入价格，形状为 (定投次数,)
+        targets: 目标市值矩阵，形状为 (参数组数, 定投次数)
+        min_contribution: 每期投入下限（标量或每组参数一个值）；0 表示只买不卖，-inf 表示允许任意卖出
+        max_contribution: 每期投入上限（标量或每组参数一个值）
+
+    Returns:
+        (每期投入矩阵（负数为卖出所得）, 每组参数最终持股数)
+    """
+    n_params = len(targets)
+    lower = np.full(n_params, min_contribution, dtype=float)
+    upper = np.full(n_params, max_contribution, dtype=float)
+    # 按定投日为行存放，每一步读写的都是连续内存
+    target_rows = np.ascontiguousarray(targets.T)
+    contributions = np.empty_like(target_rows)
+    shares = np.zeros(n_params)
+    value = np.empty(n_params)
+    floor = np.empty(n_params)
+    for i, price in enumerate(prices):
+        step = contributions[i]
+        np.multiply(shares, price, out=value)
+        np.subtract(target_rows[i], value, out=step)
+        # 卖出不能超过当前持仓
+        np.negative(value, out=floor)
+        np.maximum(floor, lower, out=floor)
+        np.maximum(step, floor, out=step)
+        np.minimum(step, upper, out=step)
+        shares += step / price
+    return contributions.T, shares
+
+@instrumentation.traced('path_dependent', 'path_dependent')
+def run_path_dependent(stock_data: pd.DataFrame, targets: np.ndarray, start_date: str, end_date: str,
+                       strategy: str = 'weekly', strategy_params: Dict[str, Any] = None,
+                       min_contribution=0.0, max_contribution=np.inf, calendar=None) -> pd.DataFrame:
+    """
+    对多组目标市值运行路径依赖回测
+
+    Args:
+        stock_data: 股票数据
+        targets: 与定投日期对齐的目标市值，形状为 (参数组数, 定投日期数)，例如 value_averaging_targets 的返回值
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        min_contribution: 每期投入下限（标量或每组参数一个值）
+        max_contribution: 每期投入上限（标量或每组参数一个值）
+        calendar: 共享的 TradingCalendar
+
+    Returns:
+        每组参数一行的DataFrame：total_investment（累计买入）、total_withdrawn（累计卖出所得）、
+        final_shares、final_value、total_return、annual_return、xirr
+    """
+    positions = _schedule_positions(stock_data, strategy, start_date, end_date, strategy_params, calendar)
+    targets = schedule_amounts(np.atleast_2d(targets), len(positions))
+    columns = ['total_investment', 'total_withdrawn', 'final_shares', 'final_value',
+               'total_return', 'annual_return', 'xirr']
+    if len(positions) == 0:
+        return pd.DataFrame(columns=columns)
+    instrumentation.count('investments', len(positions) * len(targets))
+
+    prices = stock_data['Close'].to_numpy(dtype=float)[positions]
+    contributions, shares = simulate_target_path(prices, targets, min_contribution, max_contribution)
+
+    with instrumentation.span('aggregation', 'path_dependent'):
+        final_value = shares * _final_price(stock_data, end_date)
+        total_investment = np.clip(contributions, 0, None).sum(axis=1)
+        total_withdrawn = np.clip(-contributions, 0, None).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 卖出所得视为已实现的价值
+            growth = (final_value + total_withdrawn) / total_investment
+            total_return = (growth - 1) * 100
+            years = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days / 365.25
+            annual_return = (growth ** (1 / years) - 1) * 100 if years > 0 else np.zeros(len(targets))
+
+        flows = schedule_cashflows(stock_data.index[positions], np.zeros(len(positions)), 0.0, end_date)
+        cashflows = np.concatenate([-contributions, final_value[:, None]], axis=1)
+        xirr_percent = xirr_batch(cashflows, flows['years']) * 100
+
+    return pd.DataFrame({
+        'total_investment': total_investment,
+        'total_withdrawn': total_withdrawn,
+        'final_shares': shares,
+        'final_value': final_value,
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'xirr': xirr_percent,
+    }, columns=columns)
+
+def run_value_averaging(stock_data: pd.DataFrame, amount: float, start_date: str, end_date: str,
+                        strategy: str = 'weekly', strategy_params: Dict[str, Any] = None,
+                        growth_rates: Union[float, np.ndarray] = 0.0,
+                        max_multipliers: Union[float, np.ndarray] = np.inf,
+                        allow_sell: bool = False, calendar=None) -> pd.DataFrame:
+    """
+    价值平均策略回测（可批量比较多组参数）
+
+    growth_rates 与 max_multipliers 按元素配对（标量会被广播），每对参数一行。
+
+    Args:
+        stock_data: 股票数据
+        amount: 每期目标市值增量
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        growth_rates: 目标市值的年增长率
+        max_multipliers: 每期投入上限相对 amount 的倍数
+        allow_sell: 市值超过目标时是否卖出
+        calendar: 共享的 TradingCalendar
+
+    Returns:
+        每组参数一行的DataFrame（前两列为 growth_rate 和 max_multiplier，其余同 run_path_dependent）
+    """
+    growth_rates, max_multipliers = np.broadcast_arrays(np.atleast_1d(np.asarray(growth_rates, dtype=float)),
+                                                        np.atleast_1d(np.asarray(max_multipliers, dtype=float)))
+    dates = generate_investment_dates(strategy, start_date, end_date, strategy_params)
+    targets = value_averaging_targets(dates, amount, growth_rates)
+    result = run_path_dependent(stock_data, targets, start_date, end_date, strategy, strategy_params,
+                                min_contribution=-np.inf if allow_sell else 0.0,
+                                max_contribution=max_multipliers * amount, calendar=calendar)
+    result.insert(0, 'max_multiplier', max_multipliers if len(result) else [])
+    result.insert(0, 'growth_rate', growth_rates if len(result) else [])
+    return result
@@ -0,0 +1,246 @@
+"""
+图表渲染流水线模块
+"""
+import os
+import json
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import warnings
+warnings.filterwarnings('ignore')
+
+import instrumentation
+from visualization import (downsample_lttb, plot_investment_growth, plot_price_vs_investment,
+                           finalize_standalone_axes, growth_chart_title)
+
+SUPPORTED_FORMATS = ('png', 'svg', 'json')
+DEFAULT_MAX_POINTS = 2000
+
+def _to_epoch_ms(dates) -> np.ndarray:
+    """将日期序列转换为毫秒时间戳（便于序列化和网页绘图）"""
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ms').asi8
+
+def _select(values: np.ndarray, y: np.ndarray, max_points: Optional[int]) -> np.ndarray:
+    """返回按 y 的形状降采样后保留的索引"""
+    return downsample_lttb(values.astype(float), y, max_points)
+
+@instrumentation.traced('downsample', 'rendering')
+def build_chart_payload(stock_data: pd.DataFrame, backtest_result: Dict, symbol: str,
+                        max_points: Optional[int] = DEFAULT_MAX_POINTS) -> Dict:
+    """
+    构建已降采样的图表数据
+
+    返回的字典只包含numpy数组和标量，可以廉价地传递给渲染子进程，
+    也可以直接序列化为JSON供网页端绘图。
+
+    Args:
+        stock_data: 股票数据
+        backtest_result: 回测结果
+        symbol: 股票代码
+        max_points: 每条序列的最大点数，None表示不降采样
+
+    Returns:
+        图表数据字典
+    """
+    records = backtest_result['investment_records']
+    record_ms = _to_epoch_ms(records['Date'])
+    price = records['Price'].to_numpy(dtype=float)
+    cumulative_shares = records['Cumulative_Shares'].to_numpy(dtype=float)
+    cumulative_amount = records['Cumulative_Amount'].to_numpy(dtype=float)
+
+    # 增长图按投资价值的形状降采样，定投点按买入价格的形状降采样
+    growth_idx = _select(record_ms, cumulative_shares * price, max_points)
+    points_idx = _select(record_ms, price, max_points)
+
+    close_ms = _to_epoch_ms(stock_data.index)
+    close = stock_data['Close'].to_numpy(dtype=float)
+    close_idx = _select(close_ms, close, max_points)
+
+    return {
+        'symbol': symbol,
+        'summary': {key: float(backtest_result[key]) for key in
+                    ('total_investment', 'final_value', 'total_return', 'annual_return', 'xirr')},
+        'growth': {
+            'dates': record_ms[growth_idx],
+            'price': price[growth_idx],
+            'cumulative_shares': cumulative_shares[growth_idx],
+            'cumulative_amount': cumulative_amount[growth_idx],
+        },
+        'investments': {
+            'dates': record_ms[points_idx],
+            'price': price[points_idx],
+        },
+        'price': {
+            'dates': close_ms[close_idx],
+            'close': close[close_idx],
+        },
+    }
+
+def payload_to_json(payload: Dict) -> Dict:
+    """将图表数据中的numpy数组转换为列表，得到可JSON序列化的字典"""
+    def convert(value):
+        if isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        return value
+    return convert(payload)
+
+def _new_figure():
+    """创建不依赖pyplot全局状态的Agg画布图表"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    return fig
+
+def render_payload(payload: Dict, output_dir: str = '.', dpi: int = 100, fmt: str = 'png') -> List[str]:
+    """
+    将图表数据渲染为文件
+
+    Args:
+        payload: build_chart_payload 返回的图表数据
+        output_dir: 输出目录
+        dpi: 图片分辨率
+        fmt: 输出格式 ('png', 'svg' 或 'json')
+
+    Returns:
+        生成的文件路径列表
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"不支持的图表格式: {fmt}，可选: {', '.join(SUPPORTED_FORMATS)}")
+
+    symbol = payload['symbol']
+    os.makedirs(output_dir, exist_ok=True)
+    with instrumentation.span('render', 'rendering', symbol=symbol, fmt=fmt):
+        return _render_payload_files(payload, output_dir, dpi, fmt)
+
+def _render_payload_files(payload: Dict, output_dir: str, dpi: int, fmt: str) -> List[str]:
+    """按格式写出图表文件"""
+    symbol = payload['symbol']
+
+    if fmt == 'json':
+        path = os.path.join(output_dir, f'{symbol}_charts.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload_to_json(payload), f, ensure_ascii=False)
+        return [path]
+
+    growth = payload['growth']
+    result = dict(payload['summary'])
+    result['investment_records'] = pd.DataFrame({
+        'Date': pd.to_datetime(growth['dates'], unit='ms'),
+        'Price': growth['price'],
+        'Cumulative_Shares': growth['cumulative_shares'],
+        'Cumulative_Amount': growth['cumulative_amount'],
+    })
+    points = payload['investments']
+    points_result = {'investment_records': pd.DataFrame({
+        'Date': pd.to_datetime(points['dates'], unit='ms'),
+        'Price': points['price'],
+    })}
+    price = payload['price']
+    price_data = pd.DataFrame({'Close': price['close']},
+                              index=pd.to_datetime(price['dates'], unit='ms'))
+
+    paths = []
+
+    # 绘制定投增长图
+    fig = _new_figure()
+    ax = fig.add_subplot(111)
+    plot_investment_growth(result, symbol, ax=ax)
+    finalize_standalone_axes(ax, growth_chart_title(result, symbol), '金额 ($)')
+    path = os.path.join(output_dir, f'{symbol}_investment_growth.{fmt}')
+    fig.savefig(path, dpi=dpi, bbox_inches='tight', format=fmt)
+    paths.append(path)
+
+    # 绘制股价与定投点对比图
+    fig = _new_figure()
+    ax = fig.add_subplot(111)
+    plot_price_vs_investment(price_data, points_result, symbol, ax=ax)
+    finalize_standalone_axes(ax, f'{symbol} 股价与定投点对比', '股价 ($)')
+    path = os.path.join(output_dir, f'{symbol}_price_investment.{fmt}')
+    fig.savefig(path, dpi=dpi, bbox_inches='tight', format=fmt)
+    paths.append(path)
+
+    return paths
+
+def render_backtest_charts(stock_data: pd.DataFrame, backtest_result: Dict, symbol: str,
+                           output_dir: str = '.', dpi: int = 100, fmt: str = 'png',
+                           max_points: Optional[int] = DEFAULT_MAX_POINTS) -> List[str]:
+    """
+    在当前进程中渲染单个股票的回测图表
+
+    Args:
+        stock_data: 股票数据
+        backtest_result: 回测结果
+        symbol: 股票代码
+        output_dir: 输出目录
+        dpi: 图片分辨率
+        fmt: 输出格式 ('png', 'svg' 或 'json')
+        max_points: 每条序列的最大点数
+
+    Returns:
+        生成的文件路径列表
+    """
+    payload = build_chart_payload(stock_data, backtest_result, symbol, max_points)
+    return render_payload(payload, output_dir, dpi, fmt)
+
+def _init_render_worker():
+    """渲染子进程初始化：强制使用非交互式Agg后端"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+def render_charts_parallel(jobs: List[Tuple[str, pd.DataFrame, Dict]], output_dir: str = '.',
+                           dpi: int = 100, fmt: str = 'png',
+                           max_points: Optional[int] = DEFAULT_MAX_POINTS,
+                           max_workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    使用进程池并行渲染多个股票的回测图表
+
+    降采样在主进程中完成，子进程只接收紧凑的numpy数组而不是完整的DataFrame。
+
+    Args:
+        jobs: (股票代码, 股票数据, 回测结果) 元组列表
+        output_dir: 输出目录
+        dpi: 图片分辨率
+        fmt: 输出格式 ('png', 'svg' 或 'json')
+        max_points: 每条序列的最大点数
+        max_workers: 最大进程数，默认为CPU核数
+
+    Returns:
+        股票代码到生成文件路径列表的字典
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"不支持的图表格式: {fmt}，可选: {', '.join(SUPPORTED_FORMATS)}")
+
+    payloads = []
+    for symbol, stock_data, backtest_result in jobs:
+        if not backtest_result or 'investment_records' not in backtest_result:
+            print(f"{symbol} 的回测结果无效，跳过绘图")
+            continue
+        payloads.append(build_chart_payload(stock_data, backtest_result, symbol, max_points))
+
+    outputs = {}
+
+    # JSON 输出或单个任务无需启动进程池
+    if fmt == 'json' or len(payloads) <= 1 or max_workers == 1:
+        for payload in payloads:
+            outputs[payload['symbol']] = render_payload(payload, output_dir, dpi, fmt)
+        return outputs
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_render_worker) as executor:
+        futures = {executor.submit(render_payload, payload, output_dir, dpi, fmt): payload['symbol']
+                   for payload in payloads}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                outputs[symbol] = future.result()
+            except Exception as e:
+                print(f"渲染 {symbol} 图表时出错: {e}")
+
+    return outputs
@@ -0,0 +1,236 @@
+"""
+回测结果存储模块
+
+将批量回测和参数扫描的结果以列式表格追加写入 SQLite 文件：每个结果一行，标量指标各占一列，
+按 (run_id, symbol) 建立索引。写入先在内存中缓冲，凑满一批后一次性提交；
+查询接口支持按运行批次、股票代码过滤，分块读取和在数据库中直接聚合，不需要把全部结果载入内存。
+"""
+import sqlite3
+import uuid
+import numbers
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+TABLE = 'results'
+KEY_COLUMNS = ('run_id', 'symbol')
+AGGREGATE_FUNCTIONS = {'count': 'COUNT', 'sum': 'SUM', 'mean': 'AVG', 'min': 'MIN', 'max': 'MAX'}
+
+def new_run_id() -> str:
+    """生成带时间戳的运行批次ID"""
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+def flatten_result(result: Dict, prefix: str = '') -> Dict[str, Any]:
+    """
+    将回测结果展开为只含标量的平铺字典
+
+    嵌套字典（如 drip_result）以 "drip_result.total_return" 的形式展开，
+    DataFrame、数组等非标量值被忽略。
+
+    Args:
+        result: 回测结果
+        prefix: 键名前缀
+
+    Returns:
+        列名到标量值的字典
+    """
+    row = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            row.update(flatten_result(value, f"{name}."))
+        elif value is None or isinstance(value, (str, bool, numbers.Number)):
+            # numpy 标量转换为 Python 类型，sqlite3 才能直接写入
+            row[name] = value.item() if hasattr(value, 'item') else value
+    return row
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _column_type(value) -> str:
+    if isinstance(value, str):
+        return 'TEXT'
+    if isinstance(value, (bool, numbers.Integral)):
+        return 'INTEGER'
+    return 'REAL'
+
+class ResultsStore:
+    """
+    追加写入的回测结果存储（SQLite）
+
+    可用作上下文管理器，退出时写入剩余缓冲并关闭连接。
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000):
+        """
+        Args:
+            path: SQLite 数据库文件路径（':memory:' 表示内存数据库）
+            batch_size: 缓冲多少行后提交一次
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path)
+        # WAL 模式下写入过程中也可以从其他连接读取
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (run_id TEXT NOT NULL, symbol TEXT NOT NULL)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_run_symbol ON {TABLE} (run_id, symbol)")
+        self._conn.commit()
+        self._columns = self._existing_columns()
+        self._buffer: List[Dict[str, Any]] = []
+
+    def _existing_columns(self) -> List[str]:
+        return [row[1] for row in self._conn.execute(f"PRAGMA table_info({TABLE})")]
+
+    def append(self, run_id: str, symbol: str, result: Dict):
+        """
+        追加一个回测结果
+
+        Args:
+            run_id: 运行批次ID
+            symbol: 股票代码（参数扫描时可以是任意的分组键）
+            result: 回测结果字典（会被展开为标量列）
+        """
+        row = flatten_result(result)
+        row['run_id'] = run_id
+        row['symbol'] = symbol
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """将缓冲中的结果写入数据库"""
+        if not self._buffer:
+            return
+        # 出现新的指标时增加列，旧行的该列为NULL
+        for row in self._buffer:
+            for name, value in row.items():
+                if name not in self._columns:
+                    self._conn.execute(f"ALTER TABLE {TABLE} ADD COLUMN {_quote(name)} {_column_type(value)}")
+                    self._columns.append(name)
+        columns = ', '.join(_quote(name) for name in self._columns)
+        placeholders = ', '.join('?' for _ in self._columns)
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO {TABLE} ({columns}) VALUES ({placeholders})",
+                                   [tuple(row.get(name) for name in self._columns) for row in self._buffer])
+        self._buffer.clear()
+
+    @property
+    def columns(self) -> List[str]:
+        """当前表中的所有列"""
+        return list(self._columns)
+
+    def _where(self, run_id: Optional[str], symbols: Optional[Sequence[str]], where: Optional[str]):
+        clauses, params = [], []
+        if run_id is not None:
+            clauses.append('run_id = ?')
+            params.append(run_id)
+        if symbols is not None:
+            symbols = list(symbols)
+            clauses.append(f"symbol IN ({', '.join('?' for _ in symbols)})")
+            params.extend(symbols)
+        if where:
+            clauses.append(f"({where})")
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _select(self, columns, run_id, symbols, where, params):
+        self.flush()
+        selected = '*' if columns is None else ', '.join(_quote(name) for name in columns)
+        clause, clause_params = self._where(run_id, symbols, where)
+        return f"SELECT {selected} FROM {TABLE}{clause}", clause_params + list(params)
+
+    def query(self, run_id: Optional[str] = None, symbols: Optional[Sequence[str]] = None,
+              columns: Optional[Sequence[str]] = None, where: Optional[str] = None,
+              params: Sequence = ()) -> pd.DataFrame:
+        """
+        查询结果
+
+        Args:
+            run_id: 只返回该运行批次的结果
+            symbols: 只返回这些股票的结果
+            columns: 需要的列，None表示全部
+            where: 额外的 SQL 条件，例如 '"total_return" > ?'
+            params: where 中占位符对应的参数
+
+        Returns:
+            结果DataFrame
+        """
+        sql, sql_params = self._select(columns, run_id, symbols, where, params)
+        return pd.read_sql_query(sql, self._conn, params=sql_params)
+
+    def iter_query(self, run_id: Optional[str] = None, symbols: Optional[Sequence[str]] = None,
+                   columns: Optional[Sequence[str]] = None, where: Optional[str] = None,
+                   params: Sequence = (), chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        分块查询结果，每次只有一块驻留内存
+
+        Args:
+            run_id: 运行批次ID
+            symbols: 股票代码列表
+            columns: 需要的列
+            where: 额外的 SQL 条件
+            params: where 中占位符对应的参数
+            chunksize: 每块行数
+
+        Yields:
+            结果DataFrame块
+        """
+        sql, sql_params = self._select(columns, run_id, symbols, where, params)
+        yield from pd.read_sql_query(sql, self._conn, params=sql_params, chunksize=chunksize)
+
+    def aggregate(self, column: str, by: Optional[str] = 'symbol', run_id: Optional[str] = None,
+                  symbols: Optional[Sequence[str]] = None, where: Optional[str] = None, params: Sequence = (),
+                  funcs: Sequence[str] = ('count', 'mean', 'min', 'max')) -> pd.DataFrame:
+        """
+        在数据库中分组聚合某一列
+
+        Args:
+            column: 聚合的列
+            by: 分组列（例如 'symbol' 或 'run_id'），None表示不分组
+            run_id: 运行批次ID
+            symbols: 股票代码列表
+            where: 额外的 SQL 条件
+            params: where 中占位符对应的参数
+            funcs: 聚合函数，可选 count / sum / mean / min / max
+
+        Returns:
+            每组一行、每个聚合函数一列的DataFrame
+        """
+        self.flush()
+        unknown = [func for func in funcs if func not in AGGREGATE_FUNCTIONS]
+        if unknown:
+            raise ValueError(f"不支持的聚合函数: {unknown}")
+        selected = [f"{AGGREGATE_FUNCTIONS[func]}({_quote(column)}) AS {_quote(func)}" for func in funcs]
+        if by is not None:
+            selected.insert(0, _quote(by))
+        clause, clause_params = self._where(run_id, symbols, where)
+        sql = f"SELECT {', '.join(selected)} FROM {TABLE}{clause}"
+        if by is not None:
+            sql += f" GROUP BY {_quote(by)} ORDER BY {_quote(by)}"
+        frame = pd.read_sql_query(sql, self._conn, params=clause_params + list(params))
+        return frame.set_index(by) if by is not None else frame
+
+    def run_ids(self) -> List[str]:
+        """所有运行批次ID"""
+        self.flush()
+        return [row[0] for row in self._conn.execute(f"SELECT DISTINCT run_id FROM {TABLE} ORDER BY run_id")]
+
+    def count(self, run_id: Optional[str] = None) -> int:
+        """结果行数"""
+        self.flush()
+        clause, params = self._where(run_id, None, None)
+        return self._conn.execute(f"SELECT COUNT(*) FROM {TABLE}{clause}", params).fetchone()[0]
+
+    def close(self):
+        """写入剩余缓冲并关闭连接"""
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,213 @@
+"""
+信号策略模块
+
+在按周/按月的定投计划之上叠加基于价格信号的规则：价格低于200日均线时加倍买入、RSI过高时跳过、
+按回撤幅度放大金额等。规则以数组运算表达，返回每次定投的金额倍数（0表示跳过）。
+
+指标由 IndicatorCache 按 (序列指纹, 指标, 窗口) 缓存，同一个股票上运行几十个信号策略时
+每条均线只计算一次。
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Union
+
+import pandas as pd
+import numpy as np
+
+import instrumentation
+
+# 指标函数：(收盘价数组, 窗口) -> 与收盘价等长的数组
+INDICATORS: Dict[str, Callable[[np.ndarray, Optional[int]], np.ndarray]] = {}
+# 信号策略：(SignalContext, **参数) -> 每次定投的金额倍数数组
+SIGNAL_STRATEGIES: Dict[str, Callable[..., np.ndarray]] = {}
+
+def register_indicator(name: str):
+    """注册指标函数的装饰器"""
+    def decorator(func):
+        INDICATORS[name] = func
+        return func
+    return decorator
+
+def register_signal(name: str):
+    """注册信号策略的装饰器"""
+    def decorator(func):
+        SIGNAL_STRATEGIES[name] = func
+        return func
+    return decorator
+
+@register_indicator('sma')
+def simple_moving_average(close: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均，前 window-1 个值为NaN"""
+    values = np.full(len(close), np.nan)
+    if window <= len(close):
+        cumulative = np.cumsum(np.insert(close, 0, 0.0))
+        values[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return values
+
+@register_indicator('ema')
+def exponential_moving_average(close: np.ndarray, window: int) -> np.ndarray:
+    """指数移动平均（span=window）"""
+    return pd.Series(close).ewm(span=window, adjust=False).mean().to_numpy()
+
+@register_indicator('rsi')
+def relative_strength_index(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """相对强弱指数（Wilder 平滑），前 window 个值为NaN"""
+    change = np.diff(close, prepend=np.nan)
+    gains = pd.Series(np.clip(change, 0, None))
+    losses = pd.Series(np.clip(-change, 0, None))
+    average_gain = gains.ewm(alpha=1 / window, adjust=False, min_periods=window).mean().to_numpy()
+    average_loss = losses.ewm(alpha=1 / window, adjust=False, min_periods=window).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + average_gain / average_loss)
+    # 没有下跌时RSI为100
+    return np.where((average_loss == 0) & (average_gain > 0), 100.0, rsi)
+
+@register_indicator('drawdown')
+def drawdown(close: np.ndarray, window: Optional[int] = None) -> np.ndarray:
+    """相对历史最高价（或最近 window 个交易日最高价）的回撤比例，0到1之间"""
+    if window is None:
+        peak = np.maximum.accumulate(close)
+    else:
+        peak = pd.Series(close).rolling(window, min_periods=1).max().to_numpy()
+    return 1 - close / peak
+
+class IndicatorCache:
+    """
+    指标缓存
+
+    键为 (序列指纹, 指标名称, 窗口)，按最近使用顺序淘汰，最多保留 max_entries 个指标数组。
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries: 最多缓存的指标数组个数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def series_key(stock_data: pd.DataFrame) -> str:
+        """根据交易日和收盘价计算序列指纹"""
+        digest = hashlib.sha1()
+        index = pd.DatetimeIndex(stock_data.index)
+        digest.update(f"{index.tz}|{index.unit}".encode())
+        digest.update(np.ascontiguousarray(index.asi8))
+        digest.update(np.ascontiguousarray(stock_data['Close'].to_numpy(dtype=np.float64)))
+        return digest.hexdigest()
+
+    def get(self, series_key: str, close: np.ndarray, name: str, window: Optional[int] = None) -> np.ndarray:
+        """
+        获取指标数组（有缓存）
+
+        Args:
+            series_key: 序列指纹（series_key 的返回值）
+            close: 收盘价数组
+            name: 指标名称（INDICATORS 中注册的名称）
+            window: 窗口
+
+        Returns:
+            与收盘价等长的只读指标数组
+        """
+        key = (series_key, name, window)
+        values = self._entries.get(key)
+        if values is not None:
+            instrumentation.count('indicator.hit')
+            self._entries.move_to_end(key)
+            return values
+
+        if name not in INDICATORS:
+            raise ValueError(f"不支持的指标: {name}")
+        instrumentation.count('indicator.miss')
+        with instrumentation.span('indicator', 'signals', indicator=name, window=window):
+            values = INDICATORS[name](close, window) if window is not None else INDICATORS[name](close)
+        values.flags.writeable = False
+        self._entries[key] = values
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return values
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+# 未指定缓存时使用的进程内共享缓存
+default_indicator_cache = IndicatorCache()
+
+class SignalContext:
+    """
+    信号策略可用的数据：定投日的价格，以及在定投日取值的指标
+    """
+
+    def __init__(self, stock_data: pd.DataFrame, positions: np.ndarray, cache: IndicatorCache):
+        self.stock_data = stock_data
+        self.positions = positions
+        self.cache = cache
+        self.close = stock_data['Close'].to_numpy(dtype=float)
+        self._series_key = None
+
+    @property
+    def price(self) -> np.ndarray:
+        """每次定投当天的收盘价"""
+        return self.close[self.positions]
+
+    def indicator(self, name: str, window: Optional[int] = None) -> np.ndarray:
+        """
+        获取指标在每次定投当天的取值
+
+        Args:
+            name: 指标名称
+            window: 窗口
+
+        Returns:
+            与定投次数等长的数组（历史不足时为NaN）
+        """
+        if self._series_key is None:
+            self._series_key = IndicatorCache.series_key(self.stock_data)
+        return self.cache.get(self._series_key, self.close, name, window)[self.positions]
+
+@register_signal('below_ma')
+def below_moving_average(ctx: SignalContext, window: int = 200, multiplier: float = 2.0) -> np.ndarray:
+    """价格低于移动平均线时按 multiplier 倍买入"""
+    return np.where(ctx.price < ctx.indicator('sma', window), multiplier, 1.0)
+
+@register_signal('rsi_skip')
+def skip_when_overbought(ctx: SignalContext, window: int = 14, threshold: float = 70.0) -> np.ndarray:
+    """RSI 高于阈值时跳过本次定投"""
+    return np.where(ctx.indicator('rsi', window) > threshold, 0.0, 1.0)
+
+@register_signal('drawdown_scale')
+def scale_by_drawdown(ctx: SignalContext, scale: float = 2.0, max_multiplier: float = 3.0,
+                      window: Optional[int] = None) -> np.ndarray:
+    """按回撤幅度放大金额：倍数为 1 + scale × 回撤比例，不超过 max_multiplier"""
+    return np.minimum(1 + scale * ctx.indicator('drawdown', window), max_multiplier)
+
+def signal_multipliers(stock_data: pd.DataFrame, positions: np.ndarray,
+                       signal: Union[str, Callable[..., np.ndarray]], signal_params: Dict[str, Any] = None,
+                       cache: Optional[IndicatorCache] = None) -> np.ndarray:
+    """
+    计算信号策略对每次定投的金额倍数
+
+    Args:
+        stock_data: 股票数据
+        positions: 定投交易日位置
+        signal: 信号策略名称（SIGNAL_STRATEGIES 中注册的名称）或策略函数
+        signal_params: 策略参数
+        cache: 指标缓存，默认使用进程内共享缓存
+
+    Returns:
+        与定投次数等长的非负倍数数组
+    """
+    if isinstance(signal, str):
+        if signal not in SIGNAL_STRATEGIES:
+            raise ValueError(f"不支持的信号策略: {signal}")
+        signal = SIGNAL_STRATEGIES[signal]
+    context = SignalContext(stock_data, positions, cache if cache is not None else default_indicator_cache)
+    multipliers = np.broadcast_to(np.asarray(signal(context, **(signal_params or {})), dtype=float),
+                                  (len(positions),))
+    if np.any(multipliers < 0) or not np.all(np.isfinite(multipliers)):
+        raise ValueError("信号策略返回的金额倍数必须是非负的有限数")
+    return multipliers
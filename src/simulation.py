@@ -0,0 +1,235 @@
+"""
+蒙特卡洛模拟模块
+
+一次生成大量带种子的价格路径（二维数组，每行一条路径），
+并在所有路径上以向量化方式同时计算定投与一次性投资的结果分布。
+"""
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Optional, Iterator, Union
+
+from investment_strategy import (weekly_investment_dates, monthly_investment_dates, resolve_trading_positions,
+                                 schedule_amounts)
+import instrumentation
+from xirr import xirr_batch, DAYS_PER_YEAR
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+def simulate_gbm_paths(n_paths: int, n_days: int, s0: float = 150.0, mu: float = 0.0,
+                       sigma: float = 0.02, seed=None) -> np.ndarray:
+    """
+    生成几何布朗运动价格路径
+
+    Args:
+        n_paths: 路径数
+        n_days: 每条路径的交易日数
+        s0: 初始价格
+        mu: 日收益率均值
+        sigma: 日收益率标准差
+        seed: 随机种子（int 或 numpy SeedSequence/Generator）
+
+    Returns:
+        形状为 (n_paths, n_days) 的价格数组，第一列为 s0
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(mu - 0.5 * sigma ** 2, sigma, (n_paths, n_days))
+    log_returns[:, 0] = 0.0
+    np.cumsum(log_returns, axis=1, out=log_returns)
+    np.exp(log_returns, out=log_returns)
+    log_returns *= s0
+    return log_returns
+
+def bootstrap_paths(returns, n_paths: int, n_days: int, s0: float = 150.0,
+                    block_size: int = 1, seed=None) -> np.ndarray:
+    """
+    对历史日收益率进行（块）自助重抽样生成价格路径
+
+    Args:
+        returns: 历史日收益率序列（例如 stock_data['Close'].pct_change().dropna()）
+        n_paths: 路径数
+        n_days: 每条路径的交易日数
+        s0: 初始价格
+        block_size: 块长度，大于1时保留收益率的短期自相关
+        seed: 随机种子
+
+    Returns:
+        形状为 (n_paths, n_days) 的价格数组，第一列为 s0
+    """
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    if len(returns) < block_size:
+        raise ValueError("历史收益率数量少于块长度，无法进行自助重抽样")
+
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-(n_days - 1) // block_size)
+    starts = rng.integers(0, len(returns) - block_size + 1, (n_paths, n_blocks))
+    indices = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_days - 1]
+
+    growth = np.empty((n_paths, n_days))
+    growth[:, 0] = s0
+    growth[:, 1:] = 1.0 + returns[indices]
+    return np.cumprod(growth, axis=1)
+
+def make_mock_stock_data(start_date: str, end_date: str, s0: float = 150.0,
+                         sigma: float = 0.02, seed=None) -> pd.DataFrame:
+    """
+    生成模拟股票数据（工作日，向量化生成）
+
+    Args:
+        start_date: 开始日期
+        end_date: 结束日期
+        s0: 初始价格
+        sigma: 日收益率标准差
+        seed: 随机种子
+
+    Returns:
+        包含 Open/High/Low/Close/Volume 的DataFrame
+    """
+    dates = pd.bdate_range(start=start_date, end=end_date)
+    rng = np.random.default_rng(seed)
+    prices = simulate_gbm_paths(1, len(dates), s0=s0, sigma=sigma, seed=rng)[0]
+    return pd.DataFrame({
+        'Open': prices,
+        'High': prices * (1 + np.abs(rng.normal(0, 0.01, len(dates)))),
+        'Low': prices * (1 - np.abs(rng.normal(0, 0.01, len(dates)))),
+        'Close': prices,
+        'Volume': rng.integers(1000000, 10000000, len(dates))
+    }, index=dates)
+
+def simulate_strategy_outcomes(paths: np.ndarray, positions: np.ndarray, amount: Union[float, np.ndarray],
+                               flow_years: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    在所有路径上向量化计算定投与一次性投资的结果
+
+    与 compare_with_lump_sum 的口径一致：一次性投资在第一个交易日投入与定投相同的总金额，
+    两者都按最后一个交易日的价格估值。
+
+    Args:
+        paths: 形状为 (n_paths, n_days) 的价格数组
+        positions: 定投日对应的交易日位置
+        amount: 每期定投金额，或与定投日期对齐的金额数组
+        flow_years: 每次定投及最终估值距第一次定投的年数（长度为 len(positions) + 1），
+            提供时同时计算定投的资金加权年化收益率 dca_xirr
+
+    Returns:
+        各项结果数组（每条路径一个值）
+    """
+    amounts = schedule_amounts(amount, len(positions))
+    total_investment = amounts.sum()
+    final_price = paths[:, -1]
+
+    dca_shares = (amounts / paths[:, positions]).sum(axis=1)
+    dca_value = dca_shares * final_price
+    lump_sum_value = total_investment / paths[:, 0] * final_price
+
+    dca_return = (dca_value - total_investment) / total_investment * 100
+    lump_sum_return = (lump_sum_value - total_investment) / total_investment * 100
+    outcomes = {
+        'dca_value': dca_value,
+        'dca_return': dca_return,
+        'lump_sum_value': lump_sum_value,
+        'lump_sum_return': lump_sum_return,
+        'difference': dca_return - lump_sum_return,
+    }
+    if flow_years is not None:
+        # 所有路径的现金流日期相同，只有最终价值不同
+        cashflows = np.empty((len(paths), len(positions) + 1))
+        cashflows[:, :-1] = -amounts
+        cashflows[:, -1] = dca_value
+        outcomes['dca_xirr'] = xirr_batch(cashflows, flow_years) * 100
+    return outcomes
+
+def iter_path_chunks(n_paths: int, n_days: int, chunk_size: int, method: str = 'gbm', seed=None,
+                     **path_params) -> Iterator[np.ndarray]:
+    """
+    分块生成价格路径，内存占用上限为 chunk_size × n_days
+
+    每个块使用从 seed 派生出的独立子种子，相同的 seed 和 chunk_size 总是得到相同的路径。
+
+    Args:
+        n_paths: 总路径数
+        n_days: 每条路径的交易日数
+        chunk_size: 每块路径数
+        method: 'gbm' 或 'bootstrap'
+        seed: 随机种子
+        **path_params: 传给 simulate_gbm_paths 或 bootstrap_paths 的参数
+
+    Yields:
+        形状为 (块路径数, n_days) 的价格数组
+    """
+    if method == 'gbm':
+        generator = simulate_gbm_paths
+    elif method == 'bootstrap':
+        generator = bootstrap_paths
+    else:
+        raise ValueError(f"不支持的模拟方法: {method}")
+
+    n_chunks = -(-n_paths // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    for i, chunk_seed in enumerate(seeds):
+        size = min(chunk_size, n_paths - i * chunk_size)
+        yield generator(n_paths=size, n_days=n_days, seed=chunk_seed, **path_params)
+
+@instrumentation.traced('monte_carlo', 'simulation')
+def run_monte_carlo(amount: Union[float, np.ndarray], start_date: str, end_date: str, strategy: str = 'weekly',
+                    strategy_params: Dict[str, Any] = None, n_paths: int = 1000, method: str = 'gbm',
+                    returns=None, seed=None, chunk_size: int = 1000,
+                    percentiles=DEFAULT_PERCENTILES, **path_params) -> Dict:
+    """
+    蒙特卡洛回测：在大量模拟路径上比较定投与一次性投资
+
+    Args:
+        amount: 每期定投金额，或与定投日期对齐的金额数组
+        start_date: 开始日期
+        end_date: 结束日期
+        strategy: 定投策略 ('weekly' 或 'monthly')
+        strategy_params: 策略参数
+        n_paths: 路径数
+        method: 'gbm'（几何布朗运动）或 'bootstrap'（对真实收益率自助重抽样）
+        returns: method='bootstrap' 时使用的历史日收益率
+        seed: 随机种子
+        chunk_size: 每块路径数，控制内存占用
+        percentiles: 需要汇总的分位数
+        **path_params: 路径生成参数（如 s0、mu、sigma、block_size）
+
+    Returns:
+        结果分布字典：每条路径的结果数组、分位数汇总和定投胜出概率
+    """
+    if strategy_params is None:
+        strategy_params = {}
+    if method == 'bootstrap':
+        if returns is None:
+            raise ValueError("bootstrap 方法需要提供历史收益率 returns")
+        path_params['returns'] = returns
+
+    trading_days = pd.bdate_range(start_date, end_date)
+    if strategy == 'monthly':
+        investment_dates = monthly_investment_dates(start_date, end_date, **strategy_params)
+    else:
+        investment_dates = weekly_investment_dates(start_date, end_date, **strategy_params)
+    positions = resolve_trading_positions(trading_days, investment_dates)
+    if len(trading_days) == 0 or len(positions) == 0:
+        return {}
+
+    # 与 run_backtest 一致，最终价值按结束日期估值
+    flow_dates = trading_days[positions].append(pd.DatetimeIndex([pd.Timestamp(end_date)]))
+    flow_years = np.asarray((flow_dates - flow_dates[0]) / pd.Timedelta(days=DAYS_PER_YEAR), dtype=float)
+
+    chunks = []
+    for paths in iter_path_chunks(n_paths, len(trading_days), chunk_size, method, seed, **path_params):
+        chunks.append(simulate_strategy_outcomes(paths, positions, amount, flow_years))
+        del paths
+
+    outcomes = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+    summary = {key: dict(zip(percentiles, np.percentile(values, percentiles)))
+               for key, values in outcomes.items()}
+
+    return {
+        'n_paths': n_paths,
+        'investment_count': len(positions),
+        'total_investment': schedule_amounts(amount, len(positions)).sum(),
+        'outcomes': outcomes,
+        'percentiles': summary,
+        'mean': {key: float(values.mean()) for key, values in outcomes.items()},
+        'dca_win_probability': float((outcomes['difference'] > 0).mean()),
+    }
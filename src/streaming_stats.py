@@ -0,0 +1,253 @@
+"""
+流式统计模块
+
+在大量回测结果上增量计算均值、方差、最值和近似分位数，内存占用与结果数量无关。
+所有统计量都可以合并：各进程分别汇总自己的那部分结果，再在主进程中合并。
+分位数使用对数分桶的 DDSketch，相对误差不超过 relative_accuracy。
+"""
+import math
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+from results_store import flatten_result
+
+DEFAULT_METRICS = ('total_return', 'annual_return', 'xirr')
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+class RunningStats:
+    """
+    数量、均值、方差和最值的增量统计（Welford 算法，批量更新和合并使用 Chan 公式）
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """
+        加入一个或一批数值（忽略NaN和无穷值）
+
+        Args:
+            values: 标量或数组
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        batch_mean = float(values.mean())
+        self._combine(len(values), batch_mean, float(((values - batch_mean) ** 2).sum()),
+                      float(values.min()), float(values.max()))
+
+    def _combine(self, count: int, mean: float, m2: float, minimum: float, maximum: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """合并另一个统计对象（原地修改并返回自身）"""
+        if other.count:
+            self._combine(other.count, other.mean, other._m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """样本方差"""
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        """样本标准差"""
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+class QuantileSketch:
+    """
+    可合并的近似分位数草图（DDSketch）
+
+    正数和负数分别按 |x| 的对数分桶，桶数超过 max_bins 时合并绝对值最小的桶，
+    因此内存占用有上限；合并两个草图只需把对应桶的计数相加。
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-9):
+        """
+        Args:
+            relative_accuracy: 分位数估计的相对误差
+            max_bins: 正数、负数各自的最大桶数
+            min_value: 绝对值小于该值的数视为0
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add(self, store: Dict[int, int], magnitudes: np.ndarray):
+        indices = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        for index, n in zip(*np.unique(indices, return_counts=True)):
+            store[int(index)] = store.get(int(index), 0) + int(n)
+        self._collapse(store)
+
+    def _collapse(self, store: Dict[int, int]):
+        if len(store) <= self.max_bins:
+            return
+        keys = sorted(store)
+        overflow = keys[:len(keys) - self.max_bins + 1]
+        store[keys[len(overflow)]] += sum(store.pop(key) for key in overflow)
+
+    def update(self, values):
+        """
+        加入一个或一批数值（忽略NaN和无穷值）
+
+        Args:
+            values: 标量或数组
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        positive = values[values > self.min_value]
+        negative = values[values < -self.min_value]
+        if len(positive):
+            self._add(self._positive, positive)
+        if len(negative):
+            self._add(self._negative, -negative)
+        self.zero_count += len(values) - len(positive) - len(negative)
+        self.count += len(values)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """合并另一个草图（原地修改并返回自身），两者的 relative_accuracy 必须相同"""
+        if not math.isclose(self._gamma, other._gamma):
+            raise ValueError("只能合并相对误差相同的分位数草图")
+        for mine, theirs in ((self._positive, other._positive), (self._negative, other._negative)):
+            for index, n in theirs.items():
+                mine[index] = mine.get(index, 0) + n
+            self._collapse(mine)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _bucket_value(self, indices: np.ndarray) -> np.ndarray:
+        # 桶 (gamma^(i-1), gamma^i] 的代表值，使相对误差对称
+        return 2 * self._gamma ** indices / (self._gamma + 1)
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """
+        估计分位数
+
+        Args:
+            qs: 0到1之间的分位点
+
+        Returns:
+            分位数估计值数组，草图为空时为NaN
+        """
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        negative_keys = np.array(sorted(self._negative, reverse=True), dtype=np.int64)
+        positive_keys = np.array(sorted(self._positive), dtype=np.int64)
+        values = np.concatenate([-self._bucket_value(negative_keys), [0.0], self._bucket_value(positive_keys)])
+        counts = np.concatenate([[self._negative[k] for k in negative_keys], [self.zero_count],
+                                 [self._positive[k] for k in positive_keys]])
+        ranks = qs * (self.count - 1)
+        return values[np.searchsorted(np.cumsum(counts), ranks, side='right')]
+
+    def quantile(self, q: float) -> float:
+        """估计单个分位数"""
+        return float(self.quantiles([q])[0])
+
+class StreamingSummary:
+    """
+    按指标汇总回测结果的流式统计（每个指标一组 RunningStats 和 QuantileSketch）
+    """
+
+    def __init__(self, metrics: Sequence[str] = DEFAULT_METRICS, relative_accuracy: float = 0.01):
+        """
+        Args:
+            metrics: 需要汇总的指标，嵌套结果使用 'drip_result.total_return' 的形式
+            relative_accuracy: 分位数估计的相对误差
+        """
+        self.metrics = tuple(metrics)
+        self.relative_accuracy = relative_accuracy
+        self.stats = {metric: RunningStats() for metric in self.metrics}
+        self.sketches = {metric: QuantileSketch(relative_accuracy) for metric in self.metrics}
+        self.runs = 0
+        self.errors = 0
+
+    def update(self, result: Dict):
+        """
+        加入一个回测结果
+
+        Args:
+            result: run_backtest / compare_with_lump_sum 返回的结果（可以已去掉 investment_records）
+        """
+        if not result or 'error' in result:
+            self.errors += 1
+            return
+        self.runs += 1
+        row = flatten_result(result)
+        for metric in self.metrics:
+            value = row.get(metric)
+            if value is not None:
+                self.stats[metric].update(value)
+                self.sketches[metric].update(value)
+
+    def update_values(self, metric: str, values):
+        """
+        直接加入某个指标的一批数值（例如蒙特卡洛模拟的结果数组）
+
+        Args:
+            metric: 指标名称（必须在 metrics 中）
+            values: 数值数组
+        """
+        self.stats[metric].update(values)
+        self.sketches[metric].update(values)
+
+    def merge(self, other: 'StreamingSummary') -> 'StreamingSummary':
+        """合并另一个汇总对象（原地修改并返回自身），两者的指标必须相同"""
+        if other.metrics != self.metrics:
+            raise ValueError("只能合并指标相同的汇总对象")
+        for metric in self.metrics:
+            self.stats[metric].merge(other.stats[metric])
+            self.sketches[metric].merge(other.sketches[metric])
+        self.runs += other.runs
+        self.errors += other.errors
+        return self
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Dict]:
+        """
+        输出汇总结果
+
+        Args:
+            quantiles: 需要估计的分位点
+
+        Returns:
+            指标名称到统计量字典（count / mean / std / min / max / 各分位数）的映射
+        """
+        quantiles = tuple(quantiles)
+        output = {}
+        for metric in self.metrics:
+            stats = self.stats[metric]
+            estimates = self.sketches[metric].quantiles(quantiles)
+            # 分位数估计不会超出实际的最值
+            if stats.count:
+                estimates = np.clip(estimates, stats.min, stats.max)
+            output[metric] = {
+                'count': stats.count,
+                'mean': stats.mean if stats.count else math.nan,
+                'std': stats.std,
+                'min': stats.min if stats.count else math.nan,
+                'max': stats.max if stats.count else math.nan,
+                'quantiles': dict(zip(quantiles, (float(value) for value in estimates))),
+            }
+        return output
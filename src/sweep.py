@@ -0,0 +1,136 @@
+"""
+参数扫描模块
+
+对一组股票 × 一组参数组合批量运行回测。每个 (参数组合, 股票) 是一个工作单元，
+可选写入检查点：中断后用同一个检查点文件重新运行，会跳过已完成的工作单元继续执行。
+"""
+import json
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from batch_runner import iter_universe_backtest
+from checkpoint import Checkpoint
+
+# 参数组合中可以覆盖的回测参数
+SWEEP_KEYS = ('amount', 'strategy', 'strategy_params', 'compare', 'signal', 'signal_params')
+# 会改变结果的批量回测参数及其默认值，写入检查点的运行配置
+RESULT_KWARGS = {'reinvest_dividends': False, 'validate': False, 'keep_records': False}
+
+def params_key(params: Dict[str, Any]) -> str:
+    """参数组合的规范化字符串表示（键排序的JSON）"""
+    return json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+def unit_key(params: Dict[str, Any], symbol: str) -> str:
+    """工作单元键"""
+    return f"{params_key(params)}|{symbol}"
+
+def checkpoint_config(start_date: str, end_date: str, param_grid: List[Dict[str, Any]],
+                      batch_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    检查点的运行配置：恢复时配置不一致会报错，防止混用不同设置下的结果
+
+    Args:
+        start_date: 开始日期
+        end_date: 结束日期
+        param_grid: 参数组合列表
+        batch_kwargs: 传给 iter_universe_backtest 的其他参数
+
+    Returns:
+        可JSON序列化的配置字典；基准以代码和数据的指纹表示
+    """
+    config = {'start_date': start_date, 'end_date': end_date, 'param_grid': param_grid}
+    for name, default in RESULT_KWARGS.items():
+        config[name] = batch_kwargs.get(name, default)
+    benchmark = batch_kwargs.get('benchmark')
+    config['benchmark'] = None if benchmark is None else f"{benchmark.symbol}:{benchmark.fingerprint}"
+    return config
+
+def iter_parameter_sweep(data: Union[Dict[str, pd.DataFrame], Callable[[str], Optional[pd.DataFrame]]],
+                         param_grid: List[Dict[str, Any]], start_date: str, end_date: str,
+                         symbols: Optional[List[str]] = None, checkpoint: Optional[Checkpoint] = None,
+                         **batch_kwargs) -> Iterator[Tuple[Dict[str, Any], str, Dict]]:
+    """
+    逐个参数组合运行批量回测，按完成顺序返回新计算的结果
+
+    Args:
+        data: 股票代码到股票数据的字典，或按股票代码加载数据的函数
+        param_grid: 参数组合列表，每项可包含 amount / strategy / strategy_params / compare /
+            signal / signal_params
+        start_date: 开始日期
+        end_date: 结束日期
+        symbols: 股票代码列表，data 为函数时必填
+        checkpoint: 检查点；已完成的工作单元被跳过，新结果写入检查点
+        **batch_kwargs: 传给 iter_universe_backtest 的其他参数（如 max_workers、chunk_size）
+
+    Yields:
+        (参数组合, 股票代码, 回测结果) 元组
+    """
+    if symbols is None:
+        if callable(data):
+            raise ValueError("data 为加载函数时必须提供 symbols")
+        symbols = list(data)
+
+    for params in param_grid:
+        unknown = set(params) - set(SWEEP_KEYS)
+        if unknown:
+            raise ValueError(f"不支持的扫描参数: {sorted(unknown)}")
+        remaining = [symbol for symbol in symbols
+                     if checkpoint is None or unit_key(params, symbol) not in checkpoint]
+        if not remaining:
+            continue
+        for symbol, result in iter_universe_backtest(data, params.get('amount', 100.0), start_date, end_date,
+                                                     params.get('strategy', 'weekly'),
+                                                     params.get('strategy_params'),
+                                                     params.get('compare', False),
+                                                     symbols=remaining, signal=params.get('signal'),
+                                                     signal_params=params.get('signal_params'), **batch_kwargs):
+            if checkpoint is not None:
+                checkpoint.record(unit_key(params, symbol), result)
+            yield params, symbol, result
+
+def run_parameter_sweep(data: Union[Dict[str, pd.DataFrame], Callable[[str], Optional[pd.DataFrame]]],
+                        param_grid: List[Dict[str, Any]], start_date: str, end_date: str,
+                        symbols: Optional[List[str]] = None, checkpoint_path: Optional[str] = None,
+                        checkpoint_interval: float = 5.0,
+                        on_result: Optional[Callable[[Dict[str, Any], str, Dict], None]] = None,
+                        **batch_kwargs) -> Dict[Tuple[str, str], Dict]:
+    """
+    运行参数扫描（可断点续跑）
+
+    Args:
+        data: 股票代码到股票数据的字典，或按股票代码加载数据的函数
+        param_grid: 参数组合列表
+        start_date: 开始日期
+        end_date: 结束日期
+        symbols: 股票代码列表
+        checkpoint_path: 检查点文件路径；文件已存在时从中恢复并跳过已完成的工作单元。
+            日期、参数组合以及分红再投资、数据校验、keep_records 和基准设置须与检查点一致
+        checkpoint_interval: 检查点最长落盘间隔（秒）
+        on_result: 每计算完一个新结果时调用的回调 (params, symbol, result)
+        **batch_kwargs: 传给 iter_universe_backtest 的其他参数
+
+    Returns:
+        (参数组合键, 股票代码) 到回测结果的字典，包含从检查点恢复的结果
+    """
+    checkpoint = None
+    if checkpoint_path is not None:
+        config = checkpoint_config(start_date, end_date, param_grid, batch_kwargs)
+        checkpoint = Checkpoint(checkpoint_path, config, flush_interval=checkpoint_interval)
+
+    results = {}
+    try:
+        for params, symbol, result in iter_parameter_sweep(data, param_grid, start_date, end_date, symbols,
+                                                           checkpoint, **batch_kwargs):
+            results[(params_key(params), symbol)] = result
+            if on_result is not None:
+                on_result(params, symbol, result)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    if checkpoint is not None:
+        for unit, result in checkpoint.results.items():
+            key, symbol = unit.rsplit('|', 1)
+            results.setdefault((key, symbol), result)
+    return results
@@ -0,0 +1,112 @@
+"""
+交易日历模块
+
+同一交易所的股票共享一套交易日。TradingCalendar 将定投计划映射为交易日位置后缓存结果，
+同一日历上的所有股票直接复用；价格序列有缺口或上市日期不同时自动回退为逐个股票解析。
+"""
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Optional
+
+from investment_strategy import generate_investment_dates, resolve_trading_positions
+import instrumentation
+
+class TradingCalendar:
+    """
+    共享交易日历
+
+    缓存键为 (策略, 开始日期, 结束日期, 策略参数)，值为定投日在日历中的交易日位置。
+    """
+
+    def __init__(self, trading_index: pd.DatetimeIndex):
+        """
+        Args:
+            trading_index: 已排序的完整交易日索引（例如一只上市时间足够长的股票的索引）
+        """
+        self.index = pd.DatetimeIndex(trading_index)
+        self._values = self.index.as_unit('ns').asi8
+        self._cache: Dict[tuple, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def schedule_positions(self, strategy: str, start_date: str, end_date: str,
+                           strategy_params: Dict[str, Any] = None) -> np.ndarray:
+        """
+        获取定投计划在日历中的交易日位置（有缓存）
+
+        Args:
+            strategy: 定投策略 ('weekly' 或 'monthly')
+            start_date: 开始日期
+            end_date: 结束日期
+            strategy_params: 策略参数
+
+        Returns:
+            交易日位置数组（只读）
+        """
+        key = (strategy, start_date, end_date, tuple(sorted((strategy_params or {}).items())))
+        positions = self._cache.get(key)
+        if positions is None:
+            instrumentation.count('calendar.miss')
+            dates = generate_investment_dates(strategy, start_date, end_date, strategy_params)
+            positions = resolve_trading_positions(self.index, dates)
+            positions.flags.writeable = False
+            self._cache[key] = positions
+        else:
+            instrumentation.count('calendar.hit')
+        return positions
+
+    def offset_of(self, trading_index: pd.DatetimeIndex) -> Optional[int]:
+        """
+        检查交易日索引是否为日历中连续的一段
+
+        Args:
+            trading_index: 股票数据的交易日索引
+
+        Returns:
+            该索引第一个交易日在日历中的位置；有缺口、时区不同或超出日历范围时返回None
+        """
+        if trading_index is self.index:
+            return 0
+        n = len(trading_index)
+        if n == 0 or n > len(self) or str(trading_index.tz) != str(self.index.tz):
+            return None
+        values = trading_index.as_unit('ns').asi8
+        offset = int(np.searchsorted(self._values, values[0]))
+        stop = offset + n
+        # 先比较首尾，不一致时无需比较整个数组
+        if stop > len(self) or self._values[offset] != values[0] or self._values[stop - 1] != values[-1]:
+            return None
+        if not np.array_equal(self._values[offset:stop], values):
+            return None
+        return offset
+
+    def positions_for(self, trading_index: pd.DatetimeIndex, strategy: str, start_date: str, end_date: str,
+                      strategy_params: Dict[str, Any] = None) -> np.ndarray:
+        """
+        获取某个股票的定投交易日位置
+
+        索引与日历一致（或为其中连续的一段，例如上市较晚或已退市）时复用缓存结果，否则逐个解析。
+
+        Args:
+            trading_index: 股票数据的交易日索引
+            strategy: 定投策略 ('weekly' 或 'monthly')
+            start_date: 开始日期
+            end_date: 结束日期
+            strategy_params: 策略参数
+
+        Returns:
+            相对于 trading_index 的交易日位置数组
+        """
+        offset = self.offset_of(trading_index)
+        if offset is None:
+            instrumentation.count('calendar.fallback')
+            dates = generate_investment_dates(strategy, start_date, end_date, strategy_params)
+            return resolve_trading_positions(trading_index, dates)
+
+        positions = self.schedule_positions(strategy, start_date, end_date, strategy_params)
+        if offset == 0 and len(trading_index) == len(self):
+            return positions
+        # 上市前的定投顺延到第一个交易日，最后一个交易日之后的定投被丢弃
+        positions = np.maximum(positions - offset, 0)
+        return positions[positions < len(trading_index)]
@@ -2,12 +2,15 @@
 可视化模块
 """
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from typing import Dict
+from typing import Dict, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+import instrumentation
+
 # 设置中文字体以支持中文显示
 import matplotlib.font_manager as fm
 
@@ -40,7 +43,148 @@ plt.rcParams['mathtext.bf'] = available_fonts[0] if available_fonts else 'sans-s
 plt.rcParams['mathtext.it'] = available_fonts[0] if available_fonts else 'sans-serif:italic'
 plt.rcParams['mathtext.cal'] = available_fonts[0] if available_fonts else 'sans-serif'
 
-def plot_investment_growth(backtest_result: Dict, symbol: str = "Stock", ax=None):
+def _chinese_font():
+    """获取当前配置的中文字体属性"""
+    return fm.FontProperties(family=plt.rcParams['font.sans-serif'][0] if plt.rcParams['font.sans-serif'] else None)
+
+def downsample_lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    使用 LTTB (Largest-Triangle-Three-Buckets) 算法对序列降采样
+    
+    LTTB 在每个分桶中保留与相邻选中点构成最大三角形面积的点，
+    因此能保留峰值、谷值等形状特征，适合在绘图前压缩长价格序列。
+    
+    Args:
+        x: 横坐标数组（日期需先转换为数值）
+        y: 纵坐标数组
+        threshold: 保留的最大点数
+        
+    Returns:
+        被选中点的索引数组（升序）
+    """
+    n = len(x)
+    if threshold is None or threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    
+    # 首尾两点固定保留，其余点平均分入 threshold - 2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一个桶的平均点作为三角形的第三个顶点
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    
+    return selected
+
+def downsample_minmax(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    按等宽分桶保留每个桶内最小值和最大值的点
+    
+    完全向量化，适合交互式缩放时按像素宽度实时降采样：
+    每个像素列的最高点和最低点都被保留，因此折线的包络与原始序列一致。
+    
+    Args:
+        y: 纵坐标数组（横坐标需已排序）
+        threshold: 保留的最大点数
+        
+    Returns:
+        被选中点的索引数组（升序）
+    """
+    n = len(y)
+    if threshold is None or threshold >= n or threshold < 4:
+        return np.arange(n)
+    
+    y = np.asarray(y, dtype=float)
+    # 首尾两点占用一个桶的名额
+    n_buckets = (threshold - 2) // 2
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    
+    # 用最后一个值补齐到整桶，便于 reshape 成二维后按行求极值
+    padded = np.empty(n_buckets * size)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    blocks = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    
+    indices = np.concatenate([
+        [0],
+        np.argmin(blocks, axis=1) + offsets,
+        np.argmax(blocks, axis=1) + offsets,
+        [n - 1],
+    ])
+    return np.unique(np.minimum(indices, n - 1))
+
+def _downsample_frame(frame: pd.DataFrame, x_values, y_column: str, max_points: Optional[int]) -> pd.DataFrame:
+    """按 y_column 的形状对 DataFrame 行进行 LTTB 降采样"""
+    if max_points is None or len(frame) <= max_points:
+        return frame
+    x = pd.DatetimeIndex(x_values).asi8.astype(float)
+    indices = downsample_lttb(x, frame[y_column].to_numpy(dtype=float), max_points)
+    return frame.iloc[indices]
+
+def growth_chart_title(backtest_result: Dict, symbol: str) -> str:
+    """生成定投增长图的标题"""
+    return (f'{symbol} 定投回测结果\n'
+            f'总投入: ${backtest_result["total_investment"]:.2f} | '
+            f'最终价值: ${backtest_result["final_value"]:.2f} | '
+            f'总收益率: {backtest_result["total_return"]:.2f}% | '
+            f'年化收益率: {backtest_result["annual_return"]:.2f}%')
+
+def finalize_standalone_axes(ax1, title: str, ylabel: str):
+    """
+    为独立图表设置标签、日期格式、图例、标题和网格
+    
+    Args:
+        ax1: 要设置的axes对象
+        title: 图表标题
+        ylabel: 纵轴标签
+    """
+    chinese_font = _chinese_font()
+    
+    ax1.set_xlabel('日期', fontproperties=chinese_font)
+    ax1.set_ylabel(ylabel, color='blue', fontproperties=chinese_font)
+    ax1.tick_params(axis='y', labelcolor='blue')
+    
+    # 设置刻度标签字体
+    for label in ax1.get_xticklabels():
+        label.set_fontproperties(chinese_font)
+    for label in ax1.get_yticklabels():
+        label.set_fontproperties(chinese_font)
+    
+    # 格式化日期
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+    ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=6))
+    plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45, fontproperties=chinese_font)
+    
+    # 添加图例
+    legend = ax1.legend(loc='upper left')
+    for text in legend.get_texts():
+        text.set_fontproperties(chinese_font)
+    
+    # 添加标题和网格
+    ax1.set_title(title, fontproperties=chinese_font)
+    ax1.grid(True, alpha=0.3)
+    ax1.figure.tight_layout()
+
+@instrumentation.traced('plot', 'visualization')
+def plot_investment_growth(backtest_result: Dict, symbol: str = "Stock", ax=None, max_points: Optional[int] = None):
     """
     绘制定投增长图表
     
@@ -48,6 +192,7 @@ def plot_investment_growth(backtest_result: Dict, symbol: str = "Stock", ax=None
         backtest_result: 回测结果
         symbol: 股票代码
         ax: 可选的axes对象，如果提供则在该axes上绘制
+        max_points: 可选的最大绘制点数，超过时使用LTTB降采样
     """
     if not backtest_result or 'investment_records' not in backtest_result:
         print("无效的回测结果")
@@ -63,49 +208,23 @@ def plot_investment_growth(backtest_result: Dict, symbol: str = "Stock", ax=None
         fig = ax1.figure
     
     # 设置中文字体属性
-    chinese_font = fm.FontProperties(family=plt.rcParams['font.sans-serif'][0] if plt.rcParams['font.sans-serif'] else None)
+    chinese_font = _chinese_font()
+    
+    # 长序列先降采样再绘制
+    records = records.assign(Investment_Value=records['Cumulative_Shares'] * records['Price'])
+    records = _downsample_frame(records, records['Date'], 'Investment_Value', max_points)
     
     # 绘制累计投资金额和投资价值
     ax1.plot(records['Date'], records['Cumulative_Amount'], 
              label='累计投资金额', color='blue', linewidth=2)
     
-    # 计算投资价值
-    investment_value = records['Cumulative_Shares'] * records['Price']
-    ax1.plot(records['Date'], investment_value, 
+    # 绘制投资价值
+    ax1.plot(records['Date'], records['Investment_Value'], 
              label='投资价值', color='green', linewidth=2)
     
     # 只在创建新图表时设置标签、标题等
     if ax is None:
-        ax1.set_xlabel('日期', fontproperties=chinese_font)
-        ax1.set_ylabel('金额 ($)', color='blue', fontproperties=chinese_font)
-        ax1.tick_params(axis='y', labelcolor='blue')
-        
-        # 设置刻度标签字体
-        for label in ax1.get_xticklabels():
-            label.set_fontproperties(chinese_font)
-        for label in ax1.get_yticklabels():
-            label.set_fontproperties(chinese_font)
-        
-        # 格式化日期
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-        ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=6))
-        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45, fontproperties=chinese_font)
-        
-        # 添加图例
-        legend = ax1.legend(loc='upper left')
-        for text in legend.get_texts():
-            text.set_fontproperties(chinese_font)
-        
-        # 添加标题和网格
-        plt.title(f'{symbol} 定投回测结果\n'
-                  f'总投入: ${backtest_result["total_investment"]:.2f} | '
-                  f'最终价值: ${backtest_result["final_value"]:.2f} | '
-                  f'总收益率: {backtest_result["total_return"]:.2f}% | '
-                  f'年化收益率: {backtest_result["annual_return"]:.2f}%', 
-                  fontproperties=chinese_font)
-        
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
+        finalize_standalone_axes(ax1, growth_chart_title(backtest_result, symbol), '金额 ($)')
     else:
         # 在提供的axes上设置基本属性
         ax1.set_xlabel('日期', fontproperties=chinese_font)
@@ -119,7 +238,9 @@ def plot_investment_growth(backtest_result: Dict, symbol: str = "Stock", ax=None
     
     return fig
 
-def plot_price_vs_investment(stock_data: pd.DataFrame, backtest_result: Dict, symbol: str = "Stock", ax=None):
+@instrumentation.traced('plot', 'visualization')
+def plot_price_vs_investment(stock_data: pd.DataFrame, backtest_result: Dict, symbol: str = "Stock", ax=None,
+                             max_points: Optional[int] = None):
     """
     绘制股价与定投点对比图
     
@@ -128,6 +249,7 @@ def plot_price_vs_investment(stock_data: pd.DataFrame, backtest_result: Dict, sy
         backtest_result: 回测结果
         symbol: 股票代码
         ax: 可选的axes对象，如果提供则在该axes上绘制
+        max_points: 可选的最大绘制点数，超过时使用LTTB降采样股价和定投点
     """
     if not backtest_result or 'investment_records' not in backtest_result:
         print("无效的回测结果")
@@ -143,7 +265,11 @@ def plot_price_vs_investment(stock_data: pd.DataFrame, backtest_result: Dict, sy
         fig = ax1.figure
     
     # 设置中文字体属性
-    chinese_font = fm.FontProperties(family=plt.rcParams['font.sans-serif'][0] if plt.rcParams['font.sans-serif'] else None)
+    chinese_font = _chinese_font()
+    
+    # 长序列先降采样再绘制
+    stock_data = _downsample_frame(stock_data, stock_data.index, 'Close', max_points)
+    records = _downsample_frame(records, records['Date'], 'Price', max_points)
     
     # 绘制股价
     ax1.plot(stock_data.index, stock_data['Close'], 
@@ -155,31 +281,7 @@ def plot_price_vs_investment(stock_data: pd.DataFrame, backtest_result: Dict, sy
     
     # 只在创建新图表时设置标签、标题等
     if ax is None:
-        ax1.set_xlabel('日期', fontproperties=chinese_font)
-        ax1.set_ylabel('股价 ($)', color='blue', fontproperties=chinese_font)
-        ax1.tick_params(axis='y', labelcolor='blue')
-        
-        # 设置刻度标签字体
-        for label in ax1.get_xticklabels():
-            label.set_fontproperties(chinese_font)
-        for label in ax1.get_yticklabels():
-            label.set_fontproperties(chinese_font)
-        
-        # 格式化日期
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
-        ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=6))
-        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45, fontproperties=chinese_font)
-        
-        # 添加图例
-        legend = ax1.legend(loc='upper left')
-        for text in legend.get_texts():
-            text.set_fontproperties(chinese_font)
-        
-        # 添加标题和网格
-        plt.title(f'{symbol} 股价与定投点对比', 
-                  fontproperties=chinese_font)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
+        finalize_standalone_axes(ax1, f'{symbol} 股价与定投点对比', '股价 ($)')
     else:
         # 在提供的axes上设置基本属性
         ax1.set_xlabel('日期', fontproperties=chinese_font)
@@ -0,0 +1,152 @@
+"""
+资金加权收益率 (XIRR) 模块
+
+定投的资金是分批投入的，按总投入计算的年化收益率会低估每笔资金实际的投资期限。
+XIRR 求解使所有现金流终值之和为零的年化收益率；这里以二维数组同时求解大量回测结果，
+使用带区间保护的牛顿法（牛顿步越界时退回二分）。
+"""
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Sequence
+
+DAYS_PER_YEAR = 365.25
+
+# 求解变量为 x = ln(1 + r)，对应年化收益率约 -99.9999% 到 +9900%
+LOWER_BOUND = np.log(1e-6)
+UPPER_BOUND = np.log(100.0)
+
+def xirr_batch(cashflows, years, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+    """
+    批量求解XIRR
+
+    每行是一组现金流（投入为负，期末价值为正）；各行长度不同时以0补齐，0现金流不影响结果。
+
+    Args:
+        cashflows: 形状为 (n_runs, n_flows) 的现金流数组
+        years: 每笔现金流距第一笔现金流的年数，形状为 (n_flows,) 或 (n_runs, n_flows)
+        tol: 收敛精度（针对 ln(1 + r)）
+        max_iter: 最大迭代次数
+
+    Returns:
+        每组现金流的年化收益率（小数），无解时为NaN
+    """
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    years = np.broadcast_to(np.asarray(years, dtype=float), cashflows.shape)
+    n_runs = cashflows.shape[0]
+
+    # 以每行最后一笔现金流为基准计算终值，指数部分非负，避免长周期时溢出
+    horizon = np.where(cashflows != 0, years, -np.inf).max(axis=1, keepdims=True)
+    tau = np.where(cashflows != 0, horizon - years, 0.0)
+
+    def future_value(x):
+        growth = np.exp(x[:, None] * tau)
+        return (cashflows * growth).sum(axis=1), (cashflows * tau * growth).sum(axis=1)
+
+    lo = np.full(n_runs, LOWER_BOUND)
+    hi = np.full(n_runs, UPPER_BOUND)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        f_lo, _ = future_value(lo)
+        f_hi, _ = future_value(hi)
+        solvable = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) * np.sign(f_hi) < 0)
+
+        x = np.full(n_runs, np.log1p(0.1))
+        active = solvable.copy()
+        for _ in range(max_iter):
+            f, df = future_value(x)
+            # 收缩区间：与下界同号则根在 x 右侧
+            same_as_lo = np.sign(f) == np.sign(f_lo)
+            lo = np.where(active & same_as_lo, x, lo)
+            f_lo = np.where(active & same_as_lo, f, f_lo)
+            hi = np.where(active & ~same_as_lo, x, hi)
+
+            x_new = x - f / df
+            bisect = (~np.isfinite(x_new) | (x_new <= lo) | (x_new >= hi)) & (f != 0)
+            x_new = np.where(bisect, 0.5 * (lo + hi), x_new)
+
+            converged = (np.abs(x_new - x) < tol) | (f == 0)
+            x = np.where(active, x_new, x)
+            active &= ~converged
+            if not active.any():
+                break
+
+    return np.where(solvable, np.expm1(x), np.nan)
+
+def xirr(cashflows: Sequence[float], dates) -> float:
+    """
+    求解单组现金流的XIRR
+
+    Args:
+        cashflows: 现金流（投入为负，期末价值为正）
+        dates: 每笔现金流的日期
+
+    Returns:
+        年化收益率（小数），无解时为NaN
+    """
+    dates = pd.DatetimeIndex(dates)
+    years = (dates - dates.min()) / pd.Timedelta(days=DAYS_PER_YEAR)
+    return float(xirr_batch([cashflows], np.asarray(years, dtype=float))[0])
+
+def _naive_dates(dates) -> pd.DatetimeIndex:
+    dates = pd.DatetimeIndex(dates)
+    return dates.tz_localize(None) if dates.tz is not None else dates
+
+def contribution_cashflows(investment_records: pd.DataFrame, final_value: float, end_date) -> Dict[str, np.ndarray]:
+    """
+    将定投记录转换为现金流（每笔投入为负，结束日期的最终价值为正）
+
+    Args:
+        investment_records: 定投记录（包含 Date / Amount 列）
+        final_value: 最终价值
+        end_date: 估值日期
+
+    Returns:
+        {'cashflows': 现金流数组, 'years': 距第一次定投的年数数组}
+    """
+    return schedule_cashflows(investment_records['Date'], investment_records['Amount'].to_numpy(dtype=float),
+                              final_value, end_date)
+
+def schedule_cashflows(dates, amounts: np.ndarray, final_value: float, end_date) -> Dict[str, np.ndarray]:
+    """
+    由定投日期和金额数组构造现金流（不需要 investment_records）
+
+    Args:
+        dates: 每次定投的日期
+        amounts: 每次定投的金额
+        final_value: 最终价值
+        end_date: 估值日期
+
+    Returns:
+        {'cashflows': 现金流数组, 'years': 距第一次定投的年数数组}
+    """
+    dates = _naive_dates(dates)
+    end = pd.Timestamp(end_date)
+    end = end.tz_localize(None) if end.tzinfo is not None else end
+    first = dates.min()
+    years = np.append((dates - first) / pd.Timedelta(days=DAYS_PER_YEAR),
+                      (end - first) / pd.Timedelta(days=DAYS_PER_YEAR))
+    cashflows = np.append(-np.asarray(amounts, dtype=float), final_value)
+    return {'cashflows': cashflows, 'years': np.asarray(years, dtype=float)}
+
+def results_xirr(results: List[Dict], end_date) -> np.ndarray:
+    """
+    批量计算多个回测结果的XIRR（需要结果中保留 investment_records）
+
+    Args:
+        results: run_backtest 返回的结果列表
+        end_date: 估值日期
+
+    Returns:
+        每个结果的XIRR（百分比），无法计算时为NaN
+    """
+    if len(results) == 0:
+        return np.empty(0)
+    flows = [contribution_cashflows(result['investment_records'], result['final_value'], end_date)
+             for result in results]
+    width = max(len(flow['cashflows']) for flow in flows)
+    cashflows = np.zeros((len(flows), width))
+    years = np.zeros((len(flows), width))
+    for i, flow in enumerate(flows):
+        n = len(flow['cashflows'])
+        cashflows[i, :n] = flow['cashflows']
+        years[i, :n] = flow['years']
+    return xirr_batch(cashflows, years) * 100
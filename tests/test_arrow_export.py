@@ -0,0 +1,125 @@
+import io
+import multiprocessing
+
+import pytest
+import pandas as pd
+import numpy as np
+
+pa = pytest.importorskip('pyarrow')
+
+from src.backtest import run_backtest, compare_with_lump_sum, equity_curve
+from src.batch_runner import run_universe_backtest
+from src.arrow_export import (frame_to_record_batch, records_to_record_batch, equity_curve_to_record_batch,
+                              results_to_record_batch, record_batch_to_results, write_ipc_file,
+                              write_ipc_stream, read_ipc, ArrowResultsWriter)
+
+START, END = '2020-01-01', '2021-12-31'
+
+@pytest.fixture
+def universe():
+    dates = pd.bdate_range(START, END)
+    data = {}
+    for i in range(5):
+        prices = 100 * np.exp(np.cumsum(np.random.default_rng(i).normal(0, 0.01, len(dates))))
+        data[f'S{i}'] = pd.DataFrame({'Close': prices}, index=dates)
+    return data
+
+def test_record_batches_reference_numpy_memory(universe):
+    stock_data = universe['S0']
+    result = run_backtest(stock_data, 100, START, END)
+    batch = records_to_record_batch(result, 'S0')
+    assert batch.schema.names == ['symbol', 'Date', 'Price', 'Amount', 'Shares',
+                                  'Cumulative_Amount', 'Cumulative_Shares']
+    assert batch.num_rows == result['investment_count']
+
+    frame = pd.DataFrame({'Value': np.arange(10.0)})
+    values = frame['Value'].to_numpy()
+    assert frame_to_record_batch(frame).column(0).buffers()[1].address == values.ctypes.data
+
+    tz_frame = pd.DataFrame({'Date': pd.date_range('2020-01-01', periods=3, tz='America/New_York')})
+    assert frame_to_record_batch(tz_frame).schema.field('Date').type.tz == 'America/New_York'
+
+def test_equity_curve(universe):
+    stock_data = universe['S1']
+    result = run_backtest(stock_data, 100, START, END)
+    curve = equity_curve(stock_data, result)
+    records = result['investment_records']
+    assert curve['Date'].iloc[0] == records['Date'].iloc[0]
+    assert curve['Value'].iloc[-1] == pytest.approx(result['final_value'])
+    assert curve['Cumulative_Amount'].iloc[-1] == result['total_investment']
+    # 定投当天的累计股数与记录一致
+    on_purchase = curve.set_index('Date').loc[records['Date'], 'Cumulative_Shares'].to_numpy()
+    np.testing.assert_allclose(on_purchase, records['Cumulative_Shares'])
+
+    batch = equity_curve_to_record_batch(stock_data, compare_with_lump_sum(stock_data, 100, START, END), 'S1')
+    assert batch.num_rows == len(curve)
+
+def test_results_roundtrip_through_ipc_file(tmp_path, universe):
+    results = run_universe_backtest(universe, 100, START, END, compare=True, max_workers=1)
+    results['BAD'] = {'error': 'no data'}
+    batch = results_to_record_batch(results, run_id='r1')
+    assert 'drip_result.total_return' in batch.schema.names
+
+    path = str(tmp_path / 'results.arrow')
+    assert write_ipc_file(path, [batch]) == len(results)
+    table = read_ipc(path)
+    restored = record_batch_to_results(table)
+    assert restored['BAD'] == {'error': 'no data'}
+    for symbol in universe:
+        assert restored[symbol]['difference'] == pytest.approx(results[symbol]['difference'])
+        assert restored[symbol]['drip_result']['xirr'] == pytest.approx(results[symbol]['drip_result']['xirr'])
+
+def test_ipc_stream_roundtrip(universe):
+    stock_data = universe['S2']
+    result = run_backtest(stock_data, 100, START, END)
+    buffer = io.BytesIO()
+    batches = [records_to_record_batch(result, 'S2'), records_to_record_batch(result, 'S2')]
+    assert write_ipc_stream(buffer, batches) == 2 * result['investment_count']
+    table = read_ipc(buffer.getvalue())
+    assert table.num_rows == 2 * result['investment_count']
+    np.testing.assert_allclose(table.column('Shares').to_numpy()[:result['investment_count']],
+                               result['investment_records']['Shares'])
+
+def _sum_final_values(path, queue):
+    table = read_ipc(path)
+    queue.put(float(np.nansum(table.column('final_value').to_numpy(zero_copy_only=False))))
+
+def test_results_writer_waits_for_representative_schema(tmp_path):
+    path = str(tmp_path / 'errors_first.arrow')
+    with ArrowResultsWriter(path, batch_size=2) as writer:
+        writer.append('run', 'BAD', {'error': 'no data'})
+        writer.append('run', 'EMPTY', {})
+        writer.append('run', 'AAA', {'total_return': 12.5, 'xirr': 4.0})
+        writer.append('run', 'BBB', {'total_return': -3.0, 'xirr': -1.0})
+
+    results = record_batch_to_results(read_ipc(path))
+    assert results['BAD'] == {'error': 'no data'}
+    assert results['EMPTY'] == {}
+    assert results['AAA'] == {'total_return': 12.5, 'xirr': 4.0}
+    assert results['BBB'] == {'total_return': -3.0, 'xirr': -1.0}
+
+def test_results_writer_rejects_new_columns(tmp_path):
+    writer = ArrowResultsWriter(str(tmp_path / 'changed.arrow'), batch_size=1)
+    writer.append('run', 'AAA', {'total_return': 12.5})
+    with pytest.raises(ValueError, match='xirr'):
+        writer.append('run', 'BBB', {'total_return': 1.0, 'xirr': 4.0})
+    writer._pending.clear()
+    writer.close()
+
+def test_results_writer_as_store_shared_with_other_process(tmp_path, universe):
+    path = str(tmp_path / 'universe.arrow')
+    with ArrowResultsWriter(path, batch_size=2) as writer:
+        assert run_universe_backtest(universe, 100, START, END, max_workers=1, store=writer) == {}
+    assert writer.rows == len(universe)
+
+    # 另一个进程通过内存映射读取同一个文件
+    queue = multiprocessing.get_context('spawn').SimpleQueue()
+    process = multiprocessing.get_context('spawn').Process(target=_sum_final_values, args=(path, queue))
+    process.start()
+    process.join(60)
+    expected = sum(run_backtest(data, 100, START, END)['final_value'] for data in universe.values())
+    assert queue.get() == pytest.approx(expected)
+
+    table = read_ipc(path)
+    assert table.num_rows == len(universe)
+    assert len(set(table.column('run_id').to_pylist())) == 1
@@ -3,7 +3,9 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
-from src.backtest import run_backtest, _get_price_on_or_near
+from src.backtest import (run_backtest, compare_with_lump_sum, total_return_factors, _get_price_on_or_near,
+                          run_contribution_sweep)
+from src.investment_strategy import generate_investment_dates, contribution_amounts
 
 @pytest.fixture
 def sample_stock_data():
@@ -49,3 +51,124 @@ def test_run_backtest(sample_stock_data):
     assert result['final_value'] == pytest.approx(final_value)
     assert result['investment_count'] == 2
     assert result['total_return'] == pytest.approx(((final_value - total_investment) / total_investment) * 100)
+
+@pytest.fixture
+def dividend_stock_data(sample_stock_data):
+    """Sample data with a dividend on Jan 5 and a 2-for-1 split on Jan 11.
+
+    Like yfinance history(auto_adjust=False), Close is already split-adjusted and the split is only recorded.
+    """
+    df = sample_stock_data.astype(float)
+    df['Dividends'] = 0.0
+    df['Stock Splits'] = 0.0
+    df.loc['2023-01-05', 'Dividends'] = 1.03
+    df.loc['2023-01-11', 'Stock Splits'] = 2.0
+    return df
+
+def test_total_return_factors(dividend_stock_data):
+    factors = total_return_factors(dividend_stock_data)
+
+    expected = np.ones(10)
+    expected[3:] *= 1 + 1.03 / 103
+    # The recorded split does not change holdings of split-adjusted prices
+    np.testing.assert_allclose(factors, expected)
+    # Without the columns every factor is 1
+    np.testing.assert_allclose(total_return_factors(dividend_stock_data[['Close']]), np.ones(10))
+
+def test_total_return_factors_unadjusted_split(dividend_stock_data):
+    # Raw prices halve on the split day; holdings must double so the position value is unchanged
+    raw = dividend_stock_data.copy()
+    raw.loc['2023-01-11':, 'Close'] /= 2
+    factors = total_return_factors(raw, split_adjusted=False)
+
+    adjusted_value = total_return_factors(dividend_stock_data) * dividend_stock_data['Close'].to_numpy()
+    np.testing.assert_allclose(factors * raw['Close'].to_numpy(), adjusted_value)
+    assert factors[7] / factors[6] == pytest.approx(2)
+
+def test_run_backtest_reinvest_dividends(dividend_stock_data):
+    result = run_backtest(dividend_stock_data, 100, '2023-01-01', '2023-01-13', strategy='weekly',
+                          strategy_params={'day_of_week': 0}, reinvest_dividends=True)
+
+    # Jan 2: 1 share, dividend of 1.03 reinvested at 103 -> 1.01 shares; Jan 9: +100/110 shares;
+    # prices are split-adjusted, so the 2-for-1 split on Jan 11 leaves holdings unchanged
+    expected_shares = 1 * 1.01 + 100 / 110
+    records = result['investment_records']
+    assert records['Cumulative_Shares'].tolist() == pytest.approx([1.0, expected_shares])
+    assert result['final_shares'] == pytest.approx(expected_shares)
+    assert result['dividend_shares'] == pytest.approx(expected_shares - (1 + 100 / 110))
+    assert result['final_value'] == pytest.approx(expected_shares * 114)
+
+    # The default mode still ignores the columns
+    plain = run_backtest(dividend_stock_data, 100, '2023-01-01', '2023-01-13', strategy='weekly',
+                         strategy_params={'day_of_week': 0})
+    assert plain['final_value'] == pytest.approx((1 + 100 / 110) * 114)
+    assert 'dividend_shares' not in plain
+
+def test_compare_with_lump_sum_reinvest_dividends(dividend_stock_data):
+    result = compare_with_lump_sum(dividend_stock_data, 100, '2023-01-01', '2023-01-13',
+                                   strategy_params={'day_of_week': 0}, reinvest_dividends=True)
+
+    lump_sum_shares = 200 / 100 * 1.01
+    assert result['lump_sum_value'] == pytest.approx(lump_sum_shares * 114)
+
+def test_backtester_loads_unadjusted_prices_for_reinvestment(dividend_stock_data):
+    from main import StockDripBacktester
+
+    calls = []
+    def provider(symbol, start_date, end_date, **kwargs):
+        calls.append(kwargs)
+        return dividend_stock_data
+
+    backtester = StockDripBacktester(data_provider=provider, info_provider=lambda symbol: {})
+    assert backtester.load_data('TEST', '2023-01-01', '2023-01-13')
+    # Adjusted prices already include the dividends, so reinvesting them again is refused
+    assert backtester.run_backtest(100, '2023-01-01', '2023-01-13', reinvest_dividends=True) is None
+
+    assert backtester.load_data('TEST', '2023-01-01', '2023-01-13', auto_adjust=False)
+    assert calls == [{}, {'auto_adjust': False}]
+    result = backtester.run_backtest(100, '2023-01-01', '2023-01-13', strategy_params={'day_of_week': 0},
+                                     reinvest_dividends=True)
+    expected = run_backtest(dividend_stock_data, 100, '2023-01-01', '2023-01-13',
+                            strategy_params={'day_of_week': 0}, reinvest_dividends=True)
+    assert result['final_value'] == pytest.approx(expected['final_value'])
+
+@pytest.mark.parametrize('reinvest_dividends', [False, True])
+def test_run_backtest_lean_mode_matches_full(dividend_stock_data, reinvest_dividends):
+    args = (dividend_stock_data, 100, '2023-01-01', '2023-01-13', 'weekly', {'day_of_week': 0}, reinvest_dividends)
+    full = run_backtest(*args)
+    lean = run_backtest(*args, keep_records=False)
+
+    assert 'investment_records' not in lean
+    assert set(full) - set(lean) == {'investment_records'}
+    for key, value in lean.items():
+        assert value == pytest.approx(full[key], nan_ok=True)
+
+    lean_compare = compare_with_lump_sum(*args, keep_records=False)
+    assert 'investment_records' not in lean_compare['drip_result']
+    assert lean_compare['difference'] == pytest.approx(compare_with_lump_sum(*args)['difference'])
+
+def test_run_backtest_with_amount_array(sample_stock_data):
+    args = ('2023-01-01', '2023-01-13', 'weekly', {'day_of_week': 0})
+    result = run_backtest(sample_stock_data, np.array([100.0, 300.0]), *args)
+    # 1月2日 100 元买入（价格100），1月9日 300 元买入（价格110）
+    assert result['total_investment'] == 400
+    assert result['final_value'] == pytest.approx((100 / 100 + 300 / 110) * 114)
+    np.testing.assert_allclose(result['investment_records']['Amount'], [100, 300])
+
+    comparison = compare_with_lump_sum(sample_stock_data, np.array([100.0, 300.0]), *args)
+    assert comparison['lump_sum_value'] == pytest.approx(400 / 100 * 114)
+
+def test_run_contribution_sweep_matches_individual_runs():
+    dates = pd.bdate_range('2019-01-01', '2022-12-31')
+    prices = 100 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.01, len(dates))))
+    stock_data = pd.DataFrame({'Close': prices}, index=dates)
+    start, end = '2019-01-01', '2022-12-31'
+
+    rates = np.array([0.0, 0.05, 0.1])
+    grid = contribution_amounts(generate_investment_dates('weekly', start, end, {}), 100, growth_rate=rates)
+    sweep = run_contribution_sweep(stock_data, grid, start, end)
+    assert len(sweep) == len(rates)
+    for i, row in enumerate(grid):
+        single = run_backtest(stock_data, row, start, end, keep_records=False)
+        for key in sweep.columns:
+            assert sweep[key].iloc[i] == pytest.approx(single[key])
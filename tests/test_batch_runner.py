@@ -0,0 +1,129 @@
+import os
+import time
+
+import pytest
+import pandas as pd
+import numpy as np
+
+# 与 src 内部模块一致使用顶层导入，确保共享同一个埋点状态
+import instrumentation
+from backtest import run_backtest, compare_with_lump_sum
+from batch_runner import (SharedUniverse, run_universe_backtest, iter_universe_backtest, strip_records,
+                          summarize_universe_backtest, process_pool)
+
+START, END = '2020-01-01', '2022-12-31'
+
+@pytest.fixture
+def universe():
+    dates = pd.bdate_range(START, END)
+    data = {}
+    for i in range(6):
+        rng = np.random.default_rng(i)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        # 不同的上市日期，模拟长度不一的序列
+        data[f'S{i}'] = pd.DataFrame({'Close': prices}, index=dates)[i * 40:]
+    return data
+
+@pytest.fixture
+def clean_instrumentation():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+def test_shared_universe_roundtrip_with_timezone(universe):
+    data = {'TZ': universe['S0'].tz_localize('America/New_York'), 'NAIVE': universe['S1']}
+    with SharedUniverse(data) as shared:
+        pd.testing.assert_frame_equal(shared.frame('TZ'), data['TZ'], check_freq=False, check_index_type=False)
+        pd.testing.assert_frame_equal(shared.frame('NAIVE'), data['NAIVE'], check_freq=False, check_index_type=False)
+
+def test_parallel_results_match_sequential(universe):
+    results = run_universe_backtest(universe, 100, START, END, 'monthly', {'day_of_month': 15},
+                                    compare=True, max_workers=2, chunk_size=2)
+
+    assert set(results) == set(universe)
+    for symbol, stock_data in universe.items():
+        expected = compare_with_lump_sum(stock_data, 100, START, END, 'monthly', {'day_of_month': 15})
+        assert results[symbol]['difference'] == pytest.approx(expected['difference'])
+        assert results[symbol]['drip_result']['final_value'] == pytest.approx(expected['drip_result']['final_value'])
+        assert 'investment_records' not in results[symbol]['drip_result']
+
+def test_results_stream_with_callback(universe):
+    seen = []
+    results = run_universe_backtest(universe, 100, START, END, max_workers=2, chunk_size=1,
+                                    on_result=lambda symbol, result: seen.append(symbol))
+    assert sorted(seen) == sorted(universe)
+    assert results['S3']['final_value'] == pytest.approx(run_backtest(universe['S3'], 100, START, END)['final_value'])
+
+def test_memory_budget_limits_resident_symbols(universe, clean_instrumentation):
+    loaded = []
+
+    def loader(symbol):
+        loaded.append(symbol)
+        return universe[symbol]
+
+    # 每个序列约 600~780 个交易日（约 10~12KB），预算只够同时驻留两个
+    results = dict(iter_universe_backtest(loader, 100, START, END, symbols=list(universe),
+                                          max_workers=2, memory_budget_mb=25 / 1024))
+
+    assert set(results) == set(universe)
+    batches = [span['args']['symbols'] for span in instrumentation.export_json()['spans']
+               if span['name'] == 'shared_memory']
+    assert sum(batches) == len(universe)
+    assert max(batches) <= 2
+
+def test_sequential_mode_and_keep_records(universe):
+    results = run_universe_backtest(universe, 100, START, END, max_workers=1, keep_records=True)
+    assert 'investment_records' in results['S0']
+    assert 'investment_records' not in strip_records(results['S0'])
+
+def test_loader_requires_symbols():
+    with pytest.raises(ValueError):
+        list(iter_universe_backtest(lambda symbol: None, 100, START, END))
+
+def _worker_pid(_):
+    return os.getpid()
+
+def test_process_pool_reused_across_calls(universe):
+    run_universe_backtest(universe, 100, START, END, max_workers=2, chunk_size=1)
+    pool = process_pool(2)
+    workers = set(pool._processes)
+    run_universe_backtest(universe, 100, START, END, 'monthly', max_workers=2, chunk_size=1)
+    summarize_universe_backtest(universe, 100, START, END, max_workers=2, chunk_size=1)
+    assert process_pool(2) is pool
+    # 之前启动的子进程仍在服务，没有重新创建
+    assert workers and workers <= set(pool._processes)
+
+def test_loading_overlaps_computation(universe):
+    loaded = []
+
+    def slow_loader(symbol):
+        time.sleep(0.4)
+        loaded.append(symbol)
+        return universe[symbol]
+
+    process_pool(2).submit(_worker_pid, 0).result()  # 预先启动子进程
+    first_seen = None
+    for symbol, result in iter_universe_backtest(slow_loader, 100, START, END, symbols=list(universe),
+                                                 max_workers=2, chunk_size=1):
+        if first_seen is None:
+            first_seen = len(loaded)
+    # 第一个结果在后面的股票加载完之前就已经返回
+    assert first_seen < len(universe)
+
+def test_parallel_reinvest_dividends_matches_sequential(universe):
+    data = {}
+    for symbol, frame in universe.items():
+        frame = frame.assign(Dividends=0.0)
+        frame.iloc[::60, frame.columns.get_loc('Dividends')] = 0.5
+        data[symbol] = frame
+    # 没有分红列的股票按没有分红处理
+    data['PLAIN'] = universe['S0']
+
+    parallel = run_universe_backtest(data, 100, START, END, max_workers=2, chunk_size=2, reinvest_dividends=True)
+    for symbol, frame in data.items():
+        expected = run_backtest(frame, 100, START, END, reinvest_dividends=True)
+        assert parallel[symbol]['final_value'] == pytest.approx(expected['final_value'])
+    assert parallel['S1']['dividend_shares'] > 0
+    assert parallel['PLAIN']['dividend_shares'] == pytest.approx(0)
@@ -0,0 +1,144 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+# 与 src 内部模块一致使用顶层导入，确保共享同一个埋点状态
+import instrumentation
+from backtest import run_backtest, compare_with_lump_sum
+from benchmark import Benchmark
+from batch_runner import run_universe_backtest
+
+START, END = '2020-01-01', '2022-12-31'
+
+@pytest.fixture
+def market():
+    dates = pd.bdate_range(START, END)
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0.0003, 0.01, len(dates))
+    return pd.DataFrame({'Close': 100 * np.cumprod(1 + returns)}, index=dates), returns
+
+@pytest.fixture
+def clean_instrumentation():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+def test_benchmark_against_itself(market):
+    data, _ = market
+    result = run_backtest(data, 100, START, END, benchmark=Benchmark(data))
+    assert result['benchmark_return'] == pytest.approx(result['total_return'])
+    assert result['excess_return'] == pytest.approx(0)
+    assert result['excess_xirr'] == pytest.approx(0)
+    assert result['tracking_error'] == pytest.approx(0)
+    assert result['beta'] == pytest.approx(1)
+
+@pytest.mark.parametrize('kwargs', [
+    {'signal': 'rsi_skip', 'signal_params': {'threshold': 55}},
+    {'signal': 'drawdown_scale'},
+    {'amount': np.linspace(50, 500, 156)},
+])
+def test_benchmark_uses_same_cash_flows(market, kwargs):
+    data, _ = market
+    kwargs = dict(kwargs)
+    amount = kwargs.pop('amount', 100)
+    stock = data.iloc[40:]
+    result = run_backtest(data, amount, START, END, benchmark=Benchmark(data), **kwargs)
+    assert result['excess_return'] == pytest.approx(0)
+    assert result['excess_xirr'] == pytest.approx(0)
+
+    # 晚上市的股票：基准只在股票实际定投的日期买入
+    late = run_backtest(stock, amount, START, END,
+                        benchmark=Benchmark(data), **kwargs)
+    alone = run_backtest(stock, amount, START, END, **kwargs)
+    assert late['excess_return'] == pytest.approx(0)
+    assert late['benchmark_xirr'] == pytest.approx(alone['xirr'])
+
+def test_levered_stock_metrics(market):
+    data, returns = market
+    rng = np.random.default_rng(2)
+    stock_returns = 2 * returns + rng.normal(0, 0.002, len(returns))
+    stock = pd.DataFrame({'Close': 50 * np.cumprod(1 + stock_returns)}, index=data.index)
+
+    result = run_backtest(stock, 100, START, END, benchmark=Benchmark(data))
+    expected = run_backtest(data, 100, START, END)
+    assert result['benchmark_return'] == pytest.approx(expected['total_return'])
+    assert result['excess_return'] == pytest.approx(result['total_return'] - expected['total_return'])
+    assert result['beta'] == pytest.approx(2, abs=0.05)
+
+    # 跟踪误差：持仓期间逐期超额收益率的年化标准差
+    first = data.index.get_loc(result['investment_records']['Date'].iloc[0])
+    active = stock_returns[first + 1:] - returns[first + 1:]
+    years = (data.index[-1] - data.index[first]).days / 365.25
+    assert result['tracking_error'] == pytest.approx(active.std(ddof=1) * np.sqrt(len(active) / years) * 100)
+
+def test_compare_reports_lump_sum_excess(market):
+    data, _ = market
+    stock = data * 1.5
+    stock['Close'] *= np.linspace(1, 1.3, len(stock))
+    benchmark = Benchmark(data)
+    result = compare_with_lump_sum(stock, 100, START, END, benchmark=benchmark)
+    base = compare_with_lump_sum(data, 100, START, END)
+    assert result['lump_sum_excess_return'] == pytest.approx(result['lump_sum_return'] - base['lump_sum_return'])
+    assert result['drip_result']['excess_return'] > 0
+
+def test_benchmark_cached_across_universe(market, clean_instrumentation):
+    data, _ = market
+    universe = {f'S{i}': data[i * 30:] * (1 + i) for i in range(4)}
+    # 有缺口的股票需要对齐，对齐结果被缓存
+    gapped = data.drop(data.index[100:110])
+    universe['GAP'] = gapped
+    benchmark = Benchmark(data)
+
+    results = run_universe_backtest(universe, 100, START, END, max_workers=1, benchmark=benchmark)
+    counters = instrumentation.export_json()['counters']
+    # 与基准交易日相同的 S0 命中预先计算的结果，其余股票的定投日期各不相同
+    assert counters['benchmark.miss'] == 5
+    assert counters['benchmark.hit'] == 1
+    results_again = run_universe_backtest(universe, 100, START, END, max_workers=1, benchmark=benchmark)
+    counters = instrumentation.export_json()['counters']
+    assert counters['benchmark.miss'] == 5
+    assert counters['benchmark.align'] == 1
+
+    for symbol in universe:
+        assert results[symbol]['benchmark_return'] == results_again[symbol]['benchmark_return']
+    assert results['S1']['beta'] == pytest.approx(1)
+    assert results['GAP']['beta'] == pytest.approx(1, abs=0.1)
+
+def test_parallel_universe_matches_sequential(market):
+    data, _ = market
+    universe = {f'S{i}': data[i * 30:] * (1 + i) for i in range(3)}
+    sequential = run_universe_backtest(universe, 100, START, END, max_workers=1, benchmark=Benchmark(data))
+    parallel = run_universe_backtest(universe, 100, START, END, max_workers=2, chunk_size=1,
+                                     benchmark=Benchmark(data))
+    for symbol in universe:
+        for key in ('excess_return', 'tracking_error', 'beta'):
+            assert parallel[symbol][key] == pytest.approx(sequential[symbol][key], nan_ok=True)
+
+def test_parallel_workers_reuse_installed_benchmark(market, clean_instrumentation):
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+
+    data, _ = market
+    gapped = data.drop(data.index[100:110])
+    universe = {f'G{i}': gapped * (1 + i) for i in range(6)}
+    benchmark = Benchmark(data)
+
+    class RecordingExecutor(ProcessPoolExecutor):
+        payload_sizes = []
+
+        def submit(self, fn, *args, **kwargs):
+            self.payload_sizes.append(len(pickle.dumps(args)))
+            return super().submit(fn, *args, **kwargs)
+
+    with RecordingExecutor(max_workers=2) as executor:
+        results = run_universe_backtest(universe, 100, START, END, max_workers=2, chunk_size=1,
+                                        benchmark=benchmark, executor=executor)
+    # Only a handle travels with each chunk, never the benchmark's price data
+    assert max(RecordingExecutor.payload_sizes) < data.memory_usage().sum()
+    # Each worker aligns the shared trading days once and reuses the result for later chunks
+    assert instrumentation.export_json()['counters']['benchmark.align'] <= 2
+    sequential = run_universe_backtest(universe, 100, START, END, max_workers=1, benchmark=Benchmark(data))
+    for symbol in universe:
+        assert results[symbol]['tracking_error'] == pytest.approx(sequential[symbol]['tracking_error'])
@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.checkpoint import Checkpoint
+from src.sweep import run_parameter_sweep, params_key, checkpoint_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GRID = [
+    {'strategy': 'weekly', 'strategy_params': {'day_of_week': 0}},
+    {'strategy': 'monthly', 'strategy_params': {'day_of_month': 1}, 'amount': 500},
+]
+
+# Synthetic sweep: 20 symbols x 2 parameter sets. Each data load sleeps so the run can be killed midway.
+SWEEP_SCRIPT = '''
+import sys, json, time
+sys.path.insert(0, {src!r})
+import numpy as np
+import pandas as pd
+from sweep import run_parameter_sweep
+
+index = pd.bdate_range('2020-01-01', '2021-12-31')
+def loader(symbol):
+    time.sleep({delay})
+    rng = np.random.default_rng(int(symbol[1:]))
+    return pd.DataFrame({{'Close': 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))}}, index=index)
+
+computed = []
+results = run_parameter_sweep(loader, {grid!r}, '2020-01-01', '2021-12-31',
+                              symbols=[f"S{{i}}" for i in range(20)], checkpoint_path={path!r},
+                              checkpoint_interval=0, max_workers=1,
+                              on_result=lambda params, symbol, result: computed.append(symbol))
+print(json.dumps({{'computed': len(computed),
+                  'results': {{f"{{k[0]}}|{{k[1]}}": v['final_value'] for k, v in results.items()}}}}))
+'''
+
+def sweep_command(path, delay):
+    script = SWEEP_SCRIPT.format(src=os.path.join(ROOT, 'src'), delay=delay, grid=GRID, path=path)
+    return [sys.executable, '-c', script]
+
+def test_checkpoint_resumes_and_drops_partial_line(tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    with Checkpoint(path, {'run': 1}, flush_interval=60, flush_every=2) as checkpoint:
+        checkpoint.record('a', {'value': np.float64(1.5)})
+        assert os.path.getsize(path) > 0
+        checkpoint.record('b', {'value': np.int64(2)})
+        checkpoint.record('c', {'value': 3.0})
+    # Simulate a crash in the middle of writing the next line
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"unit": "d", "res')
+
+    with Checkpoint(path, {'run': 1}) as checkpoint:
+        assert sorted(checkpoint.results) == ['a', 'b', 'c']
+        assert checkpoint.results['b'] == {'value': 2}
+        checkpoint.record('d', {'value': 4.0})
+    with Checkpoint(path, {'run': 1}) as checkpoint:
+        assert len(checkpoint) == 4 and 'd' in checkpoint
+
+    with pytest.raises(ValueError):
+        Checkpoint(path, {'run': 2})
+
+def test_error_results_are_retried_after_resume(tmp_path):
+    index = pd.bdate_range('2020-01-01', '2020-12-31')
+    frame = pd.DataFrame({'Close': np.linspace(50, 80, len(index))}, index=index)
+    failures = {'S1'}
+
+    def flaky(symbol):
+        # A truncated download without a Close column makes the backtest itself fail
+        if symbol in failures:
+            return frame.rename(columns={'Close': 'Open'})
+        return frame
+
+    path = str(tmp_path / 'sweep.ckpt')
+    first = run_parameter_sweep(flaky, GRID[:1], '2020-01-01', '2020-12-31', symbols=['S0', 'S1'],
+                                checkpoint_path=path, max_workers=1)
+    assert 'error' in first[(params_key(GRID[0]), 'S1')]
+
+    failures.clear()
+    computed = []
+    second = run_parameter_sweep(flaky, GRID[:1], '2020-01-01', '2020-12-31', symbols=['S0', 'S1'],
+                                 checkpoint_path=path, max_workers=1,
+                                 on_result=lambda params, symbol, result: computed.append(symbol))
+    assert computed == ['S1']
+    assert 'error' not in second[(params_key(GRID[0]), 'S1')]
+
+def test_checkpoint_drops_dataframe_fields(tmp_path):
+    index = pd.bdate_range('2020-01-01', '2020-12-31')
+    universe = {'S0': pd.DataFrame({'Close': np.linspace(50, 80, len(index))}, index=index)}
+    path = str(tmp_path / 'sweep.ckpt')
+
+    first = run_parameter_sweep(universe, [{'compare': True}], '2020-01-01', '2020-12-31',
+                                checkpoint_path=path, max_workers=1, keep_records=True)
+    key = (params_key({'compare': True}), 'S0')
+    assert isinstance(first[key]['drip_result']['investment_records'], pd.DataFrame)
+
+    config = checkpoint_config('2020-01-01', '2020-12-31', [{'compare': True}], {'keep_records': True})
+    with Checkpoint(path, config) as checkpoint:
+        restored = checkpoint.results['|'.join(key)]
+    assert 'investment_records' not in restored['drip_result']
+    assert restored['drip_result']['final_value'] == pytest.approx(first[key]['drip_result']['final_value'])
+
+def test_resume_rejects_different_result_settings(tmp_path):
+    from benchmark import Benchmark
+
+    index = pd.bdate_range('2020-01-01', '2020-12-31')
+    frame = pd.DataFrame({'Close': np.linspace(50, 80, len(index)), 'Dividends': 0.0}, index=index)
+    path = str(tmp_path / 'sweep.ckpt')
+    run_parameter_sweep({'S0': frame}, GRID, '2020-01-01', '2020-12-31', checkpoint_path=path, max_workers=1)
+
+    for kwargs in ({'reinvest_dividends': True}, {'validate': True}, {'keep_records': True},
+                   {'benchmark': Benchmark(frame)}):
+        with pytest.raises(ValueError):
+            run_parameter_sweep({'S0': frame}, GRID, '2020-01-01', '2020-12-31', checkpoint_path=path,
+                                max_workers=1, **kwargs)
+    # Explicitly passing the defaults still matches
+    resumed = run_parameter_sweep({'S0': frame}, GRID, '2020-01-01', '2020-12-31', checkpoint_path=path,
+                                  max_workers=1, reinvest_dividends=False)
+    assert len(resumed) == 2
+
+    benchmark_path = str(tmp_path / 'benchmark.ckpt')
+    run_parameter_sweep({'S0': frame}, GRID, '2020-01-01', '2020-12-31', checkpoint_path=benchmark_path,
+                        max_workers=1, benchmark=Benchmark(frame))
+    run_parameter_sweep({'S0': frame}, GRID, '2020-01-01', '2020-12-31', checkpoint_path=benchmark_path,
+                        max_workers=1, benchmark=Benchmark(frame.copy()))
+    with pytest.raises(ValueError):
+        run_parameter_sweep({'S0': frame}, GRID, '2020-01-01', '2020-12-31', checkpoint_path=benchmark_path,
+                            max_workers=1, benchmark=Benchmark(frame * 2))
+
+def test_sweep_in_process_skips_completed_units(tmp_path):
+    index = pd.bdate_range('2020-01-01', '2020-12-31')
+    universe = {f"S{i}": pd.DataFrame({'Close': np.linspace(50 + i, 80, len(index))}, index=index)
+                for i in range(4)}
+    path = str(tmp_path / 'sweep.ckpt')
+
+    first = run_parameter_sweep({k: universe[k] for k in ('S0', 'S1')}, GRID, '2020-01-01', '2020-12-31',
+                                checkpoint_path=path, max_workers=1)
+    computed = []
+    second = run_parameter_sweep(universe, GRID, '2020-01-01', '2020-12-31', checkpoint_path=path, max_workers=1,
+                                 on_result=lambda params, symbol, result: computed.append(symbol))
+
+    assert len(first) == 4 and len(second) == 8
+    assert sorted(computed) == ['S2', 'S2', 'S3', 'S3']
+    key = (params_key(GRID[1]), 'S0')
+    assert second[key]['final_value'] == pytest.approx(first[key]['final_value'])
+
+def test_killed_sweep_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'killed.ckpt')
+    process = subprocess.Popen(sweep_command(path, 0.2), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    if sum(1 for _ in f) > 6:
+                        break
+            time.sleep(0.05)
+        process.kill()
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+    with open(path, encoding='utf-8') as f:
+        completed = sum(1 for _ in f) - 1
+    assert 0 < completed < 40
+
+    resumed = subprocess.run(sweep_command(path, 0), capture_output=True, text=True, check=True)
+    resumed = json.loads(resumed.stdout)
+    reference = subprocess.run(sweep_command(str(tmp_path / 'reference.ckpt'), 0), capture_output=True,
+                               text=True, check=True)
+    reference = json.loads(reference.stdout)
+
+    assert resumed['computed'] == 40 - completed
+    assert reference['computed'] == 40
+    assert resumed['results'].keys() == reference['results'].keys()
+    for key, value in reference['results'].items():
+        assert resumed['results'][key] == pytest.approx(value)
@@ -0,0 +1,64 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.backtest import run_backtest, compare_with_lump_sum
+from src.chunked_backtest import iter_bar_chunks, run_backtest_chunked
+
+START, END = '2021-01-01', '2021-06-30'
+
+@pytest.fixture
+def minute_bars():
+    """Regular-session minute bars (09:30-15:59 New York time) on business days."""
+    days = pd.bdate_range('2021-01-04', '2021-07-09')
+    minutes = pd.timedelta_range('9h30min', '15h59min', freq='min')
+    index = pd.DatetimeIndex((days.values[:, None] + minutes.values[None, :]).ravel()).tz_localize('America/New_York')
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, len(index))))
+    return pd.DataFrame({'Close': close}, index=index)
+
+def split(frame, size):
+    return (frame.iloc[i:i + size] for i in range(0, len(frame), size))
+
+@pytest.mark.parametrize('strategy, params', [('weekly', {'day_of_week': 2}), ('monthly', {'day_of_month': 1})])
+def test_chunked_matches_in_memory_backtest(minute_bars, strategy, params):
+    expected = compare_with_lump_sum(minute_bars, 100, START, END, strategy, params)
+
+    for size in (997, 50000, len(minute_bars)):
+        result = run_backtest_chunked(split(minute_bars, size), 100, START, END, strategy, params, compare=True)
+
+        drip = result['drip_result']
+        assert drip['bar_count'] == len(minute_bars)
+        assert drip['investment_count'] == expected['drip_result']['investment_count']
+        pd.testing.assert_series_equal(drip['investment_records']['Date'],
+                                       expected['drip_result']['investment_records']['Date'])
+        for key in ('total_investment', 'final_value', 'final_price', 'annual_return', 'xirr'):
+            assert drip[key] == pytest.approx(expected['drip_result'][key])
+        assert result['lump_sum_value'] == pytest.approx(expected['lump_sum_value'])
+        assert result['difference'] == pytest.approx(expected['difference'])
+
+def test_iter_bar_chunks_reads_csv_and_parquet(tmp_path, minute_bars):
+    frame = minute_bars.iloc[:20000]
+    stored = frame.rename_axis('Date').reset_index()
+    stored.to_csv(tmp_path / 'bars.csv', index=False)
+    stored.to_parquet(tmp_path / 'bars.parquet', index=False)
+
+    csv_chunks = list(iter_bar_chunks(str(tmp_path / 'bars.csv'), chunk_size=6000, tz='America/New_York'))
+    assert [len(chunk) for chunk in csv_chunks] == [6000, 6000, 6000, 2000]
+    pd.testing.assert_frame_equal(pd.concat(csv_chunks), frame, check_freq=False, check_index_type=False,
+                                  check_names=False)
+
+    pytest.importorskip('pyarrow')
+    parquet_chunks = list(iter_bar_chunks(str(tmp_path / 'bars.parquet'), chunk_size=6000))
+    assert sum(len(chunk) for chunk in parquet_chunks) == len(frame)
+
+    expected = run_backtest(frame, 100, '2021-01-01', '2021-01-31')
+    result = run_backtest_chunked(iter_bar_chunks(str(tmp_path / 'bars.csv'), 6000, tz='America/New_York'),
+                                  100, '2021-01-01', '2021-01-31')
+    assert result['final_value'] == pytest.approx(expected['final_value'])
+
+def test_chunks_must_be_in_order(minute_bars):
+    chunks = list(split(minute_bars.iloc[:5000], 1000))
+    with pytest.raises(ValueError):
+        run_backtest_chunked(reversed(chunks), 100, START, END)
+    assert run_backtest_chunked(iter([]), 100, START, END) == {}
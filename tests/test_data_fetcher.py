@@ -0,0 +1,256 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+import pandas as pd
+import numpy as np
+
+# 与 src 内部模块一致使用顶层导入，确保共享同一个埋点状态和校验缓存
+import instrumentation
+from data_fetcher import validate_stock_data, data_health_report, clear_validation_cache, DataCache, get_stock_data
+from batch_runner import run_universe_backtest
+
+@pytest.fixture
+def prices():
+    dates = pd.bdate_range('2020-01-01', '2021-12-31')
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+    return pd.DataFrame({'Close': close, 'Volume': np.full(len(dates), 1000.0)}, index=dates)
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    clear_validation_cache()
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+    clear_validation_cache()
+
+def test_clean_data_passes_unchanged(prices):
+    data, report = validate_stock_data(prices)
+    assert data is prices
+    assert report['ok'] and not report['repaired']
+    assert report['rows'] == len(prices)
+
+def test_detects_and_repairs_bad_bars(prices):
+    dirty = prices.copy()
+    dirty.iloc[10, 0] = np.nan
+    dirty.iloc[20, 0] = 0.0
+    dirty = pd.concat([dirty, dirty.iloc[[30]]]).sort_index(kind='stable')
+    dirty = dirty.iloc[::-1]
+
+    data, report = validate_stock_data(dirty)
+    assert report['unsorted']
+    assert report['duplicate_timestamps'] == 1
+    assert report['missing_close'] == 1
+    assert report['nonpositive_close'] == 1
+    assert not report['ok'] and report['repaired']
+
+    assert data.index.is_monotonic_increasing and data.index.is_unique
+    assert len(data) == len(prices) - 2
+    assert (data['Close'] > 0).all()
+
+    # 只报告不修复时原样返回
+    same, report = validate_stock_data(dirty, repair=False)
+    assert same is dirty and not report['repaired']
+
+def test_unadjusted_split_is_back_adjusted(prices):
+    split_at = 200
+    unadjusted = prices.copy()
+    unadjusted.iloc[:split_at, 0] *= 4
+    unadjusted.iloc[:split_at, 1] /= 4
+
+    data, report = validate_stock_data(unadjusted)
+    assert report['split_jumps'] == [str(prices.index[split_at].date())]
+    np.testing.assert_allclose(data['Close'], prices['Close'])
+    np.testing.assert_allclose(data['Volume'], prices['Volume'])
+
+    # 数据中有拆股记录的跳变是预期的（未复权数据），不算问题
+    recorded = unadjusted.assign(**{'Stock Splits': 0.0})
+    recorded.iloc[split_at, recorded.columns.get_loc('Stock Splits')] = 4.0
+    assert validate_stock_data(recorded)[1]['ok']
+
+def test_price_crash_is_flagged_but_not_rewritten():
+    dates = pd.bdate_range('2020-01-01', periods=5)
+    crash = pd.DataFrame({'Close': [100.0, 101.0, 102.0, 50.0, 51.0]}, index=dates)
+    data, report = validate_stock_data(crash)
+    assert report['split_jumps'] == [str(dates[3].date())]
+    assert report['confirmed_splits'] == [] and not report['repaired']
+    assert data is crash
+
+    # 成交量没有按比例变化的 -60% 也只是疑似拆股
+    dates = pd.bdate_range('2020-01-01', periods=20)
+    close = np.r_[np.full(10, 100.0), np.full(10, 40.0)]
+    crash = pd.DataFrame({'Close': close, 'Volume': np.full(20, 1000.0)}, index=dates)
+    data, report = validate_stock_data(crash)
+    assert report['split_jumps'] == [str(dates[10].date())]
+    assert not report['repaired']
+    np.testing.assert_array_equal(data['Close'], close)
+
+def test_get_stock_data_only_reports_issues(monkeypatch, prices, capsys):
+    import data_fetcher
+    unadjusted = prices.copy()
+    unadjusted.iloc[:200, 0] *= 4
+    unadjusted.iloc[:200, 1] /= 4
+
+    class Ticker:
+        def __init__(self, symbol):
+            pass
+
+        def history(self, start, end, auto_adjust):
+            return unadjusted
+
+    monkeypatch.setattr(data_fetcher.yf, 'Ticker', Ticker)
+    monkeypatch.delenv(data_fetcher.CACHE_ENV_VAR, raising=False)
+    data = get_stock_data('AAA', '2020-01-01', '2021-12-31')
+    assert data is unadjusted
+    assert '疑似未复权拆股' in capsys.readouterr().out
+
+def test_verdict_is_cached_by_data_hash(prices):
+    validate_stock_data(prices)
+    validate_stock_data(prices.copy())
+    counters = instrumentation.export_json()['counters']
+    assert counters['validation.miss'] == 1
+    assert counters['validation.hit'] == 1
+
+    changed = prices.copy()
+    changed.iloc[5, 0] += 1
+    validate_stock_data(changed)
+    assert instrumentation.export_json()['counters']['validation.miss'] == 2
+
+    # 缓存命中时脏数据仍然会被修复
+    dirty = prices.copy()
+    dirty.iloc[3, 0] = np.nan
+    first, _ = validate_stock_data(dirty)
+    second, report = validate_stock_data(dirty)
+    assert report['repaired'] and second.equals(first)
+
+def test_cached_repair_plan_skips_detection(prices, monkeypatch):
+    import data_fetcher
+    dirty = prices.iloc[::-1].copy()
+    dirty.iloc[3, 0] = np.nan
+    first, report = validate_stock_data(dirty)
+    assert report['repaired'] and report['unsorted']
+
+    calls = []
+    detect = data_fetcher._detect_split_jumps
+    monkeypatch.setattr(data_fetcher, '_detect_split_jumps', lambda *args: calls.append(args) or detect(*args))
+    second, report = validate_stock_data(dirty.copy())
+    assert report['repaired']
+    assert calls == []
+    assert second.equals(first)
+    assert instrumentation.export_json()['counters']['validation.hit'] == 1
+
+def test_universe_health_report(prices):
+    dirty = prices.copy()
+    dirty.iloc[50, 0] = -1.0
+    health = {}
+    results = run_universe_backtest({'GOOD': prices, 'BAD': dirty}, 100, '2020-01-01', '2021-12-31',
+                                    max_workers=1, validate=True, health=health)
+    assert set(results) == {'GOOD', 'BAD'}
+    assert all(np.isfinite(result['final_value']) for result in results.values())
+
+    report = data_health_report(health)
+    assert bool(report.loc['GOOD', 'ok'])
+    assert not report.loc['BAD', 'ok']
+    assert report.loc['BAD', 'nonpositive_close'] == 1
+    assert '非正收盘价' in report.loc['BAD', 'issues']
+
+def fake_provider(symbol, log_path, delay=0.2):
+    """模拟下载：记录一次下载并返回由股票代码决定的数据（行数较多，写入需要一段时间）"""
+    with open(log_path, 'a') as f:
+        f.write(f"{symbol}\n")
+    time.sleep(delay)
+    dates = pd.bdate_range('2000-01-01', periods=20000, tz='America/New_York')
+    seed = sum(symbol.encode())
+    return pd.DataFrame({'Close': np.random.default_rng(seed).uniform(10, 20, len(dates))}, index=dates)
+
+def cache_worker(args):
+    directory, log_path, symbols, barrier = args
+    cache = DataCache(directory)
+    barrier.wait()
+    checksums = {}
+    for symbol in symbols:
+        data = cache.get_or_fetch(symbol, '2000-01-01', '2020-12-31', lambda: fake_provider(symbol, log_path))
+        checksums[symbol] = (len(data), float(data['Close'].sum()), str(data.index.tz))
+    return checksums
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='需要 fork 启动方式')
+def test_disk_cache_concurrent_processes_fetch_once(tmp_path):
+    directory, log_path = str(tmp_path / 'cache'), str(tmp_path / 'fetches.log')
+    symbols = ['AAA', 'BBB', 'CCC']
+    n_workers = 12
+    context = multiprocessing.get_context('fork')
+    barrier = context.Manager().Barrier(n_workers)
+    # 每个进程以不同顺序请求，读写交错
+    jobs = [(directory, log_path, symbols[i % 3:] + symbols[:i % 3], barrier) for i in range(n_workers)]
+    with context.Pool(n_workers) as pool:
+        results = pool.map(cache_worker, jobs)
+
+    with open(log_path) as f:
+        fetched = f.read().split()
+    assert sorted(fetched) == symbols
+    expected = {symbol: (len(data), float(data['Close'].sum()), str(data.index.tz))
+                for symbol, data in ((s, fake_provider(s, os.devnull, 0)) for s in symbols)}
+    assert all(result == expected for result in results)
+    assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+def test_disk_cache_hit_and_failed_fetch_not_cached(tmp_path):
+    cache = DataCache(str(tmp_path))
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_fetch('AAA', '2020-01-01', '2020-12-31', failing) is None
+    assert cache.get_or_fetch('AAA', '2020-01-01', '2020-12-31', failing) is None
+    assert len(calls) == 2
+
+    data = fake_provider('AAA', os.devnull, 0)
+    cache.get_or_fetch('AAA', '2020-01-01', '2020-12-31', lambda: data)
+    cached = cache.get_or_fetch('AAA', '2020-01-01', '2020-12-31', failing)
+    pd.testing.assert_frame_equal(cached, data)
+    assert len(calls) == 2
+    counters = instrumentation.export_json()['counters']
+    assert counters['disk_cache.miss'] == 3
+    assert counters['disk_cache.hit'] == 1
+
+def test_disk_cache_expiry_and_stale_temp_files(tmp_path):
+    cache = DataCache(str(tmp_path), max_age=60)
+    path = cache.path('AAA', '2020-01-01', '2020-12-31')
+    # 崩溃的写入进程留下的临时文件不影响读取
+    with open(path + '.1234.tmp', 'wb') as f:
+        f.write(b'partial')
+    first = fake_provider('AAA', os.devnull, 0)
+    cache.get_or_fetch('AAA', '2020-01-01', '2020-12-31', lambda: first)
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    second = first * 2
+    refreshed = cache.get_or_fetch('AAA', '2020-01-01', '2020-12-31', lambda: second)
+    pd.testing.assert_frame_equal(refreshed, second)
+    cache.clear()
+    assert os.listdir(tmp_path) == []
+
+def test_get_stock_data_uses_cache_directory_from_env(tmp_path, monkeypatch, prices):
+    import data_fetcher
+    calls = []
+
+    class Ticker:
+        def __init__(self, symbol):
+            pass
+
+        def history(self, start, end, auto_adjust):
+            calls.append((start, end, auto_adjust))
+            return prices
+
+    monkeypatch.setattr(data_fetcher.yf, 'Ticker', Ticker)
+    monkeypatch.setenv(data_fetcher.CACHE_ENV_VAR, str(tmp_path))
+    first = get_stock_data('AAA', '2020-01-01', '2021-12-31')
+    second = get_stock_data('AAA', '2020-01-01', '2021-12-31')
+    get_stock_data('AAA', '2020-01-01', '2021-12-31', auto_adjust=False)
+    pd.testing.assert_frame_equal(first, second)
+    assert len(calls) == 2
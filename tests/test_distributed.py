@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+from multiprocessing.connection import Client
+
+import pytest
+import pandas as pd
+
+from src.distributed import make_units, Coordinator, run_distributed, AUTHKEY_ENV_VAR, _calendar_for
+from src.batch_runner import run_universe_backtest
+from src.sweep import unit_key
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START, END = '2020-01-01', '2020-12-31'
+SYMBOLS = [f"S{i}" for i in range(8)]
+GRID = [{'strategy': 'weekly'}, {'strategy': 'monthly', 'amount': 300, 'compare': True}]
+
+# Deterministic loader importable by worker processes. The first attempt at S3 kills the worker
+# when a crash marker path is configured, to exercise re-dispatch of lost units.
+LOADER_MODULE = '''
+import os
+import numpy as np
+import pandas as pd
+
+INDEX = pd.bdate_range({start!r}, {end!r})
+
+def load(symbol):
+    marker = os.environ.get('CRASH_MARKER')
+    if marker and symbol == 'S3' and not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    rng = np.random.default_rng(int(symbol[1:]))
+    return pd.DataFrame({{'Close': 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(INDEX))))}}, index=INDEX)
+'''
+
+@pytest.fixture
+def loader_module(tmp_path, monkeypatch):
+    (tmp_path / 'synthetic_loader.py').write_text(LOADER_MODULE.format(start=START, end=END))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import synthetic_loader
+    yield synthetic_loader
+    sys.modules.pop('synthetic_loader', None)
+
+def expected_results(loader):
+    universe = {symbol: loader.load(symbol) for symbol in SYMBOLS}
+    expected = {}
+    for params in GRID:
+        results = run_universe_backtest(universe, params.get('amount', 100.0), START, END,
+                                        params['strategy'], compare=params.get('compare', False), max_workers=1)
+        expected.update({unit_key(params, symbol): result for symbol, result in results.items()})
+    return expected
+
+def start_cli_worker(tmp_path, coordinator, env_extra=None):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), os.path.join(ROOT, 'src')]),
+               **{AUTHKEY_ENV_VAR: coordinator.authkey.decode()}, **(env_extra or {}))
+    port = coordinator.address[1]
+    return subprocess.Popen([sys.executable, os.path.join(ROOT, 'src', 'distributed.py'), '--port', str(port),
+                             '--loader', 'synthetic_loader:load', '--heartbeat', '0.1'],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def assert_results_match(results, expected):
+    assert results.keys() == expected.keys()
+    for key, result in expected.items():
+        flat = result.get('drip_result', result)
+        got = results[key].get('drip_result', results[key])
+        assert got['final_value'] == pytest.approx(flat['final_value'])
+
+def test_local_workers_complete_all_units(loader_module):
+    units = make_units(SYMBOLS, GRID, START, END)
+    assert len(units) == 16
+
+    results = run_distributed(units, 'synthetic_loader:load', local_workers=3, heartbeat_timeout=5, timeout=60)
+
+    assert_results_match(results, expected_results(loader_module))
+
+def test_crashed_and_silent_workers_are_redispatched(tmp_path, loader_module):
+    units = make_units(SYMBOLS, GRID, START, END)
+    coordinator = Coordinator(units, heartbeat_timeout=0.5, authkey=os.urandom(16).hex().encode())
+    served = {}
+    server = threading.Thread(target=lambda: served.update(coordinator.serve(timeout=60)))
+    server.start()
+
+    # A worker that takes a unit and then goes silent (host hang): no heartbeats, connection stays open
+    silent = Client(coordinator.address, authkey=coordinator.authkey)
+    silent.send(('request', 'silent'))
+    _, silent_unit, _ = silent.recv()
+
+    # A worker that crashes while loading S3, then a healthy one that finishes the rest
+    crashing = start_cli_worker(tmp_path, coordinator, {'CRASH_MARKER': str(tmp_path / 'crashed')})
+    assert crashing.wait(timeout=30) == 1
+    healthy = start_cli_worker(tmp_path, coordinator)
+    server.join(timeout=60)
+    healthy.wait(timeout=30)
+    silent.close()
+
+    assert not server.is_alive()
+    assert coordinator.redispatched >= 2
+    assert silent_unit in served
+    assert_results_match(served, expected_results(loader_module))
+
+def test_coordinator_skips_checkpointed_units(tmp_path, loader_module):
+    from src.checkpoint import Checkpoint
+
+    units = make_units(SYMBOLS[:2], GRID[:1], START, END)
+    first_key = next(iter(units))
+    with Checkpoint(str(tmp_path / 'dist.ckpt')) as checkpoint:
+        checkpoint.record(first_key, {'final_value': 1.0})
+        results = run_distributed(units, 'synthetic_loader:load', local_workers=1, checkpoint=checkpoint,
+                                  heartbeat_timeout=5, timeout=60)
+
+    assert set(results) == set(units) - {first_key}
+    assert len(checkpoint) == 2
+
+def test_late_result_for_requeued_unit_finishes_run():
+    units = make_units(SYMBOLS[:1], GRID[:1], START, END)
+    coordinator = Coordinator(units, heartbeat_timeout=0.4)
+    served = {}
+    server = threading.Thread(target=lambda: served.update(coordinator.serve(timeout=5)))
+    server.start()
+
+    # The worker goes silent past the heartbeat timeout (the unit is requeued), then delivers its result
+    worker = Client(coordinator.address, authkey=coordinator.authkey)
+    worker.send(('request', 'slow'))
+    _, unit_id, _ = worker.recv()
+    time.sleep(1.0)
+    worker.send(('result', 'slow', unit_id, {'final_value': 1.0}))
+    worker.send(('request', 'slow'))
+    assert worker.recv() == ('stop',)
+    server.join(timeout=10)
+    worker.close()
+
+    assert not server.is_alive()
+    assert served == {unit_id: {'final_value': 1.0}}
+
+def test_authkey_required_off_loopback():
+    units = make_units(SYMBOLS[:1], GRID[:1], START, END)
+    with pytest.raises(ValueError):
+        Coordinator(units, address=('0.0.0.0', 0))
+
+    coordinator = Coordinator(units)
+    assert len(coordinator.authkey) == 32
+    assert Coordinator(units).authkey != coordinator.authkey
+
+def test_worker_calendar_keyed_by_trading_index():
+    from collections import deque
+
+    calendars = deque()
+    full = pd.bdate_range(START, END)
+    calendar = _calendar_for(calendars, full)
+    # A later listing is a contiguous slice of the same calendar
+    assert _calendar_for(calendars, full[50:]) is calendar
+    # A different trading index or date range gets its own calendar instead of the fallback path
+    gapped = full.delete(range(100, 110))
+    other = _calendar_for(calendars, gapped)
+    assert other is not calendar and other.offset_of(gapped) == 0
+    longer = pd.bdate_range('2019-01-01', END)
+    assert _calendar_for(calendars, longer).offset_of(longer) == 0
+    assert len(calendars) == 3
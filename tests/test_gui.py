@@ -0,0 +1,120 @@
+import time
+
+import pytest
+import pandas as pd
+import numpy as np
+
+pytest.importorskip('PyQt6')
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication
+
+from src.gui import StockBacktestGUI
+
+@pytest.fixture(scope='module')
+def qapp():
+    app = QApplication.instance() or QApplication([])
+    yield app
+
+class SlowProvider:
+    """Fake data provider that simulates a slow network fetch."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, symbol, start_date, end_date):
+        self.calls.append(symbol)
+        time.sleep(self.delay)
+        dates = pd.bdate_range(start_date, end_date)
+        prices = np.linspace(100, 150, len(dates))
+        return pd.DataFrame({'Close': prices}, index=dates)
+
+def wait_until(app, predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out waiting for condition')
+        app.processEvents()
+        time.sleep(0.005)
+
+@pytest.fixture
+def gui(qapp):
+    provider = SlowProvider(delay=0.3)
+    window = StockBacktestGUI(data_provider=provider, info_provider=lambda symbol: {})
+    window.provider = provider
+    yield window
+    window.close()
+
+def test_queued_symbols_run_in_background(qapp, gui):
+    results = []
+    gui.worker.result_ready.connect(lambda payload: results.append(payload['symbol']))
+    ticks = []
+    timer = QTimer()
+    timer.timeout.connect(lambda: ticks.append(time.monotonic()))
+    timer.start(10)
+
+    gui.symbol_input.setText('AAA, BBB')
+    gui.run_backtest()
+
+    # run_backtest only enqueues work, so it must return immediately
+    assert gui.worker.pending_count() == 2
+    assert gui.cancel_button.isEnabled()
+
+    wait_until(qapp, lambda: not gui.worker_busy)
+    timer.stop()
+
+    assert results == ['AAA', 'BBB']
+    assert gui.provider.calls == ['AAA', 'BBB']
+    # The event loop kept ticking while the fake network fetches were sleeping
+    assert len(ticks) > 20
+    assert not gui.cancel_button.isEnabled()
+    text = gui.text_results.toPlainText()
+    assert 'AAA' in text and 'BBB' in text
+
+def test_cancel_discards_running_and_queued_jobs(qapp, gui):
+    results = []
+    cancelled = []
+    gui.worker.result_ready.connect(lambda payload: results.append(payload['symbol']))
+    gui.worker.job_cancelled.connect(cancelled.append)
+
+    gui.symbol_input.setText('AAA,BBB,CCC')
+    gui.run_backtest()
+    wait_until(qapp, lambda: gui.provider.calls == ['AAA'])
+    gui.cancel_backtest()
+
+    wait_until(qapp, lambda: not gui.worker_busy)
+
+    assert results == []
+    assert sorted(cancelled) == ['AAA', 'BBB', 'CCC']
+    assert gui.provider.calls == ['AAA']
+
+    # The worker accepts new jobs after a cancellation
+    gui.symbol_input.setText('DDD')
+    gui.run_backtest()
+    wait_until(qapp, lambda: not gui.worker_busy)
+    assert results == ['DDD']
+
+def test_cancel_after_dequeue_is_not_lost(qapp):
+    from src.gui import BacktestWorker
+
+    provider = SlowProvider(delay=0)
+    worker = BacktestWorker(provider, lambda symbol: {})
+    results = []
+    cancelled = []
+    worker.result_ready.connect(lambda payload: results.append(payload['symbol']))
+    worker.job_cancelled.connect(cancelled.append)
+
+    worker.enqueue([{'symbol': 'AAA', 'start_date': '2020-01-01', 'end_date': '2020-06-30',
+                     'amount': 1000, 'compare': False, 'strategy': 'monthly'}])
+    # Simulate the worker taking the job off the queue right before cancel() runs
+    taken = worker._jobs.get()
+    worker.cancel()
+    worker._jobs.put(taken)
+    worker._jobs.put(None)
+    worker.run()
+
+    assert results == []
+    assert cancelled == ['AAA']
+    assert provider.calls == []
+    assert worker.pending_count() == 0
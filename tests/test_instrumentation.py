@@ -0,0 +1,128 @@
+import json
+
+import pytest
+import pandas as pd
+import numpy as np
+
+# 与 src 内部模块一致使用顶层导入，确保共享同一个埋点状态
+import instrumentation
+from backtest import run_backtest, compare_with_lump_sum
+from main import StockDripBacktester
+
+@pytest.fixture(autouse=True)
+def clean_instrumentation():
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+@pytest.fixture
+def stock_data():
+    dates = pd.bdate_range('2020-01-01', '2021-12-31')
+    return pd.DataFrame({'Close': np.linspace(100, 150, len(dates))}, index=dates)
+
+def test_disabled_by_default_records_nothing(stock_data):
+    assert not instrumentation.is_enabled()
+    run_backtest(stock_data, 100, '2020-01-01', '2021-12-31')
+
+    report = instrumentation.export_json()
+    assert report['spans'] == []
+    assert report['counters'] == {}
+
+def test_spans_and_counters_for_each_stage(stock_data):
+    instrumentation.enable()
+    result = compare_with_lump_sum(stock_data, 100, '2020-01-01', '2021-12-31')
+
+    stages = instrumentation.summary()
+    for name in ('lump_sum', 'backtest', 'schedule', 'share_calc', 'aggregation'):
+        assert stages[name]['count'] == 1
+    assert stages['backtest']['cat'] == 'backtest'
+    assert stages['share_calc']['cat'] == 'investment_strategy'
+    # Nested stages cannot take longer than their parent
+    assert stages['share_calc']['total_ms'] <= stages['backtest']['total_ms']
+    assert instrumentation.export_json()['counters']['investments'] == result['drip_result']['investment_count']
+
+def test_backtester_stages_record_symbol(stock_data):
+    backtester = StockDripBacktester(data_provider=lambda symbol, start, end: stock_data,
+                                     info_provider=lambda symbol: {})
+    instrumentation.enable()
+    backtester.load_data('TEST', '2020-01-01', '2021-12-31')
+    backtester.run_backtest(100, '2020-01-01', '2021-12-31')
+
+    names = [span['name'] for span in instrumentation.export_json()['spans']]
+    assert 'load_data' in names
+    assert 'run_backtest' in names
+
+def test_export_chrome_trace(stock_data, tmp_path):
+    instrumentation.enable()
+    with instrumentation.span('custom', 'test', symbol='TEST'):
+        run_backtest(stock_data, 100, '2020-01-01', '2021-12-31')
+
+    path = tmp_path / 'trace.json'
+    instrumentation.export_chrome_trace(str(path))
+    trace = json.loads(path.read_text(encoding='utf-8'))
+
+    complete = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+    counters = [e for e in trace['traceEvents'] if e['ph'] == 'C']
+    assert {'custom', 'backtest', 'share_calc'} <= {e['name'] for e in complete}
+    custom = next(e for e in complete if e['name'] == 'custom')
+    assert custom['args'] == {'symbol': 'TEST'}
+    assert all(e['dur'] >= 0 for e in complete)
+    assert counters and counters[0]['name'] == 'investments'
+
+def test_span_records_exception():
+    instrumentation.enable()
+    with pytest.raises(ValueError):
+        with instrumentation.span('failing'):
+            raise ValueError('boom')
+
+    span = instrumentation.export_json()['spans'][0]
+    assert span['args']['error'] == 'ValueError'
+
+def test_memory_mode_records_peak_and_retained():
+    instrumentation.enable(memory=True)
+    kept = []
+    with instrumentation.span('outer', 'test'):
+        with instrumentation.span('inner', 'test'):
+            scratch = np.ones(1_000_000)  # 8MB，阶段结束前释放
+            del scratch
+        kept.append(np.ones(250_000))  # 2MB，保留到阶段结束之后
+
+    stages = instrumentation.memory_report()['stages']
+    assert stages['inner']['peak_bytes'] >= 8_000_000
+    assert stages['inner']['retained_bytes'] < 1_000_000
+    # 内层阶段的峰值也计入外层阶段
+    assert stages['outer']['peak_bytes'] >= 8_000_000
+    assert stages['outer']['retained_bytes'] >= 2_000_000
+
+def test_memory_report_for_pipeline_stages(stock_data):
+    from batch_runner import iter_universe_backtest
+    instrumentation.enable(memory=True)
+    data = {'AAA': stock_data, 'BBB': stock_data.iloc[:200]}
+    list(iter_universe_backtest(data, 100, '2020-01-01', '2021-12-31', max_workers=1, validate=True))
+
+    report = instrumentation.export_json()['memory']
+    assert {'validate', 'schedule', 'share_calc', 'aggregation'} <= set(report['stages'])
+    assert report['symbols']['AAA'] == stock_data.memory_usage(deep=True).sum()
+    assert report['symbols']['AAA'] > report['symbols']['BBB']
+    assert report['total_resident_bytes'] == sum(report['symbols'].values())
+
+def test_memory_report_includes_worker_stages(stock_data):
+    from batch_runner import run_universe_backtest
+    instrumentation.enable(memory=True)
+    data = {f'S{i}': stock_data * (1 + i) for i in range(4)}
+    results = run_universe_backtest(data, 100, '2020-01-01', '2021-12-31', max_workers=2, chunk_size=1)
+
+    report = instrumentation.export_json()
+    stages = report['memory']['stages']
+    assert {'shared_memory', 'share_calc', 'aggregation'} <= set(stages)
+    assert stages['aggregation']['count'] == len(data)
+    # 子进程的计数器同样合并到主进程
+    assert report['counters']['investments'] == sum(result['investment_count'] for result in results.values())
+
+def test_memory_mode_is_opt_in(stock_data):
+    instrumentation.enable()
+    run_backtest(stock_data, 100, '2020-01-01', '2021-12-31')
+    report = instrumentation.export_json()
+    assert 'memory' not in report
+    assert all('memory_peak_bytes' not in span.get('args', {}) for span in report['spans'])
@@ -1,7 +1,10 @@
 import pytest
+import numpy as np
+import pandas as pd
 from datetime import datetime
 
-from src.investment_strategy import weekly_investment_dates, monthly_investment_dates
+from src.investment_strategy import (weekly_investment_dates, monthly_investment_dates, contribution_amounts,
+                                     schedule_amounts)
 
 def test_weekly_investment_dates():
     # Test case 1: Default (Monday)
@@ -48,3 +51,35 @@ def test_monthly_investment_dates():
         datetime(2023, 3, 31),
     ]
     assert dates == expected
+
+def test_contribution_amounts_step_up_index_and_top_ups():
+    dates = monthly_investment_dates('2020-03-15', '2022-06-30', day_of_month=15)
+
+    # 每满一个定投周年递增 5%
+    amounts = contribution_amounts(dates, 100, growth_rate=0.05)
+    years = np.array([(d.year - 2020) - (d.month < 3) for d in dates])
+    np.testing.assert_allclose(amounts, 100 * 1.05 ** years)
+
+    # 批量递增比例：每个比例一行
+    grid = contribution_amounts(dates, 100, growth_rate=np.array([0.0, 0.05, 0.1]))
+    assert grid.shape == (3, len(dates))
+    np.testing.assert_allclose(grid[1], amounts)
+    np.testing.assert_allclose(grid[0], 100)
+
+    # 按指数调整：取定投日当天或之前最近的指数水平
+    cpi = pd.Series([100.0, 110.0], index=pd.to_datetime(['2020-01-01', '2021-01-01']))
+    indexed = contribution_amounts(dates, 100, index=cpi)
+    np.testing.assert_allclose(indexed, np.where(pd.DatetimeIndex(dates) >= '2021-01-01', 110, 100))
+
+    # 额外追加落在当天或之后的第一次定投上，超出计划的追加被忽略
+    topped = contribution_amounts(dates, 100, top_ups={'2020-04-01': 500, '2020-04-15': 50, '2030-01-01': 1})
+    assert topped[1] == 650
+    assert topped.sum() == 100 * len(dates) + 550
+
+def test_schedule_amounts():
+    np.testing.assert_allclose(schedule_amounts(100, 3), [100, 100, 100])
+    # 晚于最后一个交易日的定投被丢弃时，多余的金额一并丢弃
+    np.testing.assert_allclose(schedule_amounts(np.array([1.0, 2.0, 3.0]), 2), [1, 2])
+    assert schedule_amounts(np.ones((4, 5)), 3).shape == (4, 3)
+    with pytest.raises(ValueError):
+        schedule_amounts(np.array([1.0]), 2)
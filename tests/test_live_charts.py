@@ -0,0 +1,108 @@
+import pytest
+import pandas as pd
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from src.live_charts import LiveChart, dates_to_num
+from src.visualization import downsample_minmax
+
+@pytest.fixture
+def chart():
+    fig = Figure(figsize=(8, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    return LiveChart(fig, 'Price')
+
+@pytest.fixture
+def daily_prices():
+    """Thirty years of synthetic business-day prices."""
+    dates = pd.bdate_range('1990-01-01', '2019-12-31')
+    rng = np.random.default_rng(1)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+    return pd.Series(prices, index=dates)
+
+def test_downsample_minmax_keeps_envelope():
+    rng = np.random.default_rng(2)
+    y = rng.normal(size=100000)
+
+    idx = downsample_minmax(y, 1000)
+
+    assert len(idx) <= 1000
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert y[idx].max() == y.max()
+    assert y[idx].min() == y.min()
+
+def test_update_reuses_artists(chart, daily_prices):
+    chart.set_line('close', daily_prices.index, daily_prices.values)
+    chart.set_points('buys', daily_prices.index[::20], daily_prices.values[::20])
+    line = chart.lines['close']
+    scatter = chart.points['buys']
+    n_artists = len(chart.ax.lines) + len(chart.ax.collections)
+
+    chart.set_line('close', daily_prices.index[:500], daily_prices.values[:500] * 2)
+    chart.set_points('buys', daily_prices.index[:500:20], daily_prices.values[:500:20])
+    chart.refresh()
+
+    assert chart.lines['close'] is line
+    assert chart.points['buys'] is scatter
+    assert len(chart.ax.lines) + len(chart.ax.collections) == n_artists
+    assert len(scatter.get_offsets()) == 25
+
+def test_line_downsampled_to_pixel_width(chart, daily_prices):
+    chart.set_line('close', daily_prices.index, daily_prices.values)
+    chart.refresh()
+    chart.figure.canvas.draw()
+
+    n_plotted = len(chart.lines['close'].get_xdata())
+    assert n_plotted <= chart._target_points() < len(daily_prices)
+
+def test_zoom_resamples_visible_range(chart, daily_prices):
+    chart.set_line('close', daily_prices.index, daily_prices.values)
+    chart.refresh()
+
+    x = dates_to_num(daily_prices.index)
+    chart.ax.set_xlim(x[1000], x[1300])
+
+    xdata = chart.lines['close'].get_xdata()
+    # Zoomed into 301 bars: every visible bar is drawn at full resolution
+    assert len(xdata) == 303
+    assert xdata[0] <= x[1000] and xdata[-1] >= x[1300]
+
+def test_refresh_after_zoom_shows_new_data(chart, daily_prices):
+    chart.set_line('close', daily_prices.index, daily_prices.values)
+    chart.refresh()
+    x = dates_to_num(daily_prices.index)
+    chart.ax.set_xlim(x[1000], x[1300])
+    chart.ax.set_ylim(0, 1)
+
+    # A new run covering a later period must not stay inside the stale zoomed range
+    later = daily_prices[2000:] * 10
+    chart.set_line('close', later.index, later.values)
+    chart.refresh()
+    x0, x1 = chart.ax.get_xlim()
+    y0, y1 = chart.ax.get_ylim()
+    assert x0 <= dates_to_num(later.index[:1])[0] and x1 >= dates_to_num(later.index[-1:])[0]
+    assert y0 <= later.min() and y1 >= later.max()
+
+def test_cursor_overlay_blits(chart, daily_prices):
+    chart.set_line('close', daily_prices.index, daily_prices.values)
+    chart.refresh()
+    chart.figure.canvas.draw()
+    assert chart._background is not None
+
+    x = dates_to_num(daily_prices.index)
+    chart.update_cursor(x[100])
+
+    assert chart.cursor_line.get_xdata()[0] == x[100]
+    assert f'{daily_prices.values[100]:.2f}' in chart.cursor_text.get_text()
+
+def test_clear_keeps_artists(chart, daily_prices):
+    chart.set_line('close', daily_prices.index, daily_prices.values)
+    line = chart.lines['close']
+    chart.clear()
+    chart.show_message('error')
+
+    assert chart.lines['close'] is line
+    assert len(line.get_xdata()) == 0
+    assert chart.message_text.get_visible()
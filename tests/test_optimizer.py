@@ -0,0 +1,64 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.optimizer import (schedule_candidates, walk_forward_windows, successive_halving,
+                           walk_forward_optimize)
+
+def test_walk_forward_windows():
+    windows = walk_forward_windows('2015-01-01', '2020-12-31', train_years=3, test_years=1)
+    assert windows[0] == ('2015-01-01', '2017-12-31', '2018-01-01', '2018-12-31')
+    assert windows[-1] == ('2017-01-01', '2019-12-31', '2020-01-01', '2020-12-31')
+    assert len(windows) == 3
+    assert walk_forward_windows('2015-01-01', '2016-06-30', train_years=3) == []
+
+def test_successive_halving_finds_best_with_fewer_evaluations():
+    rng = np.random.default_rng(0)
+    quality = rng.normal(0, 1, 40)
+    quality[17] = 5
+    noise = rng.normal(0, 0.5, (40, 9))
+    calls = []
+
+    def evaluate(candidate, segment):
+        calls.append((candidate, segment))
+        return quality[candidate] + noise[candidate, segment]
+
+    selection = successive_halving(40, evaluate, n_segments=9, eta=3)
+    assert selection['best'] == 17
+    assert selection['rungs'] == [40, 14, 5]
+    # 每个 (候选, 段) 最多评估一次，总数远少于全网格
+    assert len(calls) == len(set(calls)) == selection['evaluations']
+    assert selection['evaluations'] < 40 * 9 / 2
+
+    # NaN 得分视为最差
+    selection = successive_halving(3, lambda c, s: np.nan if c == 0 else c, n_segments=1)
+    assert selection['best'] == 2
+
+def test_walk_forward_optimize_picks_recurring_dip():
+    dates = pd.bdate_range('2014-01-01', '2020-12-31')
+    rng = np.random.default_rng(4)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.005, len(dates))))
+    # 每周三的收盘价固定低 5%：按周三定投在任何窗口都最好
+    close = close * np.where(dates.dayofweek == 2, 0.95, 1.0)
+    stock_data = pd.DataFrame({'Close': close}, index=dates)
+
+    result = walk_forward_optimize(stock_data, 100, '2014-01-01', '2020-12-31', train_years=3, test_years=1)
+    folds = result['folds']
+    assert len(folds) == 4
+    assert (folds['strategy'] == 'weekly').all()
+    assert all(params == {'day_of_week': 2} for params in folds['strategy_params'])
+    assert result['selections'] == {'{"strategy":"weekly","strategy_params":{"day_of_week":2}}': 4}
+    assert np.isfinite(result['out_of_sample'])
+    assert result['evaluations'] == folds['evaluations'].sum()
+    assert result['evaluations'] < result['grid_evaluations'] / 2
+
+def test_schedule_candidates():
+    candidates = schedule_candidates()
+    assert len(candidates) == 5 + 28
+    assert schedule_candidates(('monthly',), days_of_month=(1, 15)) == [
+        {'strategy': 'monthly', 'strategy_params': {'day_of_month': 1}},
+        {'strategy': 'monthly', 'strategy_params': {'day_of_month': 15}},
+    ]
+    with pytest.raises(ValueError):
+        walk_forward_optimize(pd.DataFrame({'Close': [1.0]}, index=pd.to_datetime(['2020-01-01'])),
+                              100, '2020-01-01', '2020-12-31', candidates=[])
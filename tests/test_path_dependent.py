@@ -0,0 +1,58 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.backtest import run_backtest
+from src.path_dependent import (simulate_target_path, run_path_dependent, run_value_averaging,
+                                value_averaging_targets)
+from src.investment_strategy import generate_investment_dates
+
+START, END = '2019-01-01', '2022-12-31'
+
+@pytest.fixture
+def stock_data():
+    dates = pd.bdate_range(START, END)
+    prices = 100 * np.exp(np.cumsum(np.random.default_rng(11).normal(0.0002, 0.012, len(dates))))
+    return pd.DataFrame({'Close': prices}, index=dates)
+
+def test_state_machine_by_hand():
+    prices = np.array([10.0, 5.0, 20.0])
+    targets = np.array([[100.0, 200.0, 300.0]] * 2)
+    contributions, shares = simulate_target_path(prices, targets, min_contribution=np.array([0.0, -np.inf]))
+    # 第1期买入100元；第2期市值50，补足到200；第3期市值800超过目标：只买不卖时不操作，允许卖出时卖出500
+    np.testing.assert_allclose(contributions, [[100, 150, 0], [100, 150, -500]])
+    np.testing.assert_allclose(shares, [40, 15])
+
+    # 投入上限
+    contributions, _ = simulate_target_path(prices, targets[:1], max_contribution=120)
+    np.testing.assert_allclose(contributions, [[100, 120, 0]])
+
+def test_fixed_contribution_matches_plain_dca(stock_data):
+    dates = generate_investment_dates('weekly', START, END, {})
+    targets = np.full((1, len(dates)), np.inf)
+    result = run_path_dependent(stock_data, targets, START, END, min_contribution=100, max_contribution=100)
+    expected = run_backtest(stock_data, 100, START, END)
+    for key in ('total_investment', 'final_value', 'total_return', 'annual_return', 'xirr'):
+        assert result[key].iloc[0] == pytest.approx(expected[key])
+    assert result['total_withdrawn'].iloc[0] == 0
+
+def test_batched_parameters_match_individual_runs(stock_data):
+    rates = np.array([0.0, 0.05, 0.1])
+    batch = run_value_averaging(stock_data, 100, START, END, growth_rates=rates, max_multipliers=[2, 3, np.inf],
+                                allow_sell=True)
+    assert list(batch['growth_rate']) == list(rates)
+    for i, rate in enumerate(rates):
+        single = run_value_averaging(stock_data, 100, START, END, growth_rates=rate,
+                                     max_multipliers=batch['max_multiplier'].iloc[i], allow_sell=True)
+        pd.testing.assert_series_equal(single.iloc[0], batch.iloc[i], check_names=False)
+
+def test_value_averaging_tracks_target(stock_data):
+    dates = generate_investment_dates('monthly', START, END, {'day_of_month': 1})
+    targets = value_averaging_targets(dates, 500, 0.08)
+    result = run_path_dependent(stock_data, targets, START, END, 'monthly', {'day_of_month': 1},
+                                min_contribution=-np.inf)
+    # 允许卖出且不设上限时，最后一次定投后的市值恰好等于目标
+    positions = stock_data.index.searchsorted(pd.DatetimeIndex(dates))
+    last_price = stock_data['Close'].iloc[positions[-1]]
+    assert result['final_shares'].iloc[0] * last_price == pytest.approx(targets[0, -1])
+    assert np.isfinite(result['xirr'].iloc[0])
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.backtest import run_backtest
+from src.visualization import downsample_lttb
+from src.rendering import build_chart_payload, render_backtest_charts, render_charts_parallel
+
+@pytest.fixture
+def long_stock_data():
+    """Ten years of synthetic business-day prices."""
+    dates = pd.bdate_range('2010-01-01', '2019-12-31')
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+    return pd.DataFrame({'Close': prices}, index=dates)
+
+def test_downsample_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0  # a single spike must survive downsampling
+
+    idx = downsample_lttb(x, y, 200)
+
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 4321 in idx
+
+def test_downsample_lttb_short_series_untouched():
+    idx = downsample_lttb(np.arange(10.0), np.arange(10.0), 100)
+    assert list(idx) == list(range(10))
+
+def test_build_chart_payload_downsamples(long_stock_data):
+    result = run_backtest(long_stock_data, 100, '2010-01-01', '2019-12-31')
+    payload = build_chart_payload(long_stock_data, result, 'TEST', max_points=300)
+
+    assert len(payload['price']['close']) == 300
+    assert payload['price']['close'][0] == long_stock_data['Close'].iloc[0]
+    assert payload['price']['close'][-1] == long_stock_data['Close'].iloc[-1]
+    assert len(payload['growth']['dates']) == 300
+    assert payload['summary']['final_value'] == pytest.approx(result['final_value'])
+
+def test_render_json_payload(long_stock_data, tmp_path):
+    result = run_backtest(long_stock_data, 100, '2010-01-01', '2019-12-31')
+    paths = render_backtest_charts(long_stock_data, result, 'TEST', output_dir=str(tmp_path), fmt='json')
+
+    assert paths == [os.path.join(str(tmp_path), 'TEST_charts.json')]
+    with open(paths[0], encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['symbol'] == 'TEST'
+    assert len(data['price']['dates']) == len(data['price']['close'])
+
+def test_render_charts_parallel(long_stock_data, tmp_path):
+    result = run_backtest(long_stock_data, 100, '2010-01-01', '2019-12-31')
+    jobs = [(symbol, long_stock_data, result) for symbol in ('AAA', 'BBB')]
+
+    outputs = render_charts_parallel(jobs, output_dir=str(tmp_path), dpi=50, fmt='svg', max_workers=2)
+
+    assert set(outputs) == {'AAA', 'BBB'}
+    for paths in outputs.values():
+        assert len(paths) == 2
+        for path in paths:
+            assert path.endswith('.svg')
+            assert os.path.getsize(path) > 0
+
+def test_render_rejects_unknown_format(long_stock_data, tmp_path):
+    result = run_backtest(long_stock_data, 100, '2010-01-01', '2019-12-31')
+    with pytest.raises(ValueError):
+        render_backtest_charts(long_stock_data, result, 'TEST', output_dir=str(tmp_path), fmt='bmp')
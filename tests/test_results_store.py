@@ -0,0 +1,69 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.results_store import ResultsStore, flatten_result
+from src.batch_runner import run_universe_backtest
+
+def test_flatten_result_keeps_scalars_only():
+    result = {
+        'final_value': np.float64(1.5),
+        'investment_count': np.int64(3),
+        'investment_records': pd.DataFrame({'a': [1]}),
+        'drip_result': {'total_return': 2.0, 'investment_records': pd.DataFrame()},
+        'error': None,
+    }
+
+    row = flatten_result(result)
+
+    assert row == {'final_value': 1.5, 'investment_count': 3, 'drip_result.total_return': 2.0, 'error': None}
+    assert type(row['final_value']) is float
+
+def test_buffered_append_query_and_aggregate(tmp_path):
+    path = str(tmp_path / 'results.db')
+    with ResultsStore(path, batch_size=4) as store:
+        for i in range(10):
+            store.append('run-a', f"S{i % 3}", {'total_return': float(i), 'investment_count': i})
+        # Four rows per batch: two batches written, two rows still buffered
+        assert store._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0] == 8
+        store.append('run-b', 'S0', {'total_return': 100.0, 'note': 'new column'})
+
+        assert store.count() == 11
+        assert store.run_ids() == ['run-a', 'run-b']
+        assert 'note' in store.columns
+
+        frame = store.query(run_id='run-a', symbols=['S1'], columns=['symbol', 'total_return'])
+        assert frame['total_return'].tolist() == [1.0, 4.0, 7.0]
+
+        high = store.query(where='"total_return" >= ?', params=(8,))
+        assert sorted(high['total_return']) == [8.0, 9.0, 100.0]
+
+        summary = store.aggregate('total_return', by='symbol', run_id='run-a')
+        assert summary.loc['S0', 'count'] == 4
+        assert summary.loc['S0', 'mean'] == pytest.approx((0 + 3 + 6 + 9) / 4)
+        assert summary.loc['S2', 'max'] == 8.0
+
+        chunks = list(store.iter_query(run_id='run-a', chunksize=4))
+        assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+
+        with pytest.raises(ValueError):
+            store.aggregate('total_return', funcs=('median',))
+
+    # Data persists and later runs append to the same table
+    with ResultsStore(path) as store:
+        assert store.count('run-a') == 10
+        assert pd.isna(store.query(run_id='run-a')['note']).all()
+
+def test_batch_runner_writes_into_store(tmp_path):
+    index = pd.bdate_range('2020-01-01', '2020-12-31')
+    universe = {f"S{i}": pd.DataFrame({'Close': np.linspace(10 + i, 20, len(index))}, index=index)
+                for i in range(5)}
+
+    with ResultsStore(str(tmp_path / 'results.db'), batch_size=2) as store:
+        returned = run_universe_backtest(universe, 100, '2020-01-01', '2020-12-31', compare=True,
+                                         max_workers=1, store=store, run_id='batch')
+
+        assert returned == {}
+        frame = store.query(run_id='batch')
+        assert sorted(frame['symbol']) == sorted(universe)
+        assert {'drip_result.xirr', 'lump_sum_return', 'difference'} <= set(frame.columns)
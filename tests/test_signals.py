@@ -0,0 +1,104 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+# 与 src 内部模块一致使用顶层导入，确保共享同一个埋点状态
+import instrumentation
+from backtest import run_backtest, compare_with_lump_sum
+from investment_strategy import generate_investment_dates, resolve_trading_positions
+from signals import (IndicatorCache, simple_moving_average, relative_strength_index, drawdown,
+                     signal_multipliers, register_signal, default_indicator_cache, SIGNAL_STRATEGIES)
+from sweep import run_parameter_sweep
+
+START, END = '2019-01-01', '2022-12-31'
+
+@pytest.fixture
+def stock_data():
+    dates = pd.bdate_range(START, END)
+    prices = 100 * np.exp(np.cumsum(np.random.default_rng(5).normal(0, 0.015, len(dates))))
+    return pd.DataFrame({'Close': prices}, index=dates)
+
+@pytest.fixture
+def clean_state():
+    default_indicator_cache.clear()
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+    default_indicator_cache.clear()
+
+def test_indicators_match_pandas(stock_data):
+    close = stock_data['Close'].to_numpy()
+    np.testing.assert_allclose(simple_moving_average(close, 20),
+                               stock_data['Close'].rolling(20).mean().to_numpy(), equal_nan=True)
+    rsi = relative_strength_index(close, 14)
+    assert np.isnan(rsi[:14]).all()
+    assert ((rsi[14:] >= 0) & (rsi[14:] <= 100)).all()
+    dd = drawdown(close)
+    assert dd.min() == 0 and dd.max() < 1
+    np.testing.assert_allclose(dd, 1 - close / np.maximum.accumulate(close))
+
+def test_below_ma_doubles_contributions(stock_data):
+    args = (stock_data, 100, START, END)
+    plain = run_backtest(*args)
+    result = run_backtest(*args, signal='below_ma', signal_params={'window': 50, 'multiplier': 2.0})
+
+    records = result['investment_records']
+    ma = stock_data['Close'].rolling(50).mean().reindex(records['Date']).to_numpy()
+    expected = np.where(records['Price'].to_numpy() < ma, 200.0, 100.0)
+    np.testing.assert_allclose(records['Amount'], expected)
+    assert result['investment_count'] == plain['investment_count']
+    assert result['total_investment'] == pytest.approx(expected.sum())
+
+def test_rsi_skip_drops_contributions(stock_data):
+    result = run_backtest(stock_data, 100, START, END, signal='rsi_skip', signal_params={'threshold': 60})
+    plain = run_backtest(stock_data, 100, START, END)
+    assert 0 < result['investment_count'] < plain['investment_count']
+    assert (result['investment_records']['Amount'] == 100).all()
+
+    comparison = compare_with_lump_sum(stock_data, 100, START, END, signal='rsi_skip',
+                                       signal_params={'threshold': 60})
+    assert comparison['drip_result']['total_investment'] == result['total_investment']
+
+def test_custom_signal_and_validation(stock_data):
+    @register_signal('test_half')
+    def half(ctx, factor=0.5):
+        return np.full(len(ctx.positions), factor)
+
+    try:
+        result = run_backtest(stock_data, 100, START, END, signal='test_half')
+        assert (result['investment_records']['Amount'] == 50).all()
+    finally:
+        SIGNAL_STRATEGIES.pop('test_half')
+
+    positions = resolve_trading_positions(stock_data.index, generate_investment_dates('weekly', START, END, {}))
+    with pytest.raises(ValueError):
+        signal_multipliers(stock_data, positions, lambda ctx: -np.ones(len(ctx.positions)))
+    with pytest.raises(ValueError):
+        signal_multipliers(stock_data, positions, 'no_such_signal')
+
+def test_indicators_computed_once_across_strategies(stock_data, clean_state):
+    param_grid = [{'signal': 'below_ma', 'signal_params': {'window': 200, 'multiplier': m}}
+                  for m in (1.5, 2.0, 3.0)]
+    param_grid += [{'signal': 'drawdown_scale', 'signal_params': {'scale': s}} for s in (1.0, 2.0)]
+    results = run_parameter_sweep({'A': stock_data, 'B': stock_data * 2}, param_grid, START, END,
+                                  max_workers=1)
+    assert len(results) == 10
+
+    # 每个股票的 200 日均线和回撤各计算一次
+    counters = instrumentation.export_json()['counters']
+    assert counters['indicator.miss'] == 4
+    assert counters['indicator.hit'] == 6
+
+def test_cache_evicts_least_recently_used(stock_data):
+    cache = IndicatorCache(max_entries=2)
+    close = stock_data['Close'].to_numpy()
+    key = IndicatorCache.series_key(stock_data)
+    first = cache.get(key, close, 'sma', 10)
+    cache.get(key, close, 'sma', 20)
+    assert cache.get(key, close, 'sma', 10) is first
+    cache.get(key, close, 'sma', 30)
+    assert len(cache) == 2
+    assert cache.get(key, close, 'sma', 10) is first
+    assert not first.flags.writeable
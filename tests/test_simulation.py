@@ -0,0 +1,81 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.backtest import compare_with_lump_sum
+from src.investment_strategy import weekly_investment_dates, resolve_trading_positions
+from src.simulation import (simulate_gbm_paths, bootstrap_paths, make_mock_stock_data,
+                            simulate_strategy_outcomes, iter_path_chunks, run_monte_carlo)
+
+def test_gbm_paths_are_seeded_and_positive():
+    paths = simulate_gbm_paths(50, 500, s0=100.0, sigma=0.03, seed=42)
+
+    assert paths.shape == (50, 500)
+    assert np.all(paths[:, 0] == 100.0)
+    assert np.all(paths > 0)
+    np.testing.assert_array_equal(paths, simulate_gbm_paths(50, 500, s0=100.0, sigma=0.03, seed=42))
+
+def test_bootstrap_paths_only_use_historical_returns():
+    returns = np.linspace(-0.02, 0.02, 9)
+    paths = bootstrap_paths(returns, 20, 100, s0=10.0, block_size=5, seed=1)
+
+    assert paths.shape == (20, 100)
+    daily = paths[:, 1:] / paths[:, :-1] - 1
+    assert np.all(np.isin(np.round(daily, 10), np.round(returns, 10)))
+
+def test_make_mock_stock_data():
+    data = make_mock_stock_data('2023-01-01', '2023-12-31', seed=3)
+
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert (data.index.weekday < 5).all()
+    assert data['Close'].iloc[0] == 150.0
+    assert (data['High'] >= data['Close']).all() and (data['Low'] <= data['Close']).all()
+
+@pytest.mark.parametrize('variable_amount', [False, True])
+def test_outcomes_match_single_path_backtest(variable_amount):
+    start_date, end_date = '2021-01-01', '2022-12-31'
+    trading_days = pd.bdate_range(start_date, end_date)
+    paths = simulate_gbm_paths(3, len(trading_days), seed=7)
+    positions = resolve_trading_positions(trading_days, weekly_investment_dates(start_date, end_date))
+    amount = np.linspace(50, 150, len(positions)) if variable_amount else 100.0
+
+    flow_dates = trading_days[positions].append(pd.DatetimeIndex([pd.Timestamp(end_date)]))
+    flow_years = np.asarray((flow_dates - flow_dates[0]) / pd.Timedelta(days=365.25))
+    outcomes = simulate_strategy_outcomes(paths, positions, amount, flow_years)
+
+    for i in range(3):
+        stock_data = pd.DataFrame({'Close': paths[i]}, index=trading_days)
+        expected = compare_with_lump_sum(stock_data, amount, start_date, end_date)
+        assert outcomes['dca_xirr'][i] == pytest.approx(expected['drip_result']['xirr'])
+        assert outcomes['dca_return'][i] == pytest.approx(expected['drip_result']['total_return'])
+        assert outcomes['lump_sum_return'][i] == pytest.approx(expected['lump_sum_return'])
+        assert outcomes['difference'][i] == pytest.approx(expected['difference'])
+
+def test_path_chunks_bound_memory():
+    chunks = list(iter_path_chunks(2500, 300, chunk_size=1000, seed=0))
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    assert all(chunk.shape[1] == 300 for chunk in chunks)
+
+def test_run_monte_carlo_distribution():
+    result = run_monte_carlo(100.0, '2020-01-01', '2022-12-31', strategy='monthly', n_paths=2500,
+                             seed=11, chunk_size=1000, sigma=0.015)
+
+    assert result['n_paths'] == 2500
+    assert result['investment_count'] == 36
+    assert len(result['outcomes']['dca_return']) == 2500
+    pct = result['percentiles']['dca_return']
+    assert pct[5] < pct[50] < pct[95]
+    assert 0.0 <= result['dca_win_probability'] <= 1.0
+
+    again = run_monte_carlo(100.0, '2020-01-01', '2022-12-31', strategy='monthly', n_paths=2500,
+                            seed=11, chunk_size=1000, sigma=0.015)
+    np.testing.assert_array_equal(result['outcomes']['difference'], again['outcomes']['difference'])
+
+def test_run_monte_carlo_bootstrap_requires_returns():
+    with pytest.raises(ValueError):
+        run_monte_carlo(100.0, '2020-01-01', '2020-12-31', method='bootstrap', n_paths=10)
+
+    result = run_monte_carlo(100.0, '2020-01-01', '2020-12-31', method='bootstrap', n_paths=10,
+                             returns=np.array([0.01, -0.01, 0.005]), seed=0)
+    assert len(result['outcomes']['dca_return']) == 10
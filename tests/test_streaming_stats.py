@@ -0,0 +1,86 @@
+import pickle
+
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.streaming_stats import RunningStats, QuantileSketch, StreamingSummary
+from src.batch_runner import run_universe_backtest, summarize_universe_backtest
+
+def test_running_stats_batches_and_merge_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.normal(5, 2, 10000)
+
+    whole = RunningStats()
+    whole.update(values[:3000])
+    for value in values[3000:3010]:
+        whole.update(value)
+    part = RunningStats()
+    part.update(values[3010:])
+    whole.merge(part)
+
+    assert whole.count == len(values)
+    assert whole.mean == pytest.approx(values.mean())
+    assert whole.variance == pytest.approx(values.var(ddof=1))
+    assert whole.min == values.min() and whole.max == values.max()
+
+def test_quantile_sketch_relative_error_and_merge():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.normal(10, 30, 50000), np.zeros(100)])
+    qs = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+    sketches = [QuantileSketch(relative_accuracy=0.01) for _ in range(4)]
+    for sketch, chunk in zip(sketches, np.array_split(values, 4)):
+        sketch.update(chunk)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+
+    exact = np.quantile(values, qs, method='lower')
+    estimates = merged.quantiles(qs)
+    assert merged.count == len(values)
+    np.testing.assert_allclose(estimates, exact, rtol=0.011, atol=1e-2)
+
+def test_quantile_sketch_memory_is_bounded():
+    sketch = QuantileSketch(relative_accuracy=0.01, max_bins=64)
+    sketch.update(np.geomspace(1e-6, 1e6, 100000))
+
+    assert len(sketch._positive) <= 64
+    assert sketch.quantile(0.99) == pytest.approx(np.quantile(np.geomspace(1e-6, 1e6, 100000), 0.99), rel=0.02)
+
+def test_streaming_summary_is_picklable_and_skips_errors():
+    summary = StreamingSummary(metrics=('total_return', 'drip_result.total_return'))
+    summary.update({'total_return': 1.0})
+    summary.update({'drip_result': {'total_return': 2.0}})
+    summary.update({'error': 'boom'})
+    summary.update({})
+
+    restored = pickle.loads(pickle.dumps(summary))
+    report = restored.merge(StreamingSummary(metrics=summary.metrics)).summary()
+
+    assert restored.runs == 2 and restored.errors == 2
+    assert report['total_return']['count'] == 1
+    assert report['drip_result.total_return']['mean'] == 2.0
+    with pytest.raises(ValueError):
+        summary.merge(StreamingSummary(metrics=('xirr',)))
+
+def test_summarize_universe_backtest_matches_collected_results():
+    index = pd.bdate_range('2020-01-01', '2021-12-31')
+    rng = np.random.default_rng(2)
+    universe = {f"S{i}": pd.DataFrame({'Close': 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))},
+                                      index=index) for i in range(12)}
+
+    results = run_universe_backtest(universe, 100, '2020-01-01', '2021-12-31', max_workers=1)
+    expected = np.array([result['total_return'] for result in results.values()])
+
+    sequential = StreamingSummary()
+    run_universe_backtest(universe, 100, '2020-01-01', '2021-12-31', max_workers=1, summary=sequential)
+    parallel = summarize_universe_backtest(universe, 100, '2020-01-01', '2021-12-31', max_workers=2, chunk_size=5)
+
+    for summary in (sequential, parallel):
+        report = summary.summary(quantiles=(0.5,))['total_return']
+        assert report['count'] == 12
+        assert report['mean'] == pytest.approx(expected.mean())
+        assert report['std'] == pytest.approx(expected.std(ddof=1))
+        assert report['min'] == pytest.approx(expected.min())
+        assert report['quantiles'][0.5] == pytest.approx(np.quantile(expected, 0.5, method='lower'), rel=0.011)
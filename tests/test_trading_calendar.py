@@ -0,0 +1,69 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.backtest import run_backtest
+from src.investment_strategy import calculate_investment_shares, generate_investment_dates
+from src.trading_calendar import TradingCalendar
+
+START, END = '2020-01-01', '2021-12-31'
+
+@pytest.fixture
+def trading_days():
+    return pd.bdate_range(START, END)
+
+def make_stock(index, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Close': 100 + rng.random(len(index)).cumsum()}, index=index)
+
+def test_calculate_investment_shares_rolls_forward_and_handles_tz(trading_days):
+    index = trading_days.tz_localize('America/New_York')
+    stock_data = make_stock(index)
+    # 2020-02-01 is a Saturday -> Monday 2020-02-03; dates after the last bar are dropped
+    dates = pd.to_datetime(['2020-01-02', '2020-02-01', '2030-01-01']).to_pydatetime()
+
+    records = calculate_investment_shares(stock_data, list(dates), 100.0)
+
+    assert list(records['Date'].dt.strftime('%Y-%m-%d')) == ['2020-01-02', '2020-02-03']
+    assert records['Date'].dt.tz is not None
+    assert records['Shares'].tolist() == pytest.approx((100.0 / records['Price']).tolist())
+
+def test_schedule_positions_are_cached(trading_days):
+    calendar = TradingCalendar(trading_days)
+
+    first = calendar.schedule_positions('weekly', START, END, {'day_of_week': 2})
+    second = calendar.schedule_positions('weekly', START, END, {'day_of_week': 2})
+
+    assert first is second
+    assert not first.flags.writeable
+    assert calendar.schedule_positions('monthly', START, END) is not first
+
+def test_offset_detects_slices_and_gaps(trading_days):
+    calendar = TradingCalendar(trading_days)
+
+    assert calendar.offset_of(trading_days.copy()) == 0
+    assert calendar.offset_of(trading_days[30:200]) == 30
+    assert calendar.offset_of(trading_days.delete(100)) is None
+    assert calendar.offset_of(trading_days.tz_localize('UTC')) is None
+    assert calendar.offset_of(pd.bdate_range('2019-06-01', END)) is None
+
+@pytest.mark.parametrize('strategy, params', [('weekly', {'day_of_week': 0}), ('monthly', {'day_of_month': 15})])
+def test_calendar_results_match_per_symbol_resolution(trading_days, strategy, params):
+    calendar = TradingCalendar(trading_days)
+    dates = generate_investment_dates(strategy, START, END, params)
+    universe = {
+        'full': make_stock(trading_days, 1),
+        'late_listing': make_stock(trading_days[120:], 2),
+        'delisted': make_stock(trading_days[:300], 3),
+        'gappy': make_stock(trading_days.delete([10, 11, 250]), 4),
+    }
+
+    for stock_data in universe.values():
+        positions = calendar.positions_for(stock_data.index, strategy, START, END, params)
+        expected = calculate_investment_shares(stock_data, dates, 100.0)
+        pd.testing.assert_series_equal(pd.Series(stock_data.index[positions]), expected['Date'], check_names=False)
+
+        with_calendar = run_backtest(stock_data, 100.0, START, END, strategy, params, calendar=calendar)
+        without = run_backtest(stock_data, 100.0, START, END, strategy, params)
+        assert with_calendar['final_value'] == pytest.approx(without['final_value'])
+        assert with_calendar['investment_count'] == without['investment_count']
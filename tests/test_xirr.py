@@ -0,0 +1,57 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from src.backtest import run_backtest
+from src.xirr import xirr, xirr_batch, contribution_cashflows, results_xirr
+
+def test_single_period_matches_simple_return():
+    # 100 -> 121 over two years (731 days) is about 10% a year
+    expected = 1.21 ** (365.25 / 731) - 1
+    assert xirr([-100, 121], ['2020-01-01', '2022-01-01']) == pytest.approx(expected, rel=1e-9)
+
+def test_batch_roots_zero_the_net_future_value():
+    rng = np.random.default_rng(0)
+    years = np.linspace(0, 5, 61)
+    cashflows = np.full((2000, 61), -100.0)
+    cashflows[:, -1] = 6000 * rng.uniform(0.5, 2.0, 2000)
+
+    rates = xirr_batch(cashflows, years)
+
+    assert np.isfinite(rates).all()
+    residual = (cashflows * (1 + rates[:, None]) ** (years[-1] - years)).sum(axis=1)
+    np.testing.assert_allclose(residual, 0, atol=1e-6)
+
+def test_padded_rows_and_unsolvable_rows():
+    cashflows = np.array([
+        [-100.0, 121.0, 0.0],
+        [-100.0, -100.0, 0.0],   # never positive: no root
+        [-100.0, -100.0, 210.0],
+    ])
+    years = np.array([
+        [0.0, 2.0, 0.0],
+        [0.0, 1.0, 0.0],
+        [0.0, 1.0, 2.0],
+    ])
+
+    rates = xirr_batch(cashflows, years)
+
+    assert rates[0] == pytest.approx(0.1, rel=1e-6)
+    assert np.isnan(rates[1])
+    assert -100 * (1 + rates[2]) ** 2 - 100 * (1 + rates[2]) + 210 == pytest.approx(0, abs=1e-8)
+
+def test_run_backtest_reports_xirr():
+    index = pd.bdate_range('2020-01-01', '2022-12-31')
+    stock_data = pd.DataFrame({'Close': np.linspace(100, 160, len(index))}, index=index)
+
+    result = run_backtest(stock_data, 100, '2020-01-01', '2022-12-31', 'monthly')
+
+    flows = contribution_cashflows(result['investment_records'], result['final_value'], '2022-12-31')
+    rate = result['xirr'] / 100
+    residual = (flows['cashflows'] * (1 + rate) ** (flows['years'][-1] - flows['years'])).sum()
+    assert residual == pytest.approx(0, abs=1e-6)
+    # Money only sat in the market for half the period on average, so the money-weighted rate is higher
+    assert result['xirr'] > result['annual_return']
+
+    batch = results_xirr([result, result], '2022-12-31')
+    np.testing.assert_allclose(batch, result['xirr'])